@@ -0,0 +1,175 @@
+"""Memory soak test: many varied turns, checking that memory stops growing once the caps are reached.
+
+Runs turns through the same classify → answer/search → speech synthesis
+path as Benchmarks/TurnLatency.py, against the same local stand-ins, with
+questions that rarely repeat, so the answer cache, search cache and
+history index keep taking new entries. Every --sample-every turns it
+records resident size and tracemalloc's per-subsystem totals (see
+Core/MemoryBudget.py). After the warm-up share of the run, when every
+cap has been reached, memory should be flat: the growth rate is the
+least-squares slope over the remaining samples.
+
+Usage:
+    python -m Benchmarks.MemorySoak --turns 5000 --sample-every 250
+    python -m Benchmarks.MemorySoak --turns 20000 --max-growth-kb 64 --json soak.json
+
+The caps are lowered (--history-index-size, --answer-cache-size) so a
+run of a few thousand turns reaches them; a week of real use reaches the
+defaults the same way. With --max-growth-kb the exit status is 1 when
+traced memory grows faster than that many KB per 1000 turns after the
+warm-up.
+"""
+import gc
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from json import dumps
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from Benchmarks.TurnLatency import FakeLLMServer, fake_search_backend, fake_tts_backend
+
+TOPICS = ["akbar", "python", "recursion", "volcanoes", "the moon", "photosynthesis", "chess openings", "tea",
+          "the roman empire", "black holes", "sourdough", "jazz", "glaciers", "bitcoin", "honeybees", "tides"]
+TEMPLATES = ["who was {0}?", "explain {0} simply", "what is {0} number {1}?", "tell me about {0} and item {1}",
+             "how does {0} work in case {1}?", "what is the latest news about {0} {1}?",
+             "what happened today with {0} {1}?"]
+
+# Subsystems whose allocations are the benchmark's own bookkeeping
+MEASUREMENT = ("Core.MemoryBudget", "Benchmarks.MemorySoak")
+
+def queries(seed: int, details: int = 5000):
+    """An endless stream of varied questions, about one in three of them real-time.
+
+    Repeats are rare, but the words come from a fixed vocabulary (the
+    topics, templates and details numbers), as they do in real speech.
+    """
+    rng = random.Random(seed)
+    while True:
+        yield rng.choice(TEMPLATES).format(rng.choice(TOPICS), rng.randint(1, details))
+
+def slope(points):
+    """Least-squares slope of (x, y) points, or 0.0 with fewer than two."""
+    if len(points) < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread if spread else 0.0
+
+def application_bytes(sample) -> int:
+    """Traced bytes less what the measurement itself holds (the samples taken so far)."""
+    own = sum(entry["bytes"] for name, entry in sample["subsystems"].items() if name in MEASUREMENT)
+    return sample["traced"] - own
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=5000)
+    parser.add_argument("--sample-every", type=int, default=250)
+    parser.add_argument("--warmup", type=float, default=0.4, help="Share of the turns left out of the growth fit")
+    parser.add_argument("--ttft", type=float, default=0.002, help="LLM time to first token in seconds")
+    parser.add_argument("--token-rate", type=float, default=20000.0, help="LLM tokens per second")
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--history-index-size", type=int, default=1000)
+    parser.add_argument("--answer-cache-size", type=int, default=200)
+    parser.add_argument("--trace-frames", type=int, default=1,
+                        help="Stack frames kept per traced allocation; fewer is faster but less exact")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Write the samples to this file")
+    parser.add_argument("--max-growth-kb", type=float,
+                        help="Fail if traced memory grows faster than this many KB per 1000 turns after warm-up")
+    args = parser.parse_args(argv)
+    random.seed(args.seed)
+
+    llm = FakeLLMServer(args.ttft, args.token_rate, args.answer_tokens, jitter=0.0).start()
+
+    # Core modules read Data/ and .env relative to the working directory, and their caps at import
+    os.chdir(tempfile.mkdtemp(prefix="jarvis-soak-"))
+    os.makedirs("Data", exist_ok=True)
+    with open(".env", "w", encoding="utf-8") as f:
+        f.write(f"HistoryIndexSize={args.history_index_size}\nAnswerCacheSize={args.answer_cache_size}\n"
+                f"MemoryTraceFrames={args.trace_frames}\n")
+    os.environ.update({"GroqAPIKey": "benchmark", "GROQ_API_KEY": "benchmark", "GroqBaseURL": llm.url,
+                       "LLMHedging": "false"})
+
+    from Core.Tracing import tracer
+    from Core.MemoryBudget import memory_budget, format_bytes
+    import Core.ChatBot as ChatBot
+    import Core.QueryClassifier as QueryClassifier
+    import Core.RealTimeSearch as RealTimeSearch
+    import Core.VoiceOutput as VoiceOutput
+
+    RealTimeSearch.search = fake_search_backend(0.0)
+    VoiceOutput.edge_tts.Communicate = fake_tts_backend(0.0)
+    tracer.last_turn_path = os.path.join("Data", "Latency.data")
+
+    def run_turn(query):
+        tracer.begin_turn()
+        try:
+            tasks = QueryClassifier.classify_user_query(query)
+            realtime = [t for t in tasks if t.startswith("realtime")]
+            if realtime:
+                answer = RealTimeSearch.RealTimeSearchEngine(realtime[0].removeprefix("realtime "))
+            else:
+                answer = ChatBot.answer_query(query)
+            asyncio.run(VoiceOutput.generate_audio(answer, VoiceOutput.DATA_DIR / f"Soak{threading.get_ident()}.mp3"))
+        finally:
+            tracer.end_turn()
+
+    memory_budget.start()
+    samples = []
+
+    def take_sample(turn):
+        gc.collect()
+        sample = memory_budget.sample()
+        sample["turn"] = turn
+        samples.append(sample)
+        top = ", ".join(f"{name} {format_bytes(entry['bytes'])}"
+                        for name, entry in list(sample["subsystems"].items())[:3])
+        resident = format_bytes(sample["resident"]) if sample["resident"] is not None else "-"
+        print(f"turn {turn:>7}: resident {resident:>9}, traced {format_bytes(application_bytes(sample)):>9}  ({top})",
+              flush=True)
+
+    stream = queries(args.seed)
+    started = time.perf_counter()
+    take_sample(0)
+    for turn in range(1, args.turns + 1):
+        run_turn(next(stream))
+        if turn % args.sample_every == 0 or turn == args.turns:
+            take_sample(turn)
+    elapsed = time.perf_counter() - started
+    llm.stop()
+
+    settled = [s for s in samples if s["turn"] >= args.turns * args.warmup]
+    traced_growth = slope([(s["turn"], application_bytes(s)) for s in settled]) * 1000 / 1024
+    resident_growth = (slope([(s["turn"], s["resident"]) for s in settled]) * 1000 / 1024
+                       if all(s["resident"] is not None for s in settled) else None)
+    print(f"\n{args.turns} turns in {elapsed:.1f}s ({llm.requests} LLM requests)")
+    print(f"after turn {settled[0]['turn'] if settled else '-'}: traced {traced_growth:+.1f} KB per 1000 turns, "
+          f"resident " + (f"{resident_growth:+.1f} KB per 1000 turns" if resident_growth is not None else "unknown"))
+    if len(settled) >= 2:
+        first, last = settled[0]["subsystems"], settled[-1]["subsystems"]
+        changes = sorted(((last.get(name, {}).get("bytes", 0) - first.get(name, {}).get("bytes", 0), name)
+                          for name in set(first) | set(last) if name not in MEASUREMENT), reverse=True)
+        print("largest changes over that span: " + ", ".join(f"{name} {change:+,d} B" for change, name in changes[:5]))
+    print("collections: " + ", ".join(f"{name} {entry['size']}/{entry['cap']}"
+                                      for name, entry in samples[-1]["collections"].items()))
+
+    if args.json:
+        with open(os.path.join(REPO_ROOT, args.json) if not os.path.isabs(args.json) else args.json, "w") as f:
+            f.write(dumps({"turns": args.turns, "seconds": elapsed, "traced_growth_kb_per_1000": traced_growth,
+                           "resident_growth_kb_per_1000": resident_growth, "samples": samples}, indent=4))
+
+    if args.max_growth_kb is not None and traced_growth > args.max_growth_kb:
+        print(f"FAIL traced memory grows {traced_growth:.1f} KB per 1000 turns > {args.max_growth_kb:.1f}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
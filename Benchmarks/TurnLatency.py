@@ -0,0 +1,281 @@
+"""End-to-end turn latency benchmark with local stand-ins for every remote service.
+
+Runs scripted turns through the same classify → answer/search → speech
+synthesis path as main.py's ProcessTurn and SpeakTurn, against:
+
+- a fake OpenAI/Groq-compatible streaming server with configurable
+  time-to-first-token and token rate,
+- a fake Google search backend with configurable latency,
+- a fake edge-tts that "synthesizes" at a configurable speed.
+
+Usage:
+    python -m Benchmarks.TurnLatency --turns 50 --concurrency 1 --ttft 0.25 --token-rate 200
+    python -m Benchmarks.TurnLatency --queries Benchmarks/queries.jsonl --max-p95 turn=2.0
+    python -m Benchmarks.TurnLatency --tail-prob 0.05 --tail-ttft 3 --hedge
+    python -m Benchmarks.TurnLatency --model-ttft llama-3.1-8b-instant=0.08 --model-ttft llama3-70b-8192=0.3
+
+Everything runs in a temporary working directory, so Data/ChatLog.json and
+the real .env are never touched. With --max-p95 the exit status is 1 when a
+stage's p95 exceeds its budget, so the script can serve as a regression gate.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from json import dumps, loads
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_QUERIES = [
+    "who was akbar?",
+    "what is python?",
+    "how do i study for exams?",
+    "who is the current indian prime minister?",
+    "what is today's news?",
+    "thanks, that was helpful",
+    "explain recursion simply",
+    "latest update from facebook",
+]
+REALTIME_WORDS = ("today", "current", "latest", "news", "now", "recent")
+FILLER = ("Sir, here is a concise answer based on what I know. " * 40).split()
+
+class FakeLLMServer:
+    """Minimal OpenAI-compatible chat completions server streaming SSE chunks.
+
+    It serves both /v1/chat/completions and Groq's /openai/v1/chat/completions.
+    Classification prompts get a category line; other prompts get filler text
+    of the requested length.
+    """
+
+    def __init__(self, ttft: float = 0.25, token_rate: float = 200.0, answer_tokens: int = 60, jitter: float = 0.2,
+                 tail_prob: float = 0.0, tail_ttft: float = 0.0, model_ttft: dict = None):
+        self.ttft = ttft
+        self.model_ttft = model_ttft or {}
+        self.token_rate = token_rate
+        self.answer_tokens = answer_tokens
+        self.jitter = jitter
+        self.tail_prob = tail_prob
+        self.tail_ttft = tail_ttft
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.requests += 1
+                tokens = server.reply_tokens(body.get("messages", []), body.get("max_tokens") or 1024)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                time.sleep(server.first_token_delay(body.get("model")))
+                try:
+                    self.stream_tokens(body, tokens)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client hung up, e.g. a hedged request that lost the race
+                    pass
+                self.close_connection = True
+
+            def stream_tokens(self, body, tokens):
+                for index, token in enumerate(tokens):
+                    self.send_chunk(body.get("model", "fake"), {"content": token}, None)
+                    if index < len(tokens) - 1:
+                        time.sleep(1 / server.token_rate)
+                self.send_chunk(body.get("model", "fake"), {}, "stop")
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def send_chunk(self, model, delta, finish_reason):
+                chunk = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+                self.wfile.write(f"data: {dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def first_token_delay(self, model: str = None) -> float:
+        if self.tail_prob and random.random() < self.tail_prob:
+            return self.tail_ttft
+        return self.model_ttft.get(model, self.ttft) * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def reply_tokens(self, messages, max_tokens):
+        system = " ".join(m["content"] for m in messages if m.get("role") == "system")
+        query = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        if "Decision-Making Assistant" in system:
+            category = "realtime" if any(word in query.lower() for word in REALTIME_WORDS) else "general"
+            if "TASKS:" not in system:
+                return [f"{category} ", query]
+            if category != "general":
+                return ["TASKS: ", f"{category} {query}"]
+            count = min(self.answer_tokens, max_tokens)
+            return ["TASKS: ", f"general {query}\n", "ANSWER: "] + [word + " " for word in FILLER[:count]]
+        count = min(self.answer_tokens, max_tokens)
+        return [word + " " for word in FILLER[:count]]
+
+    def start(self) -> "FakeLLMServer":
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+
+class FakeSearchResult:
+    def __init__(self, index, query):
+        self.title = f"Result {index} for {query}"
+        self.description = f"A short description of result {index} about {query}."
+
+def fake_search_backend(latency: float):
+    def search(query, advanced=True, num_results=5, **kwargs):
+        time.sleep(latency)
+        return [FakeSearchResult(i, query) for i in range(num_results)]
+    return search
+
+def fake_tts_backend(seconds_per_char: float):
+    class Communicate:
+        def __init__(self, text, voice, **kwargs):
+            self.text = text
+
+        async def save(self, path):
+            await asyncio.sleep(len(self.text) * seconds_per_char)
+            with open(path, "wb") as f:
+                f.write(b"\0" * len(self.text))
+    return Communicate
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--queries", help="JSONL file with a 'query' field per line")
+    parser.add_argument("--ttft", type=float, default=0.25, help="LLM time to first token in seconds")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="LLM tokens per second")
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--tail-prob", type=float, default=0.0, help="Share of LLM requests that stall")
+    parser.add_argument("--tail-ttft", type=float, default=2.0, help="Time to first token of a stalled request")
+    parser.add_argument("--hedge", action="store_true", help="Hedge LLM requests to a second fake server")
+    parser.add_argument("--no-answer-cache", action="store_true", help="Always generate, even for repeated questions")
+    parser.add_argument("--combined", action="store_true", help="Classify and answer general queries in one call")
+    parser.add_argument("--model-ttft", action="append", default=[], metavar="MODEL=SECONDS",
+                        help="Time to first token for one model; repeatable")
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--tts-ms-per-char", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Write the stage summary to this file")
+    parser.add_argument("--max-p95", action="append", default=[], metavar="STAGE=SECONDS",
+                        help="Fail if the stage's p95 exceeds the budget; repeatable")
+    args = parser.parse_args(argv)
+    random.seed(args.seed)
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [loads(line)["query"] for line in f if line.strip()]
+
+    model_ttft = {model: float(seconds) for model, _, seconds in (item.partition("=") for item in args.model_ttft)}
+    llm = FakeLLMServer(args.ttft, args.token_rate, args.answer_tokens,
+                        tail_prob=args.tail_prob, tail_ttft=args.tail_ttft, model_ttft=model_ttft).start()
+    hedge = FakeLLMServer(args.ttft, args.token_rate, args.answer_tokens, tail_prob=args.tail_prob,
+                          tail_ttft=args.tail_ttft, model_ttft=model_ttft).start() if args.hedge else None
+
+    # Core modules resolve Data/ and .env relative to the working directory
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(tempfile.mkdtemp(prefix="jarvis-bench-"))
+    os.makedirs("Data", exist_ok=True)
+    os.environ.update({"GroqAPIKey": "benchmark", "GROQ_API_KEY": "benchmark", "GroqBaseURL": llm.url,
+                       "LLMHedging": "false"})
+
+    from Core.Tracing import tracer, format_percentiles
+    from Core.LLMClient import llm_client, OpenAICompatibleBackend
+    from Core.ModelRouter import model_router
+    from Core.PromptBuilder import prompt_builder
+    import Core.ChatBot as ChatBot
+    import Core.QueryClassifier as QueryClassifier
+    import Core.RealTimeSearch as RealTimeSearch
+    import Core.VoiceOutput as VoiceOutput
+
+    if hedge is not None:
+        llm_client.secondary = OpenAICompatibleBackend(hedge.url + "/v1", name="hedge")
+    RealTimeSearch.search = fake_search_backend(args.search_latency)
+    if args.no_answer_cache:
+        ChatBot.answer_cache.get = lambda query: None
+    VoiceOutput.edge_tts.Communicate = fake_tts_backend(args.tts_ms_per_char / 1000)
+    tracer.last_turn_path = os.path.join("Data", "Latency.data")
+
+    def run_turn(query):
+        tracer.begin_turn()
+        try:
+            answer = None
+            if args.combined:
+                with tracer.span("classify_answer"):
+                    tasks, answer = ChatBot.classify_and_answer(query)
+            else:
+                with tracer.span("classification"):
+                    tasks = QueryClassifier.classify_user_query(query)
+            realtime = [t for t in tasks if t.startswith("realtime")]
+            if answer is not None:
+                pass
+            elif realtime:
+                with tracer.span("search"):
+                    answer = RealTimeSearch.RealTimeSearchEngine(realtime[0].removeprefix("realtime "))
+            else:
+                with tracer.span("answer"):
+                    answer = ChatBot.answer_query(query)
+            with tracer.span("tts"):
+                asyncio.run(VoiceOutput.generate_audio(answer, VoiceOutput.DATA_DIR / f"Bench{threading.get_ident()}.mp3"))
+        finally:
+            tracer.end_turn()
+
+    script = [queries[i % len(queries)] for i in range(args.turns)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(run_turn, script))
+    elapsed = time.perf_counter() - started
+    llm.stop()
+    if hedge is not None:
+        hedge.stop()
+
+    snapshot = tracer.snapshot()
+    print(format_percentiles(snapshot))
+    print(f"\n{args.turns} turns in {elapsed:.2f}s: {args.turns / elapsed:.2f} turns/s "
+          f"({llm.requests} LLM requests, concurrency {args.concurrency})")
+    print("prompt prefix reuse: " + ", ".join(f"{stage} {share:.0%}" for stage, share in prompt_builder.prefix_reuse().items()))
+    for model, status in model_router.status().items():
+        print(f"model {model}: degraded for {status['degraded_for']:.0f}s")
+        for route, entry in status["routes"].items():
+            p95 = f"{entry['p95_ttft'] * 1000:.0f}ms" if entry["p95_ttft"] is not None else "-"
+            print(f"  route {route}: p95 first token {p95}, degraded for {entry['degraded_for']:.0f}s")
+    if hedge is not None:
+        print(f"hedged {llm_client.stats['hedged']}/{llm_client.stats['requests']} requests, "
+              f"secondary won {llm_client.stats['secondary_wins']}")
+
+    if args.json:
+        with open(os.path.join(REPO_ROOT, args.json) if not os.path.isabs(args.json) else args.json, "w") as f:
+            f.write(dumps({"turns": args.turns, "seconds": elapsed, "stages": snapshot}, indent=4))
+
+    failed = False
+    for budget in args.max_p95:
+        stage, _, seconds = budget.partition("=")
+        observed = snapshot.get(stage, {}).get("p95")
+        if observed is None:
+            print(f"FAIL {stage}: no samples")
+            failed = True
+        elif observed > float(seconds):
+            print(f"FAIL {stage}: p95 {observed:.3f}s > {float(seconds):.3f}s")
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import os
+import re
+import math
+import time
+import threading
+from collections import OrderedDict
+from json import load, dump, JSONDecodeError
+from typing import Dict, FrozenSet, Optional, Set
+
+from dotenv import dotenv_values
+
+from Core.MemoryBudget import memory_budget
+
+# Paths
+CACHE_PATH = os.path.join("Data", "AnswerCache.json")
+
+env_vars = dotenv_values(".env")
+AnswerCacheThreshold = float(env_vars.get("AnswerCacheThreshold", 0.85))
+AnswerCacheTTL = float(env_vars.get("AnswerCacheTTL", 7 * 24 * 3600))
+AnswerCacheSize = int(env_vars.get("AnswerCacheSize", 500))
+
+CONTRACTIONS = {
+    "what's": "what is", "who's": "who is", "where's": "where is", "how's": "how is", "when's": "when is",
+    "it's": "it is", "that's": "that is", "i'm": "i am", "don't": "do not", "doesn't": "does not",
+    "can't": "cannot", "whats": "what is", "whos": "who is",
+}
+FILLER = re.compile(r"^(hey |hi |ok |okay |so |please |jarvis |can you tell me |tell me |do you know )+|( please)$")
+
+# Questions whose answer depends on the moment or on earlier turns are never served from the cache
+TIME_SENSITIVE = re.compile(r"\b(today|tonight|tomorrow|yesterday|now|current(ly)?|latest|recent(ly)?|news|weather|"
+                            r"time|date|this (week|month|year)|score|price|stock)\b")
+CONTEXT_DEPENDENT = re.compile(r"\b(he|she|it|they|them|him|her|his|its|their|this|that|those|these|there|"
+                               r"again|more|above|previous|last one|same|you said|my)\b")
+
+# Words that can differ between two phrasings of the same question
+STOPWORDS = frozenset("""a an the is are was were be been am do does did of to in on at by for with about from as
+into and or what who whom which how why when where i me you your we can could would should will please""".split())
+
+def content_words(key: str) -> list:
+    """The words of a normalized query that carry its meaning, in order."""
+    return [word for word in key.split() if word not in STOPWORDS]
+
+def normalize_query(query: str) -> str:
+    """Lowercases, expands contractions and strips punctuation and filler words."""
+    text = query.lower().replace("’", "'")
+    text = " ".join(CONTRACTIONS.get(word, word) for word in text.split())
+    text = re.sub(r"[^\w\s+\-*/]", " ", text)
+    text = re.sub(r"\s*([+\-*/])\s*", r"\1", " ".join(text.split()))
+    return FILLER.sub("", text).strip()
+
+def char_ngrams(text: str, n: int = 3) -> Set[str]:
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+class AnswerCache:
+    """Local cache of answers to general questions, matched on text similarity.
+
+    Queries are normalized and indexed by character trigrams in an inverted
+    index. A lookup only considers entries that share one of the query's
+    rarest trigrams (any entry at or above the threshold must), scores them by
+    Jaccard similarity and returns the best one at or above the threshold.
+    Trigrams ignore word order and forgive a changed word, so a match must
+    also have the same content words in the same order: "smallest planet"
+    never answers "largest planet", nor "fahrenheit to celsius" "celsius to
+    fahrenheit". Numbers must match exactly, so "2+2" never answers "2+3".
+    Entries expire after ttl seconds, and the least recently used entries are
+    evicted beyond max_entries. The cache is persisted to Data/AnswerCache.json.
+    With enabled set to False it neither answers nor stores anything.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, threshold: float = AnswerCacheThreshold,
+                 ttl: float = AnswerCacheTTL, max_entries: int = AnswerCacheSize):
+        self.path = path
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = True
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.index: Dict[str, Set[str]] = {}
+        self.grams: Dict[str, FrozenSet[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    @staticmethod
+    def cacheable(query: str) -> bool:
+        normalized = normalize_query(query)
+        return bool(normalized) and not TIME_SENSITIVE.search(normalized) and not CONTEXT_DEPENDENT.search(normalized)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = load(f)
+        except (FileNotFoundError, JSONDecodeError):
+            return
+        now = time.time()
+        for key, entry in data.items() if isinstance(data, dict) else []:
+            if entry.get("expires", 0) > now:
+                self._insert(key, entry)
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            dump(self.entries, f, indent=4)
+        os.replace(temp_path, self.path)
+
+    def _insert(self, key: str, entry: dict) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        self.grams[key] = frozenset(char_ngrams(key))
+        for gram in self.grams[key]:
+            self.index.setdefault(gram, set()).add(key)
+
+    def _remove(self, key: str) -> None:
+        self.entries.pop(key, None)
+        for gram in self.grams.pop(key, ()):
+            keys = self.index.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.index[gram]
+
+    def _match(self, key: str) -> Optional[str]:
+        if key in self.entries:
+            return key
+        grams = char_ngrams(key)
+        # Jaccard >= t needs at least t * |grams| shared grams, so a match must share one of the rarest rest
+        ordered = sorted(grams, key=lambda gram: len(self.index.get(gram, ())))
+        prefix = len(ordered) - math.ceil(self.threshold * len(ordered)) + 1
+        candidates = set()
+        for gram in ordered[:prefix]:
+            candidates.update(self.index.get(gram, ()))
+
+        numbers = re.findall(r"\d+", key)
+        words = content_words(key)
+        best, best_score = None, self.threshold
+        for candidate in candidates:
+            other = self.grams[candidate]
+            overlap = len(grams & other)
+            score = overlap / (len(grams) + len(other) - overlap)
+            if score >= best_score and re.findall(r"\d+", candidate) == numbers and content_words(candidate) == words:
+                best, best_score = candidate, score
+        return best
+
+    def get(self, query: str) -> Optional[str]:
+        """Returns a cached answer for a similar earlier question, or None."""
+        if not self.enabled or not self.cacheable(query):
+            return None
+        key = normalize_query(query)
+        with self.lock:
+            match = self._match(key)
+            if match is not None and self.entries[match]["expires"] <= time.time():
+                self._remove(match)
+                match = None
+            if match is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(match)
+            self.hits += 1
+            return self.entries[match]["answer"]
+
+    def put(self, query: str, answer: str) -> None:
+        if not self.enabled or not answer or not self.cacheable(query):
+            return
+        key = normalize_query(query)
+        with self.lock:
+            self._remove(key)
+            self._insert(key, {"query": query, "answer": answer, "expires": time.time() + self.ttl})
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+            self._save()
+
+    def invalidate(self, query: str) -> None:
+        with self.lock:
+            self._remove(normalize_query(query))
+            self._save()
+
+answer_cache = AnswerCache()
+memory_budget.watch("answer cache", lambda: len(answer_cache.entries), answer_cache.max_entries)
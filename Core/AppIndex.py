@@ -0,0 +1,373 @@
+import os
+import sys
+import shlex
+import threading
+import subprocess
+from json import load, dump, JSONDecodeError
+from typing import Dict, List, Optional
+
+from Core.MemoryBudget import memory_budget
+
+# Paths
+ALIASES_PATH = os.path.join("Data", "AppAliases.json")
+
+# Field codes that may appear in a .desktop Exec line (%f, %U, ...)
+DESKTOP_FIELD_CODES = {"%f", "%F", "%u", "%U", "%d", "%D", "%n", "%N", "%i", "%c", "%k", "%v", "%m"}
+
+# Number of completions kept at every trie node
+COMPLETIONS_PER_NODE = 5
+
+# Learned aliases kept; the oldest are forgotten first
+MAX_ALIASES = 1000
+
+# Fuzzy lookups remembered before the memo starts over
+FUZZY_MEMO_SIZE = 1024
+
+# Shortest spoken name completed as a prefix; shorter ones must match exactly
+MIN_PREFIX_LENGTH = 3
+
+# Least similarity (1 - edits / length of the longer name) a fuzzy match needs
+FUZZY_RATIO = 0.8
+
+def normalize_name(name: str) -> str:
+    """Lowercases and collapses whitespace so spoken names match index keys."""
+    return " ".join(name.lower().replace("-", " ").replace("_", " ").split())
+
+def similarity(a: str, b: str) -> float:
+    """1 minus the Levenshtein distance over the longer length: 1.0 for equal names."""
+    previous = list(range(len(b) + 1))
+    for i, ch in enumerate(a, 1):
+        row = [i]
+        for j, other in enumerate(b, 1):
+            row.append(min(row[j - 1] + 1, previous[j] + 1, previous[j - 1] + (ch != other)))
+        previous = row
+    return 1.0 - previous[-1] / max(len(a), len(b), 1)
+
+def default_desktop_dirs() -> List[str]:
+    """Returns the XDG application directories on Linux."""
+    data_home = os.environ.get("XDG_DATA_HOME", os.path.expanduser("~/.local/share"))
+    data_dirs = os.environ.get("XDG_DATA_DIRS", "/usr/local/share:/usr/share").split(":")
+    dirs = [data_home] + data_dirs + ["/var/lib/flatpak/exports/share", os.path.expanduser("~/.local/share/flatpak/exports/share")]
+    return [os.path.join(d, "applications") for d in dirs if d]
+
+def default_shortcut_dirs() -> List[str]:
+    """Returns the Start Menu directories on Windows or /Applications on macOS."""
+    if sys.platform == "win32":
+        roots = [os.environ.get("APPDATA", ""), os.environ.get("PROGRAMDATA", "")]
+        return [os.path.join(r, "Microsoft", "Windows", "Start Menu", "Programs") for r in roots if r]
+    if sys.platform == "darwin":
+        return ["/Applications", "/System/Applications", os.path.expanduser("~/Applications")]
+    return []
+
+def parse_desktop_file(path: str) -> Optional[Dict[str, str]]:
+    """Reads Name and Exec from the [Desktop Entry] group of a .desktop file."""
+    fields = {}
+    in_entry = False
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("["):
+                    in_entry = line == "[Desktop Entry]"
+                    continue
+                if in_entry and "=" in line:
+                    key, value = line.split("=", 1)
+                    fields.setdefault(key.strip(), value.strip())
+    except OSError:
+        return None
+
+    if fields.get("Type", "Application") != "Application" or fields.get("NoDisplay", "").lower() == "true":
+        return None
+    if "Name" not in fields or "Exec" not in fields:
+        return None
+    command = " ".join(part for part in fields["Exec"].split() if part not in DESKTOP_FIELD_CODES)
+    return {"name": fields["Name"], "exec": command, "source": path}
+
+class AppTrie:
+    """Character trie over normalized app names.
+
+    Every node keeps its shortest few completions, so a prefix lookup costs
+    O(len(prefix)) regardless of how many apps are indexed. Fuzzy lookups walk
+    the trie with one Levenshtein row per node and prune branches whose row
+    minimum already exceeds the allowed distance.
+    """
+
+    def __init__(self, names: List[str]):
+        self.root = {}
+        for name in sorted(set(names), key=len):
+            node = self.root
+            for ch in name:
+                node = node.setdefault(ch, {})
+                completions = node.setdefault("", [])
+                if len(completions) < COMPLETIONS_PER_NODE:
+                    completions.append(name)
+            node["#name"] = name
+
+    def complete(self, prefix: str) -> List[str]:
+        node = self.root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return []
+        return list(node.get("", []))
+
+    def fuzzy(self, word: str, limit: int) -> Optional[str]:
+        """Returns the closest indexed name within limit edits, or None.
+
+        Branches sharing the first letter are searched first, since speech
+        recognition rarely gets that wrong; the rest of the trie is only
+        walked when they yield nothing.
+        """
+        best = [limit + 1, None]
+        first_row = list(range(len(word) + 1))
+
+        def walk(node, ch, previous):
+            row = [previous[0] + 1]
+            for j in range(1, len(word) + 1):
+                row.append(min(row[j - 1] + 1, previous[j] + 1, previous[j - 1] + (word[j - 1] != ch)))
+            if "#name" in node and row[-1] < best[0]:
+                best[0], best[1] = row[-1], node["#name"]
+            if min(row) < best[0]:
+                for next_ch, child in node.items():
+                    if len(next_ch) == 1:
+                        walk(child, next_ch, row)
+
+        if word and word[0] in self.root:
+            walk(self.root[word[0]], word[0], first_row)
+        if best[1] is None:
+            for ch, child in self.root.items():
+                if len(ch) == 1 and ch != word[:1]:
+                    walk(child, ch, first_row)
+        return best[1]
+
+class AppIndex:
+    """Index of installed applications built once and refreshed incrementally.
+
+    Sources are .desktop files and $PATH executables on Linux, Start Menu
+    shortcuts on Windows and application bundles on macOS. All directories can
+    be passed explicitly, so the index works without a desktop session.
+    Every entry records its source kind ("desktop", "shortcut" or "path").
+    $PATH executables only match their exact name: prefix and fuzzy matching
+    run over launcher entries alone, or "music" would find rustc and
+    "chrome" chroot.
+    """
+
+    def __init__(self, desktop_dirs: Optional[List[str]] = None, path_dirs: Optional[List[str]] = None,
+                 shortcut_dirs: Optional[List[str]] = None, aliases_path: str = ALIASES_PATH):
+        on_linux = sys.platform.startswith("linux")
+        self.desktop_dirs = desktop_dirs if desktop_dirs is not None else (default_desktop_dirs() if on_linux else [])
+        self.path_dirs = path_dirs if path_dirs is not None else (os.environ.get("PATH", "").split(os.pathsep) if on_linux else [])
+        self.shortcut_dirs = shortcut_dirs if shortcut_dirs is not None else default_shortcut_dirs()
+        self.aliases_path = aliases_path
+        self.aliases = self._load_aliases()
+        self.lock = threading.Lock()
+        self.dir_entries: Dict[str, Dict[str, dict]] = {}
+        self.dir_mtimes: Dict[str, float] = {}
+        self.entries: Dict[str, dict] = {}
+        self.trie = AppTrie([])
+        self.fuzzy_memo: Dict[str, Optional[str]] = {}
+        self.ready = threading.Event()
+
+    def _load_aliases(self) -> Dict[str, str]:
+        try:
+            with open(self.aliases_path, "r", encoding="utf-8") as f:
+                return load(f)
+        except (FileNotFoundError, JSONDecodeError):
+            return {}
+
+    def _scan_dir(self, directory: str, kind: str) -> Dict[str, dict]:
+        found = {}
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return found
+        for file_name in names:
+            path = os.path.join(directory, file_name)
+            if kind == "desktop" and file_name.endswith(".desktop"):
+                entry = parse_desktop_file(path)
+                if entry:
+                    found[normalize_name(entry["name"])] = entry
+                    found.setdefault(normalize_name(file_name[:-len(".desktop")].split(".")[-1]), entry)
+            elif kind == "path":
+                if os.path.isfile(path) and os.access(path, os.X_OK):
+                    found[normalize_name(file_name)] = {"name": file_name, "exec": shlex.quote(path), "source": path}
+            elif kind == "shortcut":
+                stem, extension = os.path.splitext(file_name)
+                if extension.lower() in (".lnk", ".url", ".app"):
+                    found[normalize_name(stem)] = {"name": stem, "exec": path, "source": path}
+                elif os.path.isdir(path) and extension == "":
+                    found.update(self._scan_dir(path, kind))
+        return found
+
+    def _sources(self):
+        # Earlier sources win on name clashes, so desktop entries shadow raw binaries
+        return ([(d, "desktop") for d in self.desktop_dirs] + [(d, "shortcut") for d in self.shortcut_dirs]
+                + [(d, "path") for d in self.path_dirs])
+
+    def refresh(self) -> bool:
+        """Rescans only directories whose mtime changed. Returns True if the index changed."""
+        changed = False
+        for directory, kind in self._sources():
+            try:
+                mtime = os.stat(directory).st_mtime
+            except OSError:
+                mtime = None
+            if mtime is None:
+                changed |= self.dir_entries.pop(directory, None) is not None
+                self.dir_mtimes.pop(directory, None)
+                continue
+            if self.dir_mtimes.get(directory) == mtime:
+                continue
+            self.dir_mtimes[directory] = mtime
+            scanned = self._scan_dir(directory, kind)
+            for entry in scanned.values():
+                entry["kind"] = kind
+            self.dir_entries[directory] = scanned
+            changed = True
+
+        if changed or not self.ready.is_set():
+            entries = {}
+            for directory, _ in self._sources():
+                for key, entry in self.dir_entries.get(directory, {}).items():
+                    entries.setdefault(key, entry)
+            trie = AppTrie([key for key, entry in entries.items() if entry["kind"] != "path"])
+            with self.lock:
+                self.entries, self.trie = entries, trie
+                self.fuzzy_memo = {}
+            self.ready.set()
+        return changed
+
+    def start(self, refresh_interval: float = 30.0) -> None:
+        """Builds the index in a daemon thread and keeps refreshing it."""
+        def worker():
+            while True:
+                try:
+                    self.refresh()
+                except Exception:
+                    pass
+                threading.Event().wait(refresh_interval)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def resolve(self, spoken: str, fuzzy: bool = True) -> Optional[dict]:
+        """Maps a spoken app name to an index entry via alias, exact, prefix or fuzzy match.
+
+        With fuzzy=False only an alias or exact name counts, which is what a
+        caller should require before acting on a name without asking.
+        """
+        query = normalize_name(spoken)
+        if not query:
+            return None
+        with self.lock:
+            entries, trie, memo = self.entries, self.trie, self.fuzzy_memo
+        alias = self.aliases.get(query)
+        # Aliases may only name launcher entries; older versions learned some for $PATH tools
+        if alias in entries and entries[alias]["kind"] != "path":
+            return entries[alias]
+        if query in entries:
+            return entries[query]
+        if not fuzzy or len(query) < MIN_PREFIX_LENGTH:
+            return None
+        completions = trie.complete(query)
+        if completions:
+            return entries[completions[0]]
+        if query not in memo:
+            if len(memo) >= FUZZY_MEMO_SIZE:
+                memo.clear()
+            limit = int(len(query) * (1 - FUZZY_RATIO))
+            match = trie.fuzzy(query, limit) if limit else None
+            memo[query] = match if match and similarity(query, match) >= FUZZY_RATIO else None
+        match = memo[query]
+        return entries[match] if match else None
+
+    def learn_alias(self, spoken: str, entry: dict) -> None:
+        """Remembers spoken → entry so the next identical command is an exact hit.
+
+        Only for names the user confirmed or that resolved without fuzzy
+        matching; a remembered guess would be repeated for good.
+        """
+        query, target = normalize_name(spoken), normalize_name(entry["name"])
+        if query == target or self.aliases.get(query) == target:
+            return
+        self.aliases.pop(query, None)
+        self.aliases[query] = target
+        while len(self.aliases) > MAX_ALIASES:
+            del self.aliases[next(iter(self.aliases))]
+        try:
+            os.makedirs(os.path.dirname(self.aliases_path) or ".", exist_ok=True)
+            with open(self.aliases_path, "w", encoding="utf-8") as f:
+                dump(self.aliases, f, indent=4)
+        except OSError:
+            pass
+
+# Launchers that run another program after their own options, with the options that take a separate value
+PASS_THROUGH_LAUNCHERS = {
+    "env": {"-u", "--unset", "-C", "--chdir"}, "nice": {"-n", "--adjustment"},
+    "ionice": {"-c", "--class", "-n", "--classdata"}, "nohup": set(), "setsid": set(),
+    "prime-run": set(), "gamemoderun": set(),
+}
+# Launchers whose process name cannot be told from the command line (a sandbox, a shell, another launcher)
+OPAQUE_LAUNCHERS = {"flatpak", "snap", "gtk-launch", "xdg-open", "gio", "sh", "bash", "dash", "zsh", "sudo", "pkexec"}
+
+def exec_argv(command: str) -> Optional[List[str]]:
+    """An Exec line split into arguments, or None when its quoting is malformed."""
+    try:
+        return shlex.split(command) or None
+    except ValueError:
+        return None
+
+def process_name(command: str) -> Optional[str]:
+    """The name the entry's program runs under, for pkill -x, or None when it cannot be known.
+
+    Pass-through launchers ('env LANG=C app', 'nice -n 5 app') are skipped
+    to reach the program; opaque ones ('flatpak run org.app.App', 'sh -c ...')
+    give None, so nothing is killed on a guess.
+    """
+    argv = exec_argv(command)
+    while argv:
+        program = os.path.basename(argv[0])
+        if program in OPAQUE_LAUNCHERS:
+            return None
+        if program not in PASS_THROUGH_LAUNCHERS:
+            return program
+        # Drop the launcher, its options (with their values) and environment assignments
+        value_options, argv = PASS_THROUGH_LAUNCHERS[program], argv[1:]
+        while argv and (argv[0].startswith("-") or (program == "env" and "=" in argv[0])):
+            if argv[0] in ("-S", "--split-string") or argv[0].startswith("--split-string="):
+                return None
+            argv = argv[2:] if argv[0] in value_options else argv[1:]
+    return None
+
+def launch_app(entry: dict) -> bool:
+    """Starts the application described by an index entry; False if its Exec line cannot be parsed."""
+    if sys.platform == "win32":
+        os.startfile(entry["exec"])
+    elif sys.platform == "darwin":
+        subprocess.Popen(["open", entry["exec"]])
+    else:
+        argv = exec_argv(entry["exec"])
+        if argv is None:
+            return False
+        subprocess.Popen(argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    return True
+
+def close_app(entry: dict) -> bool:
+    """Terminates processes started from the entry's executable (Linux and macOS).
+
+    False when nothing was closed, including when the process name is not
+    known (see process_name), so the caller can fall back to another way.
+    """
+    if sys.platform == "win32":
+        return False
+    program = process_name(entry["exec"])
+    if program is None:
+        return False
+    if sys.platform.startswith("linux"):
+        # The kernel keeps only the first 15 characters of a process name
+        program = program[:15]
+    return subprocess.run(["pkill", "-x", program], stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL).returncode == 0
+
+app_index = AppIndex()
+memory_budget.watch("app aliases", lambda: len(app_index.aliases), MAX_ALIASES)
+memory_budget.watch("app fuzzy memo", lambda: len(app_index.fuzzy_memo), FUZZY_MEMO_SIZE)
@@ -0,0 +1,97 @@
+import queue
+import logging
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
+
+# Capture format shared by every consumer of raw microphone audio
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+class AudioCapture:
+    """Single microphone reader that fans 20 ms int16 frames out to subscribers.
+
+    Wake-word detection, voice activity detection and barge-in all need the
+    raw signal at the same time, so one thread owns the device and every
+    consumer gets its own bounded queue. A slow consumer loses its oldest
+    frames instead of stalling the others.
+    """
+
+    def __init__(self, device_index: Optional[int] = None, queue_frames: int = 250):
+        self.device_index = device_index
+        self.queue_frames = queue_frames
+        self.subscribers: List[queue.Queue] = []
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = threading.Event()
+
+    @staticmethod
+    def available() -> bool:
+        return pyaudio is not None
+
+    def subscribe(self) -> queue.Queue:
+        """Returns a queue that receives every captured frame from now on."""
+        frames = queue.Queue(maxsize=self.queue_frames)
+        with self.lock:
+            self.subscribers.append(frames)
+        self.start()
+        return frames
+
+    def unsubscribe(self, frames: queue.Queue) -> None:
+        with self.lock:
+            if frames in self.subscribers:
+                self.subscribers.remove(frames)
+
+    def publish(self, frame: np.ndarray) -> None:
+        """Delivers a frame to all subscribers; also used to feed recorded audio."""
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for frames in subscribers:
+            if frames.full():
+                try:
+                    frames.get_nowait()
+                except queue.Empty:
+                    pass
+            frames.put_nowait(frame)
+
+    def start(self) -> None:
+        if self.thread is not None or pyaudio is None:
+            return
+        self.running.set()
+        self.thread = threading.Thread(target=self._reader, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.running.clear()
+
+    def _reader(self) -> None:
+        audio = pyaudio.PyAudio()
+        stream = None
+        try:
+            stream = audio.open(format=pyaudio.paInt16, channels=1, rate=SAMPLE_RATE, input=True,
+                                input_device_index=self.device_index, frames_per_buffer=FRAME_SAMPLES)
+            while self.running.is_set():
+                data = stream.read(FRAME_SAMPLES, exception_on_overflow=False)
+                self.publish(np.frombuffer(data, dtype=np.int16))
+        except OSError as e:
+            logging.error(f"Audio capture error: {e}")
+        finally:
+            if stream is not None:
+                stream.stop_stream()
+                stream.close()
+            audio.terminate()
+            self.thread = None
+
+def record(frames: queue.Queue, seconds: float) -> np.ndarray:
+    """Collects the given duration of audio from a subscriber queue."""
+    needed = int(seconds * 1000 / FRAME_MS)
+    return np.concatenate([frames.get() for _ in range(needed)])
+
+audio_capture = AudioCapture()
@@ -0,0 +1,400 @@
+"""Audio pipeline in worker processes: capture with VAD, recognition, synthesis and playback.
+
+Used by main.py when AudioRuntime=process is set in .env. Each stage runs
+as python -m Core.AudioRuntime <role> <shared block name>.
+"""
+import os
+import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+import subprocess
+from json import dumps, loads
+from multiprocessing import shared_memory
+from typing import IO, Optional
+
+import numpy as np
+
+from Core.AudioCapture import SAMPLE_RATE, FRAME_MS, FRAME_SAMPLES
+
+# Thirty seconds of microphone audio; an utterance longer than this loses its start
+RING_FRAMES = 30 * 1000 // FRAME_MS
+
+# Header of the shared block, one uint64 each
+FIELDS = ("written", "capacity", "frame_samples", "stop", "speaking", "interrupt", "listening", "cancelled")
+
+class SharedRing:
+    """Single-producer ring of fixed-size int16 frames in shared memory, plus control flags.
+
+    The producer writes frame n into slot n % capacity and then publishes
+    n + 1 as the write count, so readers in other processes never see a
+    half-written frame. Readers address frames by sequence number and get
+    numpy views straight into the shared block: a read copies nothing. A
+    frame more than capacity behind the write count has been overwritten,
+    and reads of it return None instead of the newer audio in its slot.
+    The header also holds the flags the workers coordinate through, so
+    barge-in reaches playback from capture without a message.
+    """
+
+    HEADER = 64
+
+    def __init__(self, shm: shared_memory.SharedMemory):
+        self.shm = shm
+        self.header = np.ndarray((len(FIELDS),), dtype=np.uint64, buffer=shm.buf, offset=0)
+        self.capacity = self.get("capacity")
+        self.frames = np.ndarray((self.capacity, self.get("frame_samples")), dtype=np.int16, buffer=shm.buf,
+                                 offset=self.HEADER)
+
+    @classmethod
+    def create(cls, capacity: int = RING_FRAMES, frame_samples: int = FRAME_SAMPLES) -> "SharedRing":
+        shm = shared_memory.SharedMemory(create=True, size=cls.HEADER + capacity * frame_samples * 2)
+        header = np.ndarray((len(FIELDS),), dtype=np.uint64, buffer=shm.buf)
+        header[:] = 0
+        header[FIELDS.index("capacity")] = capacity
+        header[FIELDS.index("frame_samples")] = frame_samples
+        del header
+        return cls(shm)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedRing":
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=name)
+            if os.name == "posix":
+                # Before Python 3.13 attaching registers the block too, and the worker's tracker would unlink it
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def get(self, field: str) -> int:
+        return int(self.header[FIELDS.index(field)])
+
+    def set(self, field: str, value: int) -> None:
+        self.header[FIELDS.index(field)] = value
+
+    @property
+    def written(self) -> int:
+        return int(self.header[0])
+
+    def write(self, frame: np.ndarray) -> int:
+        """Appends a frame and returns its sequence number."""
+        seq = self.written
+        self.frames[seq % self.capacity] = frame
+        self.header[0] = seq + 1
+        return seq
+
+    def held(self, seq: int) -> bool:
+        return 0 <= seq < self.written and self.written - seq <= self.capacity
+
+    def frame(self, seq: int) -> Optional[np.ndarray]:
+        """Zero-copy view of one frame; check held(seq) again after using it."""
+        return self.frames[seq % self.capacity] if self.held(seq) else None
+
+    def span(self, first: int, last: int) -> Optional[np.ndarray]:
+        """Frames first..last as one contiguous array (one copy), or None if any was overwritten."""
+        if not self.held(first) or last < first or last - first >= self.capacity:
+            return None
+        start, end = first % self.capacity, last % self.capacity
+        if start <= end:
+            audio = self.frames[start:end + 1].reshape(-1).copy()
+        else:
+            audio = np.concatenate([self.frames[start:].reshape(-1), self.frames[:end + 1].reshape(-1)])
+        return audio if self.held(first) else None
+
+    def close(self) -> None:
+        del self.header, self.frames
+        self.shm.close()
+
+    def unlink(self) -> None:
+        self.shm.unlink()
+
+def send(out: IO, *message) -> None:
+    out.write(dumps(message) + "\n")
+    out.flush()
+
+def messages(source: IO):
+    """Messages from a worker pipe until it is closed."""
+    for line in source:
+        if line.strip():
+            yield loads(line)
+
+def capture_worker(ring: SharedRing, source: IO, out: IO) -> None:
+    """Owns the microphone: writes every frame to the ring and runs endpointing and barge-in VAD.
+
+    Utterances are sent to the recognizer as frame ranges in the ring, so the
+    audio itself never goes through a pipe. While the assistant speaks, only
+    speech that clears the stricter barge-in detector counts, so the
+    assistant's own voice from the speakers neither interrupts it nor
+    becomes a query.
+    """
+    import pyaudio
+    from Core.VoiceInput import TRAILING_SILENCE_MS
+    from Core.VoiceActivity import VoiceActivityDetector
+
+    vad = VoiceActivityDetector(trailing_silence_ms=TRAILING_SILENCE_MS)
+    barge_vad = VoiceActivityDetector(min_speech_ms=200, energy_ratio=6.0)
+    accept = False
+    audio = pyaudio.PyAudio()
+    stream = audio.open(format=pyaudio.paInt16, channels=1, rate=SAMPLE_RATE, input=True,
+                        frames_per_buffer=FRAME_SAMPLES)
+    try:
+        while not ring.get("stop"):
+            frame = np.frombuffer(stream.read(FRAME_SAMPLES, exception_on_overflow=False), dtype=np.int16)
+            seq = ring.write(frame)
+            speaking = ring.get("speaking")
+            if speaking and ring.get("listening"):
+                if barge_vad.process(frame) == "start" and not ring.get("interrupt"):
+                    logging.info("Playback interrupted: user started speaking")
+                    ring.set("interrupt", 1)
+                    accept = True
+            elif not speaking:
+                barge_vad.reset()
+
+            event = vad.process(frame)
+            if event == "start":
+                accept = bool(ring.get("listening")) and (not speaking or bool(ring.get("interrupt")))
+            elif event == "end" and accept:
+                # The detector trimmed most of the trailing silence from the utterance
+                tail = vad.silence_run - min(vad.silence_run, vad.pre_roll.maxlen)
+                last = seq - tail
+                send(out, "utterance", last - len(vad.utterance) + 1, last)
+                accept = False
+    except OSError as e:
+        logging.error(f"Audio capture error: {e}")
+    finally:
+        stream.stop_stream()
+        stream.close()
+        audio.terminate()
+
+def recognition_worker(ring: SharedRing, source: IO, out: IO) -> None:
+    """Transcribes utterances read from the ring and reports the text."""
+    import speech_recognition as sr
+    from Core.VoiceInput import query_modifier, universal_translator, INPUT_LANGUAGE
+
+    recognizer = sr.Recognizer()
+    for _, first, last in messages(source):
+        audio = ring.span(first, last)
+        if audio is None:
+            logging.warning("Utterance overwritten before recognition")
+            continue
+        started = time.perf_counter()
+        try:
+            text = recognizer.recognize_google(sr.AudioData(audio.tobytes(), SAMPLE_RATE, 2), language=INPUT_LANGUAGE)
+            text = query_modifier(universal_translator(text))
+        except sr.UnknownValueError:
+            continue
+        except Exception as e:
+            logging.error(f"Recognition error: {e}")
+            continue
+        if text:
+            send(out, "transcript", text, time.perf_counter() - started)
+
+def synthesis_worker(ring: SharedRing, source: IO, out: IO) -> None:
+    """Synthesizes each answer sentence by sentence and queues the files for playback."""
+    import asyncio
+    from Core import Resilience
+    from Core.VoiceOutput import generate_audio, speech_parts, DATA_DIR, SPEECH_BUDGET
+
+    for _, turn, text in messages(source):
+        parts = [part for part in speech_parts(text) if part]
+        deadline = Resilience.Deadline(SPEECH_BUDGET)
+        for index, part in enumerate(parts):
+            if ring.get("cancelled") >= turn:
+                send(out, "play", turn, None, True)
+                break
+            path = DATA_DIR / f"Speech-{turn}-{index}.mp3"
+            try:
+                asyncio.run(generate_audio(part, path, deadline))
+            except Exception as e:
+                # Skip speaking rather than stall the turn; the answer is on screen
+                logging.error(f"Speech synthesis unavailable: {e}")
+                send(out, "play", turn, None, True)
+                break
+            send(out, "play", turn, str(path), index == len(parts) - 1)
+
+def playback_worker(ring: SharedRing, source: IO, out: IO) -> None:
+    """Plays synthesized files in order, stopping within a tick when interrupted."""
+    import pygame
+
+    pygame.mixer.init()
+    clock = pygame.time.Clock()
+    reported = 0
+    try:
+        for _, turn, path, last in messages(source):
+            # An interruption between two sentences of an answer also ends it
+            completed = ring.get("cancelled") < turn and not ring.get("interrupt")
+            if completed and path is not None:
+                ring.set("speaking", 1)
+                pygame.mixer.music.load(path)
+                pygame.mixer.music.play()
+                while pygame.mixer.music.get_busy():
+                    if ring.get("interrupt"):
+                        pygame.mixer.music.stop()
+                        completed = False
+                        break
+                    clock.tick(50)
+                pygame.mixer.music.unload()
+            if not completed:
+                ring.set("cancelled", max(ring.get("cancelled"), turn))
+            if path is not None:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            if (last or not completed) and turn > reported:
+                reported = turn
+                ring.set("speaking", 0)
+                send(out, "played", turn, completed)
+    finally:
+        pygame.mixer.quit()
+
+WORKERS = {
+    "capture": capture_worker,
+    "recognition": recognition_worker,
+    "synthesis": synthesis_worker,
+    "playback": playback_worker,
+}
+
+class AudioRuntime:
+    """Runs capture with VAD, recognition, synthesis and playback in four worker processes.
+
+    Each stage has its own interpreter, so none of them waits on the GIL
+    held by the UI or an LLM stream, and they run on separate cores. PCM
+    frames move through a shared-memory ring (SharedRing); everything else
+    is a JSON line over a pipe. Capture feeds recognition and synthesis
+    feeds playback directly, like a shell pipeline, so a busy main process
+    never sits between two audio stages.
+
+    listen() returns the next transcript; speak() plays an answer and
+    returns False if the user interrupted it. The interrupting utterance is
+    then the next transcript.
+    """
+
+    def __init__(self):
+        self.ring: Optional[SharedRing] = None
+        self.processes = {}
+        self.transcripts: "queue.Queue[str]" = queue.Queue()
+        self.played = {}
+        self.played_ready = threading.Condition()
+        self.turn = 0
+        self.speak_lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        try:
+            import pyaudio
+            import speech_recognition
+        except ImportError:
+            return False
+        return True
+
+    def _spawn(self, role: str, stdin=subprocess.PIPE) -> subprocess.Popen:
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'Core.AudioRuntime', role, self.ring.name],
+            stdin=stdin, stdout=subprocess.PIPE, text=True, encoding="utf-8",
+            env=dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1"), shell=False
+        )
+        self.processes[role] = process
+        return process
+
+    def start(self) -> "AudioRuntime":
+        self.ring = SharedRing.create()
+        capture = self._spawn("capture", stdin=subprocess.DEVNULL)
+        recognition = self._spawn("recognition", stdin=capture.stdout)
+        synthesis = self._spawn("synthesis")
+        playback = self._spawn("playback", stdin=synthesis.stdout)
+        # The pipes between two workers now belong to the worker reading them
+        capture.stdout.close()
+        synthesis.stdout.close()
+        for source in (recognition.stdout, playback.stdout):
+            threading.Thread(target=self._receive, args=(source,), daemon=True).start()
+        atexit.register(self.stop)
+        return self
+
+    def _receive(self, source: IO) -> None:
+        for message in messages(source):
+            if message[0] == "transcript":
+                logging.debug(f"Transcript after {message[2] * 1000:.0f}ms recognition")
+                self.transcripts.put(message[1])
+            elif message[0] == "played":
+                with self.played_ready:
+                    self.played[message[1]] = message[2]
+                    self.played_ready.notify_all()
+
+    def alive(self) -> bool:
+        return bool(self.processes) and all(process.poll() is None for process in self.processes.values())
+
+    def set_listening(self, enabled: bool) -> None:
+        self.ring.set("listening", 1 if enabled else 0)
+
+    def listen(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Next transcript, waiting up to timeout seconds (forever if None)."""
+        self.set_listening(True)
+        try:
+            return self.transcripts.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def speak(self, text: str) -> bool:
+        """Speaks text; returns False if playback was interrupted."""
+        if not text:
+            return True
+        with self.speak_lock:
+            self.turn += 1
+            turn = self.turn
+            self.ring.set("interrupt", 0)
+            send(self.processes["synthesis"].stdin, "speak", turn, text)
+            with self.played_ready:
+                while turn not in self.played:
+                    if not self.alive():
+                        return True
+                    self.played_ready.wait(0.5)
+                return self.played.pop(turn)
+
+    def interrupt(self) -> None:
+        """Stops the answer being spoken and drops any not yet synthesized."""
+        self.ring.set("cancelled", max(self.ring.get("cancelled"), self.turn))
+        self.ring.set("interrupt", 1)
+
+    def stop(self) -> None:
+        if self.ring is None:
+            return
+        self.ring.set("stop", 1)
+        # Closing the input ends synthesis, whose exit closes playback's input in turn
+        self.processes["synthesis"].stdin.close()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                process.terminate()
+        self.processes = {}
+        self.ring.close()
+        self.ring.unlink()
+        self.ring = None
+
+def main(argv=None) -> int:
+    from Core.LogPipeline import setup_logging
+
+    role, name = (argv or sys.argv[1:])[:2]
+    # Messages go out on the original stdout; anything else printed there ends up on stderr
+    out = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    setup_logging(os.path.join("Data", f"Audio{role.title()}.log"))
+    ring = SharedRing.attach(name)
+    try:
+        WORKERS[role](ring, sys.stdin, out)
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+    finally:
+        ring.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
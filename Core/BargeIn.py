@@ -0,0 +1,94 @@
+import logging
+import threading
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from Core.AudioCapture import audio_capture
+from Core.VoiceActivity import VoiceActivityDetector
+
+class BargeInMonitor:
+    """Watches the microphone while the assistant speaks and flags user speech.
+
+    Pass monitor.callback to text_to_speech(); it turns False as soon as voice
+    activity is detected or the mic is switched off, which stops playback on
+    the next mixer tick. The VAD is stricter than the one used for capture
+    (higher energy ratio, longer minimum speech) so that the assistant's own
+    voice leaking from the speakers does not interrupt it.
+
+    The audio that triggered the interruption is kept, so the next capture
+    can start from it instead of losing the first words of the user's turn.
+    """
+
+    def __init__(self, mic_enabled: Callable[[], bool] = lambda: True,
+                 energy_ratio: float = 6.0, min_speech_ms: int = 200, mic_poll_frames: int = 10):
+        self.mic_enabled = mic_enabled
+        self.energy_ratio = energy_ratio
+        self.min_speech_ms = min_speech_ms
+        self.mic_poll_frames = mic_poll_frames
+        self.interrupted = threading.Event()
+        self.stopped = threading.Event()
+        self.captured: List[np.ndarray] = []
+        self.thread: Optional[threading.Thread] = None
+        self.calls = 0
+
+    def __enter__(self) -> "BargeInMonitor":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self.interrupted.clear()
+        self.stopped.clear()
+        self.captured = []
+        if not audio_capture.available():
+            return
+        self.thread = threading.Thread(target=self._watch, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout=0.5)
+            self.thread = None
+
+    def callback(self) -> bool:
+        """Playback keeps going while this returns True."""
+        if self.thread is None:
+            # No raw audio available: the mic toggle is the only barge-in signal
+            self.calls += 1
+            if self.calls % self.mic_poll_frames == 0 and not self.mic_enabled():
+                self.interrupted.set()
+        return not self.interrupted.is_set()
+
+    def handoff(self) -> Optional[List[np.ndarray]]:
+        """Returns the frames captured around the interruption, if one happened."""
+        return self.captured if self.interrupted.is_set() else None
+
+    def _watch(self) -> None:
+        frames = audio_capture.subscribe()
+        vad = VoiceActivityDetector(min_speech_ms=self.min_speech_ms, energy_ratio=self.energy_ratio)
+        seen = 0
+        try:
+            while not self.stopped.is_set():
+                try:
+                    frame = frames.get(timeout=0.1)
+                except Exception:
+                    continue
+                if self.interrupted.is_set():
+                    # Keep recording until stop() so nothing is lost before the next capture starts
+                    self.captured.append(frame)
+                    continue
+                seen += 1
+                if seen % self.mic_poll_frames == 0 and not self.mic_enabled():
+                    logging.info("Playback interrupted: microphone switched off")
+                    self.interrupted.set()
+                    return
+                if vad.process(frame) == "start":
+                    logging.info("Playback interrupted: user started speaking")
+                    self.captured = list(vad.utterance)
+                    self.interrupted.set()
+        finally:
+            audio_capture.unsubscribe(frames)
@@ -1,10 +1,18 @@
 import time
-from groq import Groq
 from json import load, dump
 import datetime
 from dotenv import load_dotenv
 import os
 import re
+from typing import Callable, List, Optional, Tuple
+from Core.LLMClient import llm_client
+from Core.QueryClassifier import SYSTEM_PROMPT as CLASSIFIER_PROMPT, classify_user_query, parse_tasks
+from Core.ModelRouter import model_router
+from Core.AnswerCache import answer_cache
+from Core.HistoryIndex import history_index
+from Core.Tracing import tracer
+from Core.PromptBuilder import prompt_builder, trim_history
+from Core.Resilience import CircuitOpenError, DeadlineExceeded
 
 # Load environment variables
 load_dotenv()
@@ -15,9 +23,6 @@ GROQ_API_KEY = os.getenv("GroqAPIKey")
 if not GROQ_API_KEY:
     raise ValueError("GROQ_API_KEY not found in .env file")
 
-# Initialize Groq client
-client = Groq(api_key=GROQ_API_KEY)
-
 # System prompt for chatbot
 SYSTEM_PROMPT = f"""
 Hello, I am {USERNAME}, and you are {ASSISTANT_NAME}, an advanced AI chatbot with real-time information. Answer my queries concisely in English, even if the query is in another language. Do not provide time/date unless asked, and avoid excessive details or notes. Just answer the question and call me Sir.
@@ -35,6 +40,9 @@ except FileNotFoundError:
     with open(CHAT_LOG_PATH, "w") as f:
         dump([], f)
 
+# Older turns are recalled from the history index; seed it from the log on first use
+history_index.seed(chat_history)
+
 def get_real_time_info() -> str:
     """Provides real-time date and time information."""
     current_date_time = datetime.datetime.now()
@@ -65,8 +73,69 @@ def is_valid_query(query: str) -> bool:
     """Validates if the query is suitable for processing."""
     return not re.match(r".*[\\/].*\.exe|.*[\\/].*\.py|&.*", query)
 
-def answer_query(query: str, max_retries: int = 3) -> str:
-    """Sends the user's query to the Groq API and returns the response."""
+# Classification and answer in one completion: a TASKS header line, then the answer if everything is general
+COMBINED_PROMPT = f"""{CLASSIFIER_PROMPT.strip()}
+
+Reply format for this conversation:
+- First line: 'TASKS: ' followed by the classification of the latest query, exactly as described above.
+- Only if every task is 'general': continue with a line 'ANSWER:' and then answer the query as the assistant described below.
+- Otherwise stop right after the first line.
+
+{SYSTEM_PROMPT.strip()}
+"""
+
+def record_answer(response_text: str, history: List[dict]) -> None:
+    """Adds the assistant's reply to the history and keeps at most the last 10 messages.
+
+    Only the desktop conversation (the module's chat_history) is persisted
+    and indexed for later recall.
+    """
+    history.append({"role": "assistant", "content": response_text})
+    if history is chat_history and len(history) > 1 and history[-2]["role"] == "user":
+        history_index.add(history[-2]["content"], response_text)
+    trim_history(history)
+    if history is chat_history:
+        with open(CHAT_LOG_PATH, "w") as f:
+            dump(history, f, indent=4)
+
+def cached_answer(query: str, history: List[dict]) -> Optional[str]:
+    """Answers a near-duplicate of an earlier general question from the local cache."""
+    started = time.perf_counter()
+    with tracer.span("answer.cache"):
+        cached = answer_cache.get(query)
+    if cached is not None:
+        # A turn's breakdown then shows that its answer came from the cache
+        tracer.record("answer.cache.hit", time.perf_counter() - started)
+        history.append({"role": "user", "content": query})
+        record_answer(cached, history)
+    return cached
+
+def recalled_context(query: str, history: List[dict]) -> List[dict]:
+    """Earlier exchanges relevant to the query that are no longer in the history window."""
+    if history is not chat_history:
+        return []
+    with tracer.span("history.recall"):
+        recalled = history_index.recall(query, skip_recent=len(history) // 2)
+    return [{"role": "system", "content": recalled}] if recalled else []
+
+def previous_answer(query: str, history: List[dict]) -> str:
+    """Returns the last answer given to exactly this query, if it is still in the history."""
+    for index in range(len(history) - 2, -1, -1):
+        message = history[index]
+        reply = history[index + 1]
+        if message["role"] == "user" and reply["role"] == "assistant" and message["content"].strip().lower() == query.lower():
+            return reply["content"]
+    return ""
+
+def answer_query(query: str, max_retries: int = 3, history: Optional[List[dict]] = None,
+                 on_token: Optional[Callable[[str], None]] = None) -> str:
+    """Sends the user's query to the Groq API and returns the response.
+
+    history defaults to the desktop conversation; pass a session's own list to
+    keep conversations apart. on_token receives the answer as it streams in.
+    """
+    history = chat_history if history is None else history
+
     # Sanitize and validate input
     query = query.strip()
     if not query:
@@ -75,46 +144,139 @@ def answer_query(query: str, max_retries: int = 3) -> str:
     if not is_valid_query(query):
         return "Invalid query. Please avoid command-line inputs."
 
+    cached = cached_answer(query, history)
+    if cached is not None:
+        if on_token is not None:
+            on_token(cached)
+        return cached
+
     # Update chat history
-    chat_history.append({"role": "user", "content": query})
+    history.append({"role": "user", "content": query})
+
+    try:
+        # Call Groq API; transient failures are retried within the turn's deadline
+        completion = llm_client.stream(
+            "llm.answer",
+            attempts=max_retries,
+            task="answer",
+            expected_tokens=model_router.expected_tokens(query),
+            messages=prompt_builder.build(
+                "llm.answer",
+                static=[prompt_builder.static("chatbot.system", SYSTEM_PROMPT)],
+                history=history[:-1],
+                volatile=recalled_context(query, history) + [{"role": "system", "content": get_real_time_info()}],
+                query=history[-1]
+            ),
+            max_tokens=1024,
+            temperature=0.7
+        )
+
+        # Process stream; chunks are joined once at the end rather than copied on every token
+        parts = []
+        for chunk in completion:
+            if chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                if on_token is not None:
+                    on_token(chunk.choices[0].delta.content.replace("</s>", ""))
+
+        response_text = "".join(parts).replace("</s>", "").strip()
+        if not response_text:
+            history.pop()
+            return "No response received. Please try again."
+
+        record_answer(response_text, history)
+        answer_cache.put(query, clean_response(response_text))
+        return clean_response(response_text)
+
+    except (CircuitOpenError, DeadlineExceeded):
+        # The model is known to be down; answer from history if possible instead of waiting
+        history.pop()
+        return previous_answer(query, history) or "I can't reach my language service right now, Sir. Please try again shortly."
+    except Exception:
+        history.pop()
+        return previous_answer(query, history) or "An unexpected error occurred. Please try again."
 
-    for attempt in range(max_retries):
+def classify_and_answer(query: str, max_retries: int = 3, history: Optional[List[dict]] = None,
+                        classifier_history: Optional[List[dict]] = None) -> Tuple[List[str], Optional[str]]:
+    """Classifies the query and, when it is purely general, answers it in the same completion.
+
+    Returns the tasks and the answer. The answer is None when the query needs
+    other handling; the stream is then closed as soon as the TASKS line is in.
+    Falls back to classify_user_query() if the reply does not follow the format.
+    """
+    history = chat_history if history is None else history
+    query = query.strip()
+    if not query or not is_valid_query(query):
+        return classify_user_query(query, history=classifier_history), None
+
+    # Only general answers are cached, so a hit is a general query
+    cached = cached_answer(query, history)
+    if cached is not None:
+        return [f"general {query}"], cached
+
+    history.append({"role": "user", "content": query})
+    header = ""
+    answer_parts = []
+    tasks = None
+    failed = False
+    try:
+        completion = llm_client.stream(
+            "llm.combined",
+            attempts=max_retries,
+            task="answer",
+            expected_tokens=model_router.expected_tokens(query),
+            messages=prompt_builder.build(
+                "llm.combined",
+                static=[prompt_builder.static("chatbot.combined", COMBINED_PROMPT)],
+                history=history[:-1],
+                volatile=recalled_context(query, history) + [{"role": "system", "content": get_real_time_info()}],
+                query=history[-1]
+            ),
+            max_tokens=1024,
+            temperature=0.7
+        )
         try:
-            # Call Groq API
-            completion = client.chat.completions.create(
-                model="llama3-70b-8192",
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "system", "content": get_real_time_info()},
-                    *chat_history
-                ],
-                max_tokens=1024,
-                temperature=0.7,
-                stream=True
-            )
-
-            # Process stream
-            response_text = ""
             for chunk in completion:
-                if chunk.choices[0].delta.content:
-                    response_text += chunk.choices[0].delta.content
-
-            response_text = response_text.replace("</s>", "").strip()
-            if not response_text:
-                return "No response received. Please try again."
+                text = chunk.choices[0].delta.content
+                if not text:
+                    continue
+                if tasks is not None:
+                    answer_parts.append(text)
+                    continue
+                header += text
+                if "\n" not in header:
+                    if len(header) > 400:
+                        break
+                    continue
+                line, _, rest = header.partition("\n")
+                answer_parts.append(rest)
+                if not line.strip().upper().startswith("TASKS:"):
+                    break
+                tasks = parse_tasks(line.split(":", 1)[1], query)
+                if not all(task.startswith("general") for task in tasks):
+                    # Not ours to answer: stop paying for tokens and route elsewhere
+                    break
+        finally:
+            completion.close()
+    except Exception:
+        # A half-streamed answer is not worth keeping; answer_query() gets another go
+        failed = True
 
-            # Update chat history
-            chat_history.append({"role": "assistant", "content": response_text})
-            if len(chat_history) > 10:
-                chat_history[:] = chat_history[-10:]
-            with open(CHAT_LOG_PATH, "w") as f:
-                dump(chat_history, f, indent=4)
+    if tasks is None and header.strip().upper().startswith("TASKS:") and "\n" not in header.strip():
+        # The model stopped right after the header, as asked for non-general queries
+        tasks = parse_tasks(header.split(":", 1)[1], query)
+    history.pop()
+    if tasks is None:
+        return classify_user_query(query, history=classifier_history), None
 
-            return clean_response(response_text)
+    answer = re.sub(r"^\s*ANSWER:\s*", "", "".join(answer_parts).replace("</s>", ""), flags=re.I).strip()
+    if failed or not answer or not all(task.startswith("general") for task in tasks):
+        return tasks, None
 
-        
-        except Exception:
-            return "An unexpected error occurred. Please try again."
+    history.append({"role": "user", "content": query})
+    record_answer(answer, history)
+    answer_cache.put(query, clean_response(answer))
+    return tasks, clean_response(answer)
 
 if __name__ == "__main__":
     while True:
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, List, Optional, Set
+
+@dataclass
+class CommandResult:
+    """Outcome of one automation command."""
+    command: str
+    status: str  # "ok", "failed", "error", "timeout" or "cancelled"
+    elapsed: float
+    value: Any = None
+    error: str = ""
+
+class CommandExecutor:
+    """Runs blocking automation commands with a worker cap and a per-command deadline.
+
+    Results are yielded in completion order. A command that overruns its
+    deadline is reported as a timeout and abandoned; its thread cannot be
+    killed, so the pool keeps spare threads to stop a hung launch from
+    starving later batches. The pool is private rather than the loop's default
+    executor, so asyncio.run() never waits on an abandoned thread at shutdown.
+    """
+
+    def __init__(self, max_workers: int = 4, deadline: float = 15.0):
+        self.max_workers = max_workers
+        self.deadline = deadline
+        self.pool = ThreadPoolExecutor(max_workers=max_workers * 2, thread_name_prefix="automation")
+        # One cancel flag per run() in progress, so a cancel never leaks into a batch started after it
+        self.runs: Set[threading.Event] = set()
+        self.lock = threading.Lock()
+
+    def cancel(self) -> None:
+        """Stops the commands of every running batch that have not started yet; running ones are abandoned."""
+        with self.lock:
+            for cancelled in self.runs:
+                cancelled.set()
+
+    async def _run_one(self, semaphore: asyncio.Semaphore, cancelled: threading.Event, command: str,
+                       func: Callable, args: tuple, deadline: Optional[float] = None) -> CommandResult:
+        deadline = self.deadline if deadline is None else deadline
+        async with semaphore:
+            start = time.perf_counter()
+            if cancelled.is_set():
+                return CommandResult(command, "cancelled", 0.0)
+            loop = asyncio.get_running_loop()
+            try:
+                value = await asyncio.wait_for(loop.run_in_executor(self.pool, func, *args), deadline)
+                status = "failed" if value is False else "ok"
+                return CommandResult(command, status, time.perf_counter() - start, value)
+            except asyncio.TimeoutError:
+                return CommandResult(command, "timeout", time.perf_counter() - start,
+                                     error=f"exceeded {deadline}s deadline")
+            except Exception as e:
+                return CommandResult(command, "error", time.perf_counter() - start, error=str(e))
+
+    async def run(self, jobs: List[tuple]) -> AsyncIterator[CommandResult]:
+        """Runs (command, func, args) jobs and yields their results as they finish.
+
+        A job may add a fourth item, its own deadline in seconds, for work
+        that is slow by nature rather than hung.
+        """
+        cancelled = threading.Event()
+        with self.lock:
+            self.runs.add(cancelled)
+        semaphore = asyncio.Semaphore(self.max_workers)
+        tasks = [asyncio.create_task(self._run_one(semaphore, cancelled, *job)) for job in jobs]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            with self.lock:
+                self.runs.discard(cancelled)
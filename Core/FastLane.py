@@ -0,0 +1,145 @@
+import re
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from Core.Tracing import tracer
+
+# Words around a command that do not change it
+FILLER = re.compile(r"^(?:(?:jarvis|please|hey|ok|okay|can you|could you|would you|now)\s+)+"
+                    r"|(?:\s+(?:please|jarvis|now|for me))+$")
+
+# A remainder made only of these words is not worth a turn
+FILLER_WORDS = frozenset({"jarvis", "please", "hey", "ok", "okay", "now", "thanks", "thank", "you"})
+
+# Clause boundaries in an utterance; the separators are kept so a remainder reads like the original
+CLAUSE = re.compile(r"(\s*(?:,|;|\band then\b|\bthen\b|\band\b)\s*)")
+
+# Commands whose object can be a list: 'close chrome and firefox' is one clause, not two
+LIST_COMMAND = re.compile(r"^\W*(?:(?:jarvis|please|hey|ok|okay|can you|could you|would you|now)\s+)*close\b", re.I)
+LIST_SEPARATORS = frozenset({",", "and"})
+
+# (kind, pattern, argument); the argument is a string or the group the pattern captures
+LOCAL_COMMANDS: List[Tuple[str, re.Pattern, Any]] = [
+    ("system", re.compile(r"(?:turn |set )?(?:the )?(?:volume|sound) (up|down)(?: a bit| a little)?"), 1),
+    ("system", re.compile(r"turn (up|down) (?:the )?(?:volume|sound)"), 1),
+    ("system", re.compile(r"(?:increase|raise) (?:the )?(?:volume|sound)|(?:be )?louder"), "volume up"),
+    ("system", re.compile(r"(?:decrease|lower|reduce) (?:the )?(?:volume|sound)|(?:be )?(?:quieter|softer)"),
+     "volume down"),
+    ("system", re.compile(r"(un)?mute(?: the)?(?: volume| sound| audio| speakers?)?"), None),
+    ("mic", re.compile(r"(?:go to )?sleep|stop listening|(?:turn |switch )?(?:the )?(?:mic|microphone) off"
+                       r"|(?:turn |switch )off (?:the )?(?:mic|microphone)"), "off"),
+    ("mic", re.compile(r"wake up|start listening|(?:turn |switch )?(?:the )?(?:mic|microphone) on"
+                       r"|(?:turn |switch )on (?:the )?(?:mic|microphone)"), "on"),
+    ("debug", re.compile(r"(?:show |give me )?(?:a |the |your )?memory (?:report|usage|stats)"
+                          r"|how much memory (?:are you using|do you use)"), "memory"),
+    ("close", re.compile(r"close (?:the )?(?!it$|this$|that$|everything$|all$|.*\band\b)([a-z0-9][a-z0-9 .+-]{0,30}?)"
+                         r"(?: app| application| window)?"), 1),
+]
+
+def match_local(clause: str) -> Optional[Tuple[str, str]]:
+    """The (kind, argument) of a clause that is a local command in its entirety, else None."""
+    clause = FILLER.sub("", re.sub(r"[^a-z0-9 .+-]", "", clause.lower()).strip(" .")).strip()
+    for kind, pattern, argument in LOCAL_COMMANDS:
+        match = pattern.fullmatch(clause)
+        if match is None:
+            continue
+        if argument is None:
+            return kind, "unmute" if match.group(1) else "mute"
+        if isinstance(argument, int):
+            value = match.group(argument).strip()
+            return kind, f"volume {value}" if kind == "system" else value
+        return kind, argument
+    return None
+
+def accepted(command: Tuple[str, str], accept=None) -> bool:
+    check = (accept or {}).get(command[0])
+    return check is None or bool(check(command[1]))
+
+def split_local(text: str, kinds=None, accept=None) -> Tuple[List[Tuple[str, str]], str]:
+    """Splits an utterance into local commands and the rest.
+
+    'mute and tell me a joke' gives ([('system', 'mute')], 'tell me a joke').
+    A clause only counts when all of it is a command, so anything unclear
+    is left for the classifier, and so is a close with a list of objects
+    ('close chrome and firefox'). accept maps a kind to a check on its
+    argument; a command that fails it stays in the rest as well. With no
+    local commands the text comes back unchanged.
+    """
+    parts = CLAUSE.split(text)
+    pieces = []
+    for separator, clause in zip([""] + parts[1::2], parts[0::2]):
+        if pieces and separator.strip().lower() in LIST_SEPARATORS and LIST_COMMAND.match(pieces[-1][1]):
+            pieces[-1] = (pieces[-1][0], pieces[-1][1] + separator + clause)
+        else:
+            pieces.append((separator, clause))
+    commands, rest = [], []
+    for separator, clause in pieces:
+        command = match_local(clause)
+        if command is not None and (kinds is None or command[0] in kinds) and accepted(command, accept):
+            commands.append(command)
+        elif clause.strip():
+            rest.append(separator + clause if rest else clause)
+    if not commands:
+        return [], text
+    rest = "".join(rest).strip()
+    if set(re.findall(r"[a-z]+", rest.lower())) <= FILLER_WORDS:
+        rest = ""
+    return commands, rest
+
+class FastLane:
+    """Runs locally resolvable commands at once, ahead of any LLM or search work.
+
+    Volume keys, closing apps, switching the mic off or on and debug
+    reports need neither the classifier nor the network. route() takes them
+    out of an utterance as soon as it is transcribed and hands them to a
+    dedicated worker thread that is already running, so they never wait for
+    a model round trip, a fresh event loop or the automation pool. One
+    worker keeps them in the order they were said. accept holds optional
+    per-kind checks on the argument (is there such an app to close?); a
+    command that fails its check is left to the classifier. Latency is recorded as fastlane.queue (waiting for
+    the worker), fastlane.action and fastlane.total (from transcript to done).
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[[str], Any]],
+                 accept: Optional[Dict[str, Callable[[str], bool]]] = None):
+        self.handlers = handlers
+        self.accept = accept or {}
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fast-lane")
+
+    def route(self, text: str) -> str:
+        """Dispatches the local commands in an utterance and returns what is left of it."""
+        received = time.perf_counter()
+        commands, rest = split_local(text, self.handlers, self.accept)
+        for kind, argument in commands:
+            self.dispatch(kind, argument, received)
+        return rest
+
+    def local_task(self, task: str) -> Optional[Tuple[str, str]]:
+        """The (kind, argument) of a classified task ('system mute', 'close chrome') this lane can run."""
+        kind, _, argument = task.partition(" ")
+        if kind not in self.handlers or not argument:
+            return None
+        command = match_local(task if kind == "close" else argument)
+        if command is None or command[0] != kind or not accepted(command, self.accept):
+            return None
+        return command
+
+    def dispatch(self, kind: str, argument: str, received: Optional[float] = None) -> Future:
+        return self.pool.submit(self._run, kind, argument, received or time.perf_counter())
+
+    def _run(self, kind: str, argument: str, received: float) -> Any:
+        started = time.perf_counter()
+        tracer.record("fastlane.queue", started - received)
+        try:
+            result = self.handlers[kind](argument)
+        except Exception as e:
+            logging.error(f"Fast lane '{kind} {argument}' failed: {e}")
+            result = False
+        finished = time.perf_counter()
+        tracer.record("fastlane.action", finished - started)
+        tracer.record("fastlane.total", finished - received)
+        logging.info(f"Fast lane '{kind} {argument}': {'failed' if result is False else 'ok'} "
+                     f"in {(finished - received) * 1000:.1f}ms")
+        return result
@@ -0,0 +1,240 @@
+import os
+import re
+import math
+import time
+import heapq
+import threading
+from collections import Counter, deque
+from functools import lru_cache
+from json import dumps, loads, JSONDecodeError
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import dotenv_values
+
+from Core.PromptBuilder import estimate_tokens
+from Core.MemoryBudget import memory_budget
+
+# Paths
+INDEX_PATH = os.path.join("Data", "HistoryIndex.jsonl")
+
+env_vars = dotenv_values(".env")
+HistoryRecallK = int(env_vars.get("HistoryRecallK", 3))
+HistoryRecallTokens = int(env_vars.get("HistoryRecallTokens", 300))
+HistoryIndexSize = int(env_vars.get("HistoryIndexSize", 20000))
+
+STOPWORDS = frozenset("""a an the and or but if then of to in on at by for with about from as into is are was were be been
+being am do does did have has had i me my you your he she it its we our they them their this that these those what which
+who whom whose when where why how can could would should will shall may might must not no so just than too very sir
+please tell know""".split())
+
+WORD = re.compile(r"[a-z0-9]{2,}")
+
+@lru_cache(maxsize=8192)
+def stem(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word[-1] == "s" and word[-2] != "s" else word
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words without stopwords, with a plural 's' removed."""
+    return [stem(word) for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+class HistoryIndex:
+    """BM25 index over every past exchange, for recalling old turns into the prompt.
+
+    Each exchange (a user message and the reply to it) is one document. The
+    inverted index maps a term to the exchanges containing it and how often,
+    so a lookup only touches the postings of the query's terms. Exchanges are
+    appended to Data/HistoryIndex.jsonl as they happen and the index is
+    rebuilt from that file on start, on a background thread; until it is
+    ready, searches find nothing rather than hold up the turn.
+    Only the newest max_documents exchanges are kept: once a tenth more have
+    been added, the index and its file are rebuilt from the newest ones on a
+    background thread, so memory stays flat however long it runs.
+    """
+
+    def __init__(self, path: str = INDEX_PATH, k1: float = 1.2, b: float = 0.75,
+                 max_documents: int = HistoryIndexSize):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.max_documents = max_documents
+        self.documents: List[dict] = []
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.lengths: List[int] = []
+        self.total_length = 0
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.compacting = False
+        threading.Thread(target=self._load, name="history-index", daemon=True).start()
+
+    def _load(self) -> None:
+        try:
+            with self.lock:
+                lines, total = deque(maxlen=self.max_documents), 0
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for total, line in enumerate(f, 1):
+                        lines.append(line)
+                documents = []
+                for line in lines:
+                    try:
+                        documents.append(loads(line))
+                    except JSONDecodeError:
+                        continue
+                self._rebuild(documents)
+                if total > self.max_documents:
+                    self._rewrite()
+        except FileNotFoundError:
+            pass
+        finally:
+            self.ready.set()
+
+    def _rebuild(self, documents: List[dict]) -> None:
+        self.documents, self.postings, self.lengths, self.total_length = self._build(documents)
+
+    @staticmethod
+    def _build(documents: List[dict]) -> Tuple[List[dict], Dict[str, Dict[int, int]], List[int], int]:
+        """A fresh (documents, postings, lengths, total_length) for these documents."""
+        built, postings, lengths = [], {}, []
+        for document in documents:
+            try:
+                HistoryIndex._index(document, built, postings, lengths)
+            except KeyError:
+                continue
+        return built, postings, lengths, sum(lengths)
+
+    def _write(self, documents: List[dict]) -> str:
+        """Writes documents to a temporary file next to the index file and returns its path."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("".join(dumps(document) + "\n" for document in documents))
+        return temp_path
+
+    def _rewrite(self) -> None:
+        os.replace(self._write(self.documents), self.path)
+
+    def _compact(self) -> None:
+        """Drops all but the newest max_documents exchanges from the index and its file.
+
+        The new index and file are built without the lock, so searches and
+        adds carry on meanwhile; the lock is only taken to swap them in and
+        to index the exchanges added since.
+        """
+        try:
+            with self.lock:
+                count = len(self.documents)
+                kept = self.documents[max(0, count - self.max_documents):count]
+            built = self._build(kept)
+            temp_path = self._write(built[0])
+            with self.lock:
+                added = self.documents[count:]
+                self.documents, self.postings, self.lengths, self.total_length = built
+                for document in added:
+                    self._insert(document)
+                if added:
+                    with open(temp_path, "a", encoding="utf-8") as f:
+                        f.write("".join(dumps(document) + "\n" for document in added))
+                os.replace(temp_path, self.path)
+        except OSError:
+            pass
+        finally:
+            self.compacting = False
+
+    @staticmethod
+    def _index(document: dict, documents: List[dict], postings: Dict[str, Dict[int, int]],
+               lengths: List[int]) -> int:
+        """Adds a document to an index's structures and returns its length in terms."""
+        doc_id = len(documents)
+        terms = Counter(tokenize(f"{document['user']} {document['assistant']}"))
+        documents.append(document)
+        lengths.append(sum(terms.values()))
+        for term, count in terms.items():
+            if term in postings:
+                postings[term][doc_id] = count
+            else:
+                postings[term] = {doc_id: count}
+        return lengths[-1]
+
+    def _insert(self, document: dict) -> None:
+        self.total_length += self._index(document, self.documents, self.postings, self.lengths)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, user: str, assistant: str) -> None:
+        document = {"time": time.time(), "user": user, "assistant": assistant}
+        self.ready.wait()
+        with self.lock:
+            self._insert(document)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(dumps(document) + "\n")
+            if len(self.documents) > self.max_documents * 1.1 and not self.compacting:
+                self.compacting = True
+                threading.Thread(target=self._compact, name="history-index-compact", daemon=True).start()
+
+    def add_history(self, history: List[dict]) -> None:
+        """Indexes the user/assistant pairs of a message list, e.g. to seed from ChatLog.json."""
+        for message, reply in zip(history, history[1:]):
+            if message["role"] == "user" and reply["role"] == "assistant":
+                self.add(message["content"], reply["content"])
+
+    def seed(self, history: List[dict]) -> None:
+        """Indexes history in the background once loading is done, if the index turned out empty."""
+        history = list(history)
+
+        def worker():
+            self.ready.wait()
+            if not self.documents:
+                self.add_history(history)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def search(self, query: str, k: int = HistoryRecallK, skip_recent: int = 0) -> List[dict]:
+        """The k exchanges most relevant to the query, best first.
+
+        The newest skip_recent exchanges are left out, since they are already
+        in the prompt as history.
+        """
+        terms = set(tokenize(query))
+        if not self.ready.is_set():
+            return []
+        with self.lock:
+            count = len(self.documents) - skip_recent
+            if not terms or count <= 0:
+                return []
+            average = self.total_length / len(self.documents) or 1.0
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (len(self.documents) - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    if doc_id < count:
+                        norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / average)
+                        scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [{**self.documents[doc_id], "score": score} for doc_id, score in best]
+
+    def recall(self, query: str, k: int = HistoryRecallK, skip_recent: int = 0,
+               max_tokens: int = HistoryRecallTokens) -> Optional[str]:
+        """Relevant earlier exchanges as one prompt block within max_tokens, or None."""
+        lines, used = [], 0
+        for document in self.search(query, k, skip_recent):
+            when = time.strftime("%d %B %Y", time.localtime(document["time"]))
+            line = f"[{when}] User: {document['user']}\nAssistant: {document['assistant']}"
+            tokens = estimate_tokens(line)
+            if used + tokens > max_tokens:
+                # Keep the start of the exchange, where the question and the gist of the answer are
+                line = line[:max(0, (max_tokens - used) * 4)].rsplit(" ", 1)[0]
+                tokens = estimate_tokens(line)
+                if not line or used + tokens > max_tokens:
+                    break
+            lines.append(line)
+            used += tokens
+        if not lines:
+            return None
+        return "Relevant parts of earlier conversations (use only if they help):\n" + "\n\n".join(lines)
+
+history_index = HistoryIndex()
+memory_budget.watch("history index", history_index.__len__, history_index.max_documents)
@@ -0,0 +1,318 @@
+import os
+import time
+import queue
+import logging
+import threading
+from json import loads
+from types import SimpleNamespace
+from typing import Iterator, Optional
+
+import requests
+from groq import Groq
+from dotenv import dotenv_values
+
+from Core.Tracing import tracer
+from Core import Resilience
+from Core.ModelRouter import model_router
+
+env_vars = dotenv_values(".env")
+
+def setting(key: str, default: Optional[str] = None) -> Optional[str]:
+    """Reads a setting from the process environment first, then from .env."""
+    return os.environ.get(key) or env_vars.get(key) or default
+
+class GroqBackend:
+    """Streams chat completions through the Groq SDK."""
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, model: Optional[str] = None, name: str = "groq"):
+        # Retries are handled by Core.Resilience, within the turn's deadline
+        self.client = Groq(api_key=api_key, base_url=base_url, max_retries=0)
+        self.model = model
+        self.name = name
+
+    def create(self, timeout: Optional[float] = None, **kwargs):
+        if self.model:
+            kwargs["model"] = self.model
+        return self.client.chat.completions.create(stream=True, timeout=timeout, **kwargs)
+
+class SSEStream:
+    """Iterates an OpenAI-style server-sent event stream as chunk objects."""
+
+    def __init__(self, response: requests.Response):
+        self.response = response
+
+    def __iter__(self):
+        for line in self.response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            payload = loads(data)
+            choices = [SimpleNamespace(index=choice.get("index", 0), finish_reason=choice.get("finish_reason"),
+                                       delta=SimpleNamespace(**{"content": None, "role": None, **choice.get("delta", {})}))
+                       for choice in payload.get("choices", [])]
+            yield SimpleNamespace(id=payload.get("id"), model=payload.get("model"), choices=choices)
+
+    def close(self) -> None:
+        self.response.close()
+
+class OpenAICompatibleBackend:
+    """Streams chat completions from any OpenAI-compatible /chat/completions endpoint."""
+
+    def __init__(self, base_url: str, api_key: str = "", model: Optional[str] = None,
+                 name: str = "openai", timeout: float = 60.0):
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.model = model
+        self.name = name
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def create(self, timeout: Optional[float] = None, **kwargs):
+        if self.model:
+            kwargs["model"] = self.model
+        kwargs["stream"] = True
+        timeout = self.timeout if timeout is None else min(self.timeout, timeout)
+        response = self.session.post(self.url, json=kwargs, headers=self.headers, stream=True, timeout=timeout)
+        response.raise_for_status()
+        return SSEStream(response)
+
+def make_backend(kind: str, base_url: Optional[str], api_key: str, model: Optional[str], name: str):
+    if kind == "openai":
+        return OpenAICompatibleBackend(base_url or "http://127.0.0.1:8000/v1", api_key, model, name)
+    return GroqBackend(api_key, base_url, model, name)
+
+_DONE = object()
+
+class LLMClient:
+    """Entry point for every chat completion made by the assistant.
+
+    With a secondary backend configured, requests are hedged. If the primary
+    has not produced its first token within the stage's observed
+    time-to-first-token percentile, the same request also goes to the
+    secondary. The first stream to yield content wins and the other one is
+    closed. A primary that fails before producing anything triggers the
+    secondary immediately.
+
+    Opening a stream goes through the backend's circuit breaker ("llm.<name>")
+    and is retried within the current turn's deadline.
+
+    Callers that pass a task instead of a model get one from the model router,
+    which also hears how fast each model answered. If the chosen model cannot
+    be opened, the next candidate for the task is tried.
+    """
+
+    def __init__(self, primary, secondary=None, hedge_percentile: float = 0.95,
+                 hedge_min_delay: float = 0.3, hedge_default_delay: float = 1.5, min_samples: int = 20,
+                 attempts: int = 3):
+        self.primary = primary
+        self.secondary = secondary
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.min_samples = min_samples
+        self.attempts = attempts
+        self.stats = {"requests": 0, "hedged": 0, "secondary_wins": 0}
+
+    def hedge_delay(self, stage: str) -> float:
+        # Based on the primary's own first-token times, not the hedged outcome
+        histogram = tracer.histograms.get(f"{stage}.{self.primary.name}.ttft")
+        if histogram is None or len(histogram.samples) < self.min_samples:
+            return self.hedge_default_delay
+        return max(self.hedge_min_delay, histogram.quantile(self.hedge_percentile))
+
+    def stream(self, stage: str, attempts: Optional[int] = None, task: Optional[str] = None,
+               expected_tokens: Optional[int] = None, **kwargs) -> Iterator:
+        """Starts a streamed completion and returns its chunks, traced under stage.
+
+        Raises Resilience.CircuitOpenError or DeadlineExceeded straight away
+        when no backend can be tried.
+        """
+        self.stats["requests"] += 1
+        deadline = Resilience.current_deadline()
+        attempts = attempts or self.attempts
+        if task is None:
+            return tracer.traced_stream(self._start(stage, kwargs, deadline, attempts), stage)
+
+        expected_tokens = expected_tokens or kwargs.get("max_tokens") or 1024
+        models = model_router.candidates(task, expected_tokens)
+        for index, model in enumerate(models):
+            started = time.perf_counter()
+            try:
+                stream = self._start(stage, {**kwargs, "model": model}, deadline, attempts)
+            except (Resilience.CircuitOpenError, Resilience.DeadlineExceeded):
+                raise
+            except Exception as e:
+                model_router.record_failure(model)
+                if index == len(models) - 1:
+                    raise
+                logging.warning(f"Model {model} failed for {task}, falling back to {models[index + 1]}: {e}")
+                continue
+            return tracer.traced_stream(self._observed(stream, task, expected_tokens, model, started), stage)
+
+    def _start(self, stage: str, kwargs: dict, deadline: Resilience.Deadline, attempts: int) -> Iterator:
+        if self.secondary is None:
+            return self._open(self.primary, kwargs, deadline, attempts)
+        return self._hedged(stage, kwargs, deadline, attempts)
+
+    @staticmethod
+    def _observed(stream: Iterator, task: str, expected_tokens: int, model: str, started: float) -> Iterator:
+        """Reports the model's time to first token, or its failure, to the router."""
+        first_token = False
+        try:
+            for chunk in stream:
+                if not first_token and chunk.choices and chunk.choices[0].delta.content:
+                    first_token = True
+                    model_router.record_latency(task, expected_tokens, model, time.perf_counter() - started)
+                yield chunk
+        except Exception:
+            if not first_token:
+                model_router.record_failure(model)
+            raise
+
+    def _create(self, backend, kwargs: dict, deadline: Resilience.Deadline, attempts: int):
+        return Resilience.call(f"llm.{backend.name}", lambda timeout: backend.create(timeout=timeout, **kwargs),
+                               attempts=attempts, deadline=deadline)
+
+    def _open(self, backend, kwargs: dict, deadline: Resilience.Deadline, attempts: int) -> Iterator:
+        return self._guarded(backend, self._create(backend, kwargs, deadline, attempts))
+
+    @staticmethod
+    def _guarded(backend, stream) -> Iterator:
+        """A stream that breaks off midway still counts against its backend."""
+        try:
+            yield from stream
+        except Exception:
+            Resilience.breaker(f"llm.{backend.name}").record_failure()
+            raise
+        finally:
+            LLMClient._close(stream)
+
+    def _hedged(self, stage: str, kwargs: dict, deadline: Resilience.Deadline, attempts: int) -> Iterator:
+        """Races the backends up to the first content chunk and returns the winner's stream.
+
+        Waiting for the winner here, rather than inside the returned
+        generator, means a request that neither backend can serve raises
+        from stream() itself, where the next model can still be tried.
+        """
+        events = queue.Queue()
+        backends = [self.primary, self.secondary]
+        streams = [None, None]
+        cancelled = [threading.Event(), threading.Event()]
+
+        started = time.perf_counter()
+        first_token = [False, False]
+
+        def pump(index):
+            try:
+                streams[index] = self._create(backends[index], kwargs, deadline, attempts)
+                for chunk in streams[index]:
+                    if cancelled[index].is_set():
+                        break
+                    if not first_token[index] and chunk.choices and chunk.choices[0].delta.content:
+                        first_token[index] = True
+                        tracer.record(f"{stage}.{backends[index].name}.ttft", time.perf_counter() - started)
+                    events.put((index, chunk))
+                events.put((index, _DONE))
+            except Exception as e:
+                if streams[index] is not None and not cancelled[index].is_set():
+                    # Broke off midway; failures while opening are already recorded
+                    Resilience.breaker(f"llm.{backends[index].name}").record_failure()
+                events.put((index, e))
+            finally:
+                self._close(streams[index])
+
+        def launch(index):
+            threading.Thread(target=pump, args=(index,), daemon=True).start()
+
+        def close_all():
+            for index in (0, 1):
+                cancelled[index].set()
+                self._close(streams[index])
+
+        launch(0)
+        launched, finished = 1, set()
+        hedge_at = time.monotonic() + self.hedge_delay(stage)
+        buffered = {0: [], 1: []}
+        winner = None
+        try:
+            while winner is None:
+                try:
+                    timeout = max(0.0, hedge_at - time.monotonic()) if launched == 1 else None
+                    index, item = events.get(timeout=timeout)
+                except queue.Empty:
+                    logging.debug(f"Hedging {stage}: no first token from {self.primary.name} yet")
+                    self.stats["hedged"] += 1
+                    launch(1)
+                    launched = 2
+                    continue
+
+                if isinstance(item, Exception):
+                    logging.warning(f"LLM backend {backends[index].name} failed: {item}")
+                    finished.add(index)
+                    if launched == 1:
+                        self.stats["hedged"] += 1
+                        launch(1)
+                        launched = 2
+                    elif len(finished) == 2:
+                        raise item
+                elif item is _DONE or (item.choices and item.choices[0].delta.content):
+                    winner = index
+                    if item is not _DONE:
+                        buffered[index].append(item)
+                else:
+                    buffered[index].append(item)
+        except BaseException:
+            close_all()
+            raise
+
+        if winner == 1:
+            self.stats["secondary_wins"] += 1
+        loser = 1 - winner
+        cancelled[loser].set()
+        self._close(streams[loser])
+        if loser == 0 and not first_token[0]:
+            # Censored sample: the primary was at least this slow, which keeps the delay honest
+            tracer.record(f"{stage}.{self.primary.name}.ttft", time.perf_counter() - started)
+
+        def follow(done):
+            try:
+                yield from buffered[winner]
+                if done:
+                    return
+                while True:
+                    index, item = events.get()
+                    if index != winner:
+                        continue
+                    if item is _DONE:
+                        return
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                close_all()
+
+        return follow(item is _DONE)
+
+    @staticmethod
+    def _close(stream) -> None:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            try:
+                close()
+            except Exception:
+                pass
+
+def build_client() -> LLMClient:
+    primary = GroqBackend(setting("GroqAPIKey"), setting("GroqBaseURL"))
+    secondary = None
+    if setting("LLMHedging", "false").lower() == "true":
+        secondary = make_backend(setting("HedgeBackendKind", "groq"), setting("HedgeBackendURL"),
+                                 setting("HedgeBackendKey", setting("GroqAPIKey", "")),
+                                 setting("HedgeBackendModel"), "hedge")
+    return LLMClient(primary, secondary,
+                     hedge_percentile=float(setting("HedgePercentile", "95")) / 100,
+                     hedge_min_delay=float(setting("HedgeMinDelay", "0.3")))
+
+llm_client = build_client()
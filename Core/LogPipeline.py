@@ -0,0 +1,158 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional, Tuple
+
+from dotenv import dotenv_values
+
+# Paths
+LOG_PATH = os.path.join("Data", "assistant.log")
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+env_vars = dotenv_values(".env")
+
+def parse_levels(spec: Optional[str]) -> Dict[str, int]:
+    """Parses 'main=INFO,UI=WARNING,Core.LLMClient=DEBUG' into module → level."""
+    levels = {}
+    for item in (spec or "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return {name: level for name, level in levels.items() if isinstance(level, int)}
+
+class SizeAndTimeRotatingFileHandler(RotatingFileHandler):
+    """Rotates when the file reaches max_bytes or when interval seconds have passed.
+
+    Backups are numbered (assistant.log.1 … .N), so disk use never exceeds
+    (backup_count + 1) * max_bytes.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int, interval: float):
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.interval = interval
+        self.rollover_at = time.time() + interval
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.interval and time.time() >= self.rollover_at and os.path.exists(self.baseFilename) \
+                and os.path.getsize(self.baseFilename) > 0:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+class ModuleLevelFilter(logging.Filter):
+    """Per-module minimum levels, for named loggers and for calls on the root logger.
+
+    Most modules log through the root logger, so the module is taken from the
+    record's source file name when the logger has no name of its own.
+    """
+
+    def __init__(self, levels: Dict[str, int], default: int):
+        super().__init__()
+        self.levels = levels
+        self.default = default
+
+    def level_for(self, record: logging.LogRecord) -> int:
+        name = record.name if record.name != "root" else record.module
+        while name:
+            if name in self.levels:
+                return self.levels[name]
+            name = name.rpartition(".")[0]
+        return self.levels.get(record.module, self.default)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= self.level_for(record)
+
+class RateLimitFilter(logging.Filter):
+    """Lets through at most one record per call site every interval seconds, up to max_level.
+
+    Repetitive messages from polling loops are collapsed. The next record from
+    the same line that gets through notes how many were dropped in between.
+    """
+
+    def __init__(self, interval: float = 10.0, max_level: int = logging.DEBUG):
+        super().__init__()
+        self.interval = interval
+        self.max_level = max_level
+        self.sites: Dict[Tuple[str, int], list] = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        key = (record.pathname, record.lineno)
+        with self.lock:
+            site = self.sites.get(key)
+            if site is None:
+                self.sites[key] = [record.created, 0]
+                return True
+            if record.created - site[0] < self.interval:
+                site[1] += 1
+                return False
+            suppressed, site[0], site[1] = site[1], record.created, 0
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} similar suppressed)"
+            record.args = None
+        return True
+
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+def setup_logging(path: str = LOG_PATH, console: bool = False) -> None:
+    """Routes all logging through a queue to a background writer with rotation.
+
+    Callers only pay for filtering and a queue put; formatting and disk writes
+    happen on the listener thread. Safe to call more than once: only the first
+    call configures logging. Settings come from .env: LogLevel, LogLevels
+    (per module), LogMaxBytes, LogBackups, LogRotateSeconds, LogRateLimitSeconds.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        default = logging.getLevelName(env_vars.get("LogLevel", "DEBUG").upper())
+        default = default if isinstance(default, int) else logging.DEBUG
+        levels = parse_levels(env_vars.get("LogLevels"))
+
+        file_handler = SizeAndTimeRotatingFileHandler(
+            path,
+            max_bytes=int(env_vars.get("LogMaxBytes", 5 * 1024 * 1024)),
+            backup_count=int(env_vars.get("LogBackups", 5)),
+            interval=float(env_vars.get("LogRotateSeconds", 24 * 3600)),
+        )
+        handlers = [file_handler]
+        if console:
+            handlers.append(logging.StreamHandler())
+        for handler in handlers:
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = QueueHandler(log_queue)
+        queue_handler.addFilter(ModuleLevelFilter(levels, default))
+        queue_handler.addFilter(RateLimitFilter(float(env_vars.get("LogRateLimitSeconds", 10))))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        # The root level only gates record creation; the filters above decide per module
+        root.setLevel(min([default, *levels.values()]))
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+def shutdown_logging() -> None:
+    """Flushes queued records and stops the writer thread."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
@@ -0,0 +1,176 @@
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from typing import Callable, Dict, Optional, Tuple
+
+from dotenv import dotenv_values
+
+env_vars = dotenv_values(".env")
+MemoryTracking = env_vars.get("MemoryTracking", "false").lower() == "true"
+MemoryTraceFrames = int(env_vars.get("MemoryTraceFrames", 8))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STDLIB = os.path.dirname(os.path.abspath(os.__file__))
+
+def resident_bytes() -> Optional[int]:
+    """Resident set size of this process in bytes, or None where it cannot be read."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+    return None
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.2f} GB"
+
+class MemoryBudget:
+    """Accounts for this process's memory by subsystem.
+
+    Subsystems are the repo's own modules ('Core.HistoryIndex', 'main',
+    'Interface.UI'); an allocation is charged to the innermost repo frame
+    in its traceback, so a dict json builds for the history index counts as
+    Core.HistoryIndex. Allocations with no repo frame go to their library
+    ('openai', 'python:json'). This needs tracemalloc, which slows
+    allocation down, so it only runs with MemoryTracking=true or after
+    start(); resident size and the sizes of the watched collections are
+    always available.
+
+    Long-lived collections register with watch(name, size, cap), so a
+    report shows how full each one is next to its cap.
+    """
+
+    def __init__(self, frames: int = MemoryTraceFrames):
+        self.frames = frames
+        self.collections: Dict[str, Tuple[Callable[[], int], Optional[int]]] = {}
+        self.baseline: Dict[str, int] = {}
+        self.started: Optional[float] = None
+        self.subsystem_of: Dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> None:
+        """Starts tracing allocations; later reports show growth since this point."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self.started = time.time()
+        self.baseline = {name: size for name, (size, _) in self.by_subsystem().items()}
+
+    def watch(self, name: str, size: Callable[[], int], cap: Optional[int] = None) -> None:
+        self.collections[name] = (size, cap)
+
+    def subsystem(self, filename: str) -> Optional[str]:
+        """The repo module a source file belongs to, or None for library code."""
+        name = self.subsystem_of.get(filename)
+        if name is None:
+            path = os.path.abspath(filename)
+            if path.startswith(ROOT + os.sep) and "-packages" + os.sep not in path[len(ROOT):]:
+                name = os.path.splitext(os.path.relpath(path, ROOT))[0].replace(os.sep, ".")
+            else:
+                name = ""
+            self.subsystem_of[filename] = name
+        return name or None
+
+    @staticmethod
+    def library(filename: str) -> str:
+        for marker in ("site-packages", "dist-packages"):
+            _, found, rest = filename.partition(os.sep + marker + os.sep)
+            if found:
+                return rest.split(os.sep)[0].split(".")[0]
+        if filename.startswith(STDLIB + os.sep):
+            return "python:" + os.path.splitext(filename[len(STDLIB) + 1:].split(os.sep)[0])[0]
+        return "other"
+
+    def by_subsystem(self) -> Dict[str, Tuple[int, int]]:
+        """Traced (bytes, blocks) per subsystem, largest first; empty when not tracing."""
+        if not tracemalloc.is_tracing():
+            return {}
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        totals: Dict[str, list] = {}
+        with self.lock:
+            for statistic in snapshot.statistics("traceback"):
+                frames = statistic.traceback
+                # Frames run oldest first; look from the allocation site outwards
+                name = next((self.subsystem(frame.filename) for frame in reversed(frames)
+                             if self.subsystem(frame.filename)), None)
+                if name is None:
+                    name = self.library(frames[-1].filename) if len(frames) else "other"
+                total = totals.setdefault(name, [0, 0])
+                total[0] += statistic.size
+                total[1] += statistic.count
+        return {name: (size, count) for name, (size, count) in sorted(totals.items(), key=lambda item: -item[1][0])}
+
+    def collection_sizes(self) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+        sizes = {}
+        for name, (size, cap) in list(self.collections.items()):
+            try:
+                sizes[name] = (size(), cap)
+            except Exception:
+                sizes[name] = (None, cap)
+        return sizes
+
+    def sample(self) -> dict:
+        """Everything a report shows, as plain data (for /v1/debug/memory and the soak benchmark)."""
+        subsystems = self.by_subsystem()
+        traced, peak = tracemalloc.get_traced_memory() if self.tracing else (None, None)
+        return {
+            "time": time.time(),
+            "resident": resident_bytes(),
+            "tracing": self.tracing,
+            "traced": traced,
+            "traced_peak": peak,
+            "subsystems": {name: {"bytes": size, "blocks": count, "change": size - self.baseline.get(name, 0)}
+                           for name, (size, count) in subsystems.items()},
+            "collections": {name: {"size": size, "cap": cap} for name, (size, cap) in self.collection_sizes().items()},
+        }
+
+    def report(self, top: int = 10) -> str:
+        """A readable summary: resident size, the largest subsystems and how full each watched collection is."""
+        sample = self.sample()
+        resident = sample["resident"]
+        lines = [f"Memory: resident {format_bytes(resident) if resident is not None else 'unknown'}"]
+        if sample["tracing"]:
+            lines[0] += f", traced {format_bytes(sample['traced'])} (peak {format_bytes(sample['traced_peak'])})"
+            since = time.strftime("%d %b %H:%M", time.localtime(self.started)) if self.started else "start"
+            lines.append(f"Largest subsystems (change since {since}):")
+            for name, entry in list(sample["subsystems"].items())[:top]:
+                change = ("+" if entry["change"] >= 0 else "-") + format_bytes(abs(entry["change"]))
+                lines.append(f"  {name:<24} {format_bytes(entry['bytes']):>10}  {change:>10}")
+        else:
+            lines.append("Allocation tracing is off (MemoryTracking=false); per-subsystem figures need it.")
+        if sample["collections"]:
+            lines.append("Collections:")
+            for name, entry in sample["collections"].items():
+                size = "?" if entry["size"] is None else f"{entry['size']:,d}"
+                cap = "unbounded" if entry["cap"] is None else f"{entry['cap']:,d}"
+                lines.append(f"  {name:<24} {size:>10} / {cap}")
+        return "\n".join(lines)
+
+memory_budget = MemoryBudget()
+if MemoryTracking:
+    memory_budget.start()
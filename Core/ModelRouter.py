@@ -0,0 +1,140 @@
+import os
+import re
+import time
+import logging
+import threading
+from json import load, JSONDecodeError
+from typing import Dict, List, Optional, Tuple
+
+from Core.Tracing import LatencyHistogram
+
+# Paths
+ROUTES_PATH = os.path.join("Data", "ModelRoutes.json")
+
+FAST_MODEL = "llama-3.1-8b-instant"
+LARGE_MODEL = "llama3-70b-8192"
+LONG_CONTEXT_MODEL = "mixtral-8x7b-32768"
+
+# Checked top to bottom: the first row whose task matches and whose
+# max_expected_tokens covers the expected output length wins. Its models are
+# tried in order, skipping any that are currently degraded. ttft_budget is
+# the p95 time to first token (seconds) above which a model counts as degraded.
+DEFAULT_ROUTES = [
+    {"task": "classify", "max_expected_tokens": 256, "models": [FAST_MODEL, LARGE_MODEL], "ttft_budget": 0.8},
+    {"task": "answer", "max_expected_tokens": 200, "models": [FAST_MODEL, LARGE_MODEL], "ttft_budget": 1.0},
+    {"task": "answer", "max_expected_tokens": None, "models": [LARGE_MODEL, FAST_MODEL], "ttft_budget": 2.0},
+    {"task": "search", "max_expected_tokens": None, "models": [LARGE_MODEL, FAST_MODEL], "ttft_budget": 2.0},
+    {"task": "content", "max_expected_tokens": None, "models": [LONG_CONTEXT_MODEL, LARGE_MODEL], "ttft_budget": 4.0},
+]
+
+# Phrases that usually ask for more than a couple of sentences
+LONG_ANSWER = re.compile(r"\b(explain|describe|compare|difference|steps|how (do|does|can|to)|why|list|essay|detail|summari[sz]e)\b", re.I)
+
+class ModelRouter:
+    """Chooses a model per task and expected output length from a route table.
+
+    Observed time to first token is tracked per route and model, since
+    routes have different budgets and ask for different amounts of work: a
+    model whose recent p95 on a route exceeds that route's ttft_budget is
+    skipped on that route only. A model that fails failure_limit times in a
+    row is skipped on every route. Either lasts cooldown seconds; after that
+    the model gets traffic again and is re-evaluated on fresh samples. Routes can be overridden with
+    Data/ModelRoutes.json, a list of rows in the same format as DEFAULT_ROUTES.
+    """
+
+    def __init__(self, routes_path: str = ROUTES_PATH, window: int = 50, min_samples: int = 10,
+                 failure_limit: int = 2, cooldown: float = 120.0):
+        self.routes = self._load(routes_path) or DEFAULT_ROUTES
+        self.window = window
+        self.min_samples = min_samples
+        self.failure_limit = failure_limit
+        self.cooldown = cooldown
+        self.latency: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self.failures: Dict[str, int] = {}
+        self.degraded_until: Dict[str, float] = {}
+        self.slow_until: Dict[Tuple[str, str], float] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _load(path: str) -> Optional[list]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                routes = load(f)
+            return routes if isinstance(routes, list) and routes else None
+        except (FileNotFoundError, JSONDecodeError):
+            return None
+
+    @staticmethod
+    def expected_tokens(query: str) -> int:
+        """Rough output length for a general question, used to pick a tier."""
+        if LONG_ANSWER.search(query) or len(query.split()) > 25:
+            return 600
+        return 150
+
+    @staticmethod
+    def route_name(row: dict) -> str:
+        limit = row.get("max_expected_tokens")
+        return row["task"] if limit is None else f"{row['task']}<={limit}"
+
+    def route(self, task: str, expected_tokens: int) -> dict:
+        for row in self.routes:
+            limit = row.get("max_expected_tokens")
+            if row["task"] == task and (limit is None or expected_tokens <= limit):
+                return row
+        return {"task": task, "models": [LARGE_MODEL], "ttft_budget": None}
+
+    def candidates(self, task: str, expected_tokens: int) -> List[str]:
+        """Models for the task in preference order, healthy ones first."""
+        row = self.route(task, expected_tokens)
+        models, name = row["models"], self.route_name(row)
+        now = time.monotonic()
+        with self.lock:
+            healthy = [m for m in models
+                       if self.degraded_until.get(m, 0) <= now and self.slow_until.get((name, m), 0) <= now]
+        return healthy + [m for m in models if m not in healthy]
+
+    def choose(self, task: str, expected_tokens: int) -> str:
+        return self.candidates(task, expected_tokens)[0]
+
+    def record_latency(self, task: str, expected_tokens: int, model: str, ttft: float) -> None:
+        row = self.route(task, expected_tokens)
+        budget, key = row.get("ttft_budget"), (self.route_name(row), model)
+        with self.lock:
+            self.failures[model] = 0
+            histogram = self.latency.setdefault(key, LatencyHistogram(self.window))
+            histogram.add(ttft)
+            if budget and len(histogram.samples) >= self.min_samples and histogram.quantile(0.95) > budget:
+                logging.warning(f"Model {model} degraded on route {key[0]}: "
+                                f"p95 first token {histogram.quantile(0.95):.2f}s > {budget:.2f}s")
+                self.slow_until[key] = time.monotonic() + self.cooldown
+                # Judge the model on fresh samples once the cooldown is over
+                self.latency[key] = LatencyHistogram(self.window)
+
+    def record_failure(self, model: str) -> None:
+        with self.lock:
+            self.failures[model] = self.failures.get(model, 0) + 1
+            if self.failures[model] >= self.failure_limit:
+                logging.warning(f"Model {model} degraded after {self.failures[model]} failures")
+                self._degrade(model)
+
+    def _degrade(self, model: str) -> None:
+        self.degraded_until[model] = time.monotonic() + self.cooldown
+        self.failures[model] = 0
+        for key in [key for key in self.latency if key[1] == model]:
+            self.latency[key] = LatencyHistogram(self.window)
+
+    def status(self) -> Dict[str, dict]:
+        """Per model: how long it is skipped everywhere, and its p95 and skip time on each route it served."""
+        now = time.monotonic()
+        with self.lock:
+            models = {key[1] for key in self.latency} | {key[1] for key in self.slow_until} | set(self.degraded_until)
+            routes = sorted(set(self.latency) | set(self.slow_until))
+            return {model: {
+                "degraded_for": max(0.0, self.degraded_until.get(model, 0) - now),
+                "routes": {name: {"p95_ttft": self.latency[(name, m)].quantile(0.95)
+                                  if (name, m) in self.latency else None,
+                                  "degraded_for": max(0.0, self.slow_until.get((name, m), 0) - now)}
+                           for name, m in routes if m == model},
+            } for model in sorted(models)}
+
+model_router = ModelRouter()
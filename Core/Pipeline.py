@@ -0,0 +1,139 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from dotenv import dotenv_values
+
+from Core.Tracing import tracer
+from Core.Resilience import deadline_scope
+from Core.QueryClassifier import classify_user_query
+from Core.ChatBot import answer_query, classify_and_answer
+from Core.RealTimeSearch import RealTimeSearchEngine
+
+env_vars = dotenv_values(".env")
+SessionLimit = int(env_vars.get("SessionLimit", 1000))
+SessionIdleSeconds = float(env_vars.get("SessionIdleSeconds", 1800))
+
+@dataclass
+class Session:
+    """One conversation served outside the desktop window.
+
+    The conversation history is shared by answering and search, as the
+    desktop ChatLog is; the classifier keeps its own. Nothing is written to
+    Data/, so sessions never see each other's turns.
+    """
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    history: List[dict] = field(default_factory=list)
+    classifier_history: List[dict] = field(default_factory=list)
+    created: float = field(default_factory=time.time)
+    last_active: float = field(default_factory=time.monotonic)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+class SessionStore:
+    """Sessions by id. Idle ones expire and the least recently used are evicted beyond max_sessions."""
+
+    def __init__(self, max_sessions: int = SessionLimit, idle_ttl: float = SessionIdleSeconds):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def create(self) -> Session:
+        session = Session()
+        with self.lock:
+            self.sessions[session.id] = session
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return None
+            if time.monotonic() - session.last_active > self.idle_ttl:
+                del self.sessions[session_id]
+                return None
+            self.sessions.move_to_end(session_id)
+            return session
+
+    def get_or_create(self, session_id: Optional[str] = None) -> Session:
+        return (self.get(session_id) if session_id else None) or self.create()
+
+    def close(self, session_id: str) -> bool:
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def reap(self) -> int:
+        """Drops idle sessions and returns how many were removed."""
+        cutoff = time.monotonic() - self.idle_ttl
+        with self.lock:
+            idle = [sid for sid, session in self.sessions.items() if session.last_active < cutoff]
+            for sid in idle:
+                del self.sessions[sid]
+        return len(idle)
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+def task_query(task: str) -> str:
+    return " ".join(task.split()[1:])
+
+def run_query(query: str, session: Session, on_token: Optional[Callable[[str], None]] = None,
+              combined: bool = False) -> dict:
+    """Runs one turn for a session: classification, then an answer or a search.
+
+    Mirrors the desktop turn in main.py, except that automation tasks are
+    returned as actions instead of being executed on this machine. Turns of
+    different sessions run in parallel; turns of one session run in order.
+    on_token receives the answer text as it streams in.
+    """
+    with session.lock:
+        session.last_active = time.monotonic()
+        tracer.begin_turn()
+        tasks, answer, kind = [], None, "tasks"
+        try:
+            with deadline_scope():
+                if combined:
+                    with tracer.span("classify_answer"):
+                        tasks, answer = classify_and_answer(query, history=session.history,
+                                                            classifier_history=session.classifier_history)
+                else:
+                    with tracer.span("classification"):
+                        tasks = classify_user_query(query, history=session.classifier_history)
+
+                general = [task_query(task) for task in tasks if task.startswith("general")]
+                realtime = [task_query(task) for task in tasks if task.startswith("realtime")]
+                if realtime:
+                    kind = "realtime"
+                    with tracer.span("search"):
+                        answer = RealTimeSearchEngine(" and ".join(general + realtime),
+                                                      history=session.history, on_token=on_token)
+                elif general:
+                    kind = "general"
+                    if answer is None:
+                        with tracer.span("answer"):
+                            answer = answer_query(general[0], history=session.history, on_token=on_token)
+                    elif on_token is not None:
+                        on_token(answer)
+                elif "exit" in tasks:
+                    kind = "exit"
+                    answer = answer_query("Okay, Bye!", history=session.history, on_token=on_token)
+        finally:
+            breakdown = tracer.end_turn()
+            session.last_active = time.monotonic()
+
+    actions = [task for task in tasks if task.split(" ", 1)[0] not in ("general", "realtime", "exit")]
+    return {
+        "session": session.id,
+        "query": query,
+        "tasks": tasks,
+        "kind": kind,
+        "answer": answer,
+        "actions": actions,
+        "cached": "answer.cache.hit" in breakdown,
+        "timings_ms": {stage: round(seconds * 1000, 1) for stage, seconds in breakdown.items()},
+    }
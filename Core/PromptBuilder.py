@@ -0,0 +1,84 @@
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+@lru_cache(maxsize=4096)
+def estimate_tokens(text: str) -> int:
+    """Approximate token count: words and punctuation marks, long words counted per 4 characters."""
+    return sum(max(1, len(piece) // 4) for piece in re.findall(r"\w+|[^\w\s]", text))
+
+def trim_history(history: list, limit: int = 10, keep: int = 6) -> None:
+    """Trims history in steps rather than sliding it by one message per turn.
+
+    A sliding window changes the first history message on every turn, so no
+    prompt ever shares a prefix with the previous one. Dropping down to keep
+    messages once limit is exceeded leaves the prefix stable for several turns.
+    """
+    if len(history) > limit:
+        history[:] = history[-keep:]
+
+class PromptBuilder:
+    """Assembles chat messages from the most stable content to the least stable.
+
+    The order is: static system segments, conversation summary, earlier
+    history, volatile data (current time, search results), then the latest
+    user message. Each turn therefore only appends to the prefix the provider
+    saw last time, and provider-side prefix caching can reuse it. Static
+    segments are built once and the same message objects are reused on every
+    call, together with their precomputed token counts.
+
+    Per stage, the builder also records how many prompt tokens repeat the
+    previous prompt's prefix, which approximates the prefix-cache hit rate.
+    """
+
+    def __init__(self):
+        self.segments: Dict[str, Tuple[dict, int]] = {}
+        self.last_prompt: Dict[str, List[Tuple[str, str]]] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self.lock = threading.Lock()
+
+    def static(self, name: str, content: str, role: str = "system") -> dict:
+        """Returns the cached message for a static segment, rebuilding it only if its text changed."""
+        cached = self.segments.get(name)
+        if cached is None or cached[0]["content"] != content or cached[0]["role"] != role:
+            cached = ({"role": role, "content": content}, estimate_tokens(content))
+            self.segments[name] = cached
+        return cached[0]
+
+    def static_tokens(self, name: str) -> int:
+        return self.segments[name][1] if name in self.segments else 0
+
+    def build(self, stage: str, static: Iterable[dict], history: Iterable[dict] = (),
+              volatile: Iterable[dict] = (), query: Optional[dict] = None, summary: Optional[str] = None) -> List[dict]:
+        messages = list(static)
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+        messages.extend(history)
+        messages.extend(volatile)
+        if query is not None:
+            messages.append(query)
+        self._account(stage, messages)
+        return messages
+
+    def _account(self, stage: str, messages: List[dict]) -> None:
+        prompt = [(m["role"], m["content"]) for m in messages]
+        tokens = [estimate_tokens(content) for _, content in prompt]
+        with self.lock:
+            previous = self.last_prompt.get(stage, [])
+            shared = 0
+            while shared < min(len(prompt), len(previous)) and prompt[shared] == previous[shared]:
+                shared += 1
+            self.last_prompt[stage] = prompt
+            stats = self.stats.setdefault(stage, {"calls": 0, "prompt_tokens": 0, "reused_tokens": 0})
+            stats["calls"] += 1
+            stats["prompt_tokens"] += sum(tokens)
+            stats["reused_tokens"] += sum(tokens[:shared])
+
+    def prefix_reuse(self) -> Dict[str, float]:
+        """Share of prompt tokens per stage that repeated the previous prompt's prefix."""
+        with self.lock:
+            return {stage: stats["reused_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+                    for stage, stats in sorted(self.stats.items())}
+
+prompt_builder = PromptBuilder()
@@ -1,10 +1,11 @@
 import time
-from groq import Groq
 from json import load, dump
 from dotenv import load_dotenv
 import os
-from typing import List
+from typing import List, Optional
 import re
+from Core.LLMClient import llm_client
+from Core.PromptBuilder import prompt_builder, trim_history
 
 # Load environment variables
 load_dotenv()
@@ -15,9 +16,6 @@ GROQ_API_KEY = os.getenv("GroqAPIKey")
 if not GROQ_API_KEY:
     raise ValueError("GROQ_API_KEY not found in .env file")
 
-# Initialize Groq client
-client = Groq(api_key=GROQ_API_KEY)
-
 # Supported task categories
 TASK_CATEGORIES = [
     "exit",
@@ -78,8 +76,55 @@ def is_valid_query(query: str) -> bool:
     """Validates if the query is suitable for processing."""
     return not re.match(r".*[\\/].*\.exe|.*[\\/].*\.py|&.*", query)
 
-def classify_user_query(query: str, max_retries: int = 3) -> List[str]:
-    """Classifies a user query into task categories using Groq's API."""
+# Leading words that identify a task without asking the model
+LOCAL_PREFIXES = {
+    "open": "open", "launch": "open", "close": "close", "play": "play",
+    "exit": "exit", "mute": "system", "unmute": "system", "volume": "system",
+    "search youtube for": "youtube_search", "search google for": "google_search", "search": "google_search",
+    "write": "content", "generate image": "generate_image", "remind me": "reminder",
+    "bye": "exit", "goodbye": "exit", "quit": "exit",
+}
+
+def fallback_classification(query: str) -> List[str]:
+    """Keyword classification used when the model cannot be reached."""
+    tasks = []
+    for part in re.split(r",| and ", query.lower()):
+        part = part.strip()
+        if not part:
+            continue
+        prefix = next((p for p in sorted(LOCAL_PREFIXES, key=len, reverse=True)
+                       if part == p or part.startswith(p + " ")), None)
+        if prefix is None:
+            tasks.append(f"general {part}")
+            continue
+        category = LOCAL_PREFIXES[prefix]
+        if category == "exit":
+            tasks.append("exit")
+        elif category == "system":
+            tasks.append(f"system {part}")
+        else:
+            tasks.append(f"{category} {part[len(prefix):].strip()}".strip())
+    return tasks or [f"general {query}"]
+
+def parse_tasks(response_text: str, query: str) -> List[str]:
+    """Splits a classification reply into tasks, mapping unknown categories to a general query."""
+    response_text = re.sub(r"\s+", " ", response_text.replace("</s>", "")).strip()
+    tasks = [task.strip() for task in response_text.split(",") if task.strip()]
+
+    valid_tasks = []
+    for task in tasks:
+        if any(task.startswith(category) for category in TASK_CATEGORIES):
+            valid_tasks.append(task)
+        else:
+            valid_tasks.append(f"general {query}")
+    return valid_tasks
+
+def classify_user_query(query: str, max_retries: int = 3, history: Optional[List[dict]] = None) -> List[str]:
+    """Classifies a user query into task categories using Groq's API.
+
+    history defaults to the desktop conversation, which is also persisted.
+    """
+    history = chat_history if history is None else history
     # Sanitize and validate input
     query = query.strip()
     if not query:
@@ -89,56 +134,51 @@ def classify_user_query(query: str, max_retries: int = 3) -> List[str]:
         return ["general invalid query"]
 
     # Update chat history
-    chat_history.append({"role": "user", "content": query})
-
-    for attempt in range(max_retries):
-        try:
-            # Call Groq API
-            completion = client.chat.completions.create(
-                model="llama3-70b-8192",
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    *chat_history
-                ],
-                max_tokens=256,
-                temperature=0.7,
-                stream=True
-            )
-
-            # Process stream
-            response_text = ""
-            for chunk in completion:
-                if chunk.choices[0].delta.content:
-                    response_text += chunk.choices[0].delta.content
-
-            response_text = response_text.replace("</s>", "").strip()
-            if not response_text:
-                return ["general empty response"]
-
-            # Clean and split response
-            response_text = re.sub(r"\s+", " ", response_text)
-            tasks = [task.strip() for task in response_text.split(",") if task.strip()]
-
-            # Validate tasks
-            valid_tasks = []
-            for task in tasks:
-                if any(task.startswith(category) for category in TASK_CATEGORIES):
-                    valid_tasks.append(task)
-                else:
-                    valid_tasks.append(f"general {query}")
-
-            # Update chat history
-            chat_history.append({"role": "assistant", "content": ", ".join(valid_tasks)})
-            if len(chat_history) > 10:
-                chat_history[:] = chat_history[-10:]
+    history.append({"role": "user", "content": query})
+
+    try:
+        # Call Groq API; transient failures are retried within the turn's deadline
+        completion = llm_client.stream(
+            "llm.classify",
+            attempts=max_retries,
+            task="classify",
+            messages=prompt_builder.build(
+                "llm.classify",
+                static=[prompt_builder.static("classifier.system", SYSTEM_PROMPT)],
+                history=history[:-1],
+                query=history[-1]
+            ),
+            max_tokens=256,
+            temperature=0.7
+        )
+
+        # Process stream
+        parts = []
+        for chunk in completion:
+            if chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+
+        response_text = "".join(parts).replace("</s>", "").strip()
+        if not response_text:
+            history.pop()
+            return ["general empty response"]
+
+        # Clean, split and validate response
+        valid_tasks = parse_tasks(response_text, query)
+
+        # Update chat history
+        history.append({"role": "assistant", "content": ", ".join(valid_tasks)})
+        trim_history(history)
+        if history is chat_history:
             with open(CHAT_LOG_PATH, "w") as f:
-                dump(chat_history, f, indent=4)
+                dump(history, f, indent=4)
 
-            return valid_tasks
+        return valid_tasks
 
-        
-        except Exception:
-            return ["general unexpected error"]
+    except Exception:
+        # Local commands keep working while the model is unreachable
+        history.pop()
+        return fallback_classification(query)
 
 if __name__ == "__main__":
     while True:
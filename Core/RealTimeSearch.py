@@ -1,37 +1,51 @@
 from googlesearch import search
-from groq import Groq
+import os
 from json import load,dump
 import datetime
 from dotenv import dotenv_values
+from Core.Tracing import tracer
+from Core.LLMClient import llm_client
+from Core import Resilience
+from Core.PromptBuilder import prompt_builder, trim_history
+from Core.HistoryIndex import history_index
+from Core.MemoryBudget import memory_budget
 
 env_vars=dotenv_values(".env")
 
 Username=env_vars.get("Username")
 Assistantname=env_vars.get("Assistantname")
-GroqAPIKey=env_vars.get("GroqAPIKey")
-
-client=Groq(api_key=GroqAPIKey)
 
 System = f"""Hello, I am {Username}, You are a very accurate and advanced AI chatbot named {Assistantname} which has real-time up-to-date information from the internet.
 *** Provide Answers In a Professional Way, make sure to add full stops, commas, question marks, and use proper grammar.***
 *** Just answer the question from the provided data in a professional way. ***"""
 
-try:
-    with open(r"Data/ChatLog.json","r") as f:
-        messages=load(f)
-except FileNotFoundError:
+if not os.path.exists(r"Data/ChatLog.json"):
     with open(r"Data/ChatLog.json","w") as f:
         dump([],f)
 
-def GoogleSearch(Query):
-    results=search(Query,advanced=True, num_results=5)
-    Answer=f"The Search results for '{Query}' are:\n"
-
-    for i in results:
-        Answer += f"Title: {i.title}\nDescription: {i.description}\n"
+# Last good results per query, served when Google is unreachable
+SearchCache={}
+SearchCacheSize=100
+memory_budget.watch("search cache",SearchCache.__len__,SearchCacheSize)
 
-
-    Answer+="[end]"
+def GoogleSearch(Query):
+    def fetch(timeout):
+        results=search(Query,advanced=True, num_results=5, timeout=timeout)
+        Lines=[f"The Search results for '{Query}' are:\n"]
+        for i in results:
+            Lines.append(f"Title: {i.title}\nDescription: {i.description}\n")
+        Lines.append("[end]")
+        return "".join(Lines)
+
+    try:
+        Answer=Resilience.call("search.google",fetch,attempts=2)
+    except Exception:
+        return SearchCache.get(Query)
+
+    SearchCache.pop(Query,None)
+    SearchCache[Query]=Answer
+    if len(SearchCache)>SearchCacheSize:
+        del SearchCache[next(iter(SearchCache))]
     return Answer
 def AnswerModifier(Answer):
     lines=Answer.split('\n')
@@ -40,9 +54,9 @@ def AnswerModifier(Answer):
     return modified_answer
 
 SystemChatBot=[
-    {"role":"system","content":System},
-    {"role":"system","content":"Hi"},
-    {"role":"assistant","content":"Hello, I am your assistant, how can I help you?"}
+    prompt_builder.static("search.system",System),
+    prompt_builder.static("search.greeting","Hi"),
+    prompt_builder.static("search.greeting.reply","Hello, I am your assistant, how can I help you?","assistant")
 
 ]
 
@@ -64,38 +78,67 @@ def Information():
     data+=f"Time: {hour} hours : {minute} minutes : {second} seconds\n"
     return data
 
-def RealTimeSearchEngine(prompt):
-    global SystemChatBot,messages
-
-    with open (r"Data/ChatLog.json","r") as f:
-        messages=load(f)
+def RealTimeSearchEngine(prompt,history=None,on_token=None):
+    # history is a session's own message list; without one the desktop ChatLog is used and saved
+    if history is None:
+        with open (r"Data/ChatLog.json","r") as f:
+            messages=load(f)
+        trim_history(messages)
+    else:
+        messages=history
 
     messages.append({"role":"user","content":f"{prompt}"})
-    SystemChatBot.append({"role":"user","content":GoogleSearch(prompt)})
-
-    completion=client.chat.completions.create(
-        model="llama3-70b-8192",
-        messages=SystemChatBot+[{"role":"system","content":Information()}]+messages,
-        temperature=0.7,
-        max_tokens=1024,
-        top_p=1,
-        stream=True,
-        stop=None
-    )
-
-    Answer=""
-
-    for chunk in completion:
-        if chunk.choices[0].delta.content:
-            Answer+=chunk.choices[0].delta.content
-
-    Answer=Answer.strip().replace("</s>","")
+    with tracer.span("search.google"):
+        Results=GoogleSearch(prompt)
+    Recalled=None
+    if history is None:
+        with tracer.span("history.recall"):
+            Recalled=history_index.recall(prompt,skip_recent=len(messages)//2)
+    Context=Results or f"The Search results for '{prompt}' are unavailable right now. Answer from what you know and say that it may be out of date.\n[end]"
+
+    try:
+        # Stable prefix first: system prompt and history; search results and time go right before the question
+        completion=llm_client.stream(
+            "llm.search",
+            task="search",
+            messages=prompt_builder.build(
+                "llm.search",
+                static=SystemChatBot,
+                history=messages[:-1],
+                volatile=([{"role":"system","content":Recalled}] if Recalled else [])+[{"role":"user","content":Context},{"role":"system","content":Information()}],
+                query=messages[-1]
+            ),
+            temperature=0.7,
+            max_tokens=1024,
+            top_p=1,
+            stop=None
+        )
+
+        Parts=[]
+
+        for chunk in completion:
+            if chunk.choices[0].delta.content:
+                Parts.append(chunk.choices[0].delta.content)
+                if on_token is not None:
+                    on_token(chunk.choices[0].delta.content.replace("</s>",""))
+    except Exception:
+        # Degrade to the raw search results rather than failing the turn
+        messages.pop()
+        if Results:
+            return AnswerModifier(Answer=Results.replace("[end]",""))
+        return "I can't reach the search or language services right now, Sir. Please try again shortly."
+
+    Answer="".join(Parts).strip().replace("</s>","")
     messages.append({"role":"assistant","content":Answer})  
 
-    with open(r"Data/ChatLog.json","w") as f:
-        dump(messages,f,indent=4)
+    # Only a short window is kept; older turns come back through the history index
+    if history is None:
+        history_index.add(prompt,Answer)
+    trim_history(messages)
+    if history is None:
+        with open(r"Data/ChatLog.json","w") as f:
+            dump(messages,f,indent=4)
 
-    SystemChatBot.pop()
     return AnswerModifier(Answer=Answer)
 
 if __name__=="__main__":
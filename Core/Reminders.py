@@ -0,0 +1,286 @@
+import os
+import re
+import time
+import heapq
+import uuid
+import logging
+import threading
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from json import dumps, loads, JSONDecodeError
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Paths
+REMINDERS_PATH = os.path.join("Data", "Reminders.jsonl")
+
+# Longest single sleep; a wall-clock jump (suspend, NTP step) is noticed within this long
+MAX_SLEEP = 300.0
+
+MONTHS = {name: number for number, names in enumerate([
+    ("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"), ("may",), ("june", "jun"),
+    ("july", "jul"), ("august", "aug"), ("september", "sep", "sept"), ("october", "oct"),
+    ("november", "nov"), ("december", "dec")], 1) for name in names}
+WEEKDAYS = {name: number for number, name in enumerate(
+    ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"])}
+UNITS = {"second": 1, "sec": 1, "minute": 60, "min": 60, "hour": 3600, "hr": 3600, "day": 86400, "week": 604800}
+
+MONTH_NAMES = "|".join(sorted(MONTHS, key=len, reverse=True))
+RELATIVE = re.compile(r"\b(?:in|after)\s+(\d+|an?|one)\s+(second|sec|minute|min|hour|hr|day|week)s?\b", re.I)
+# Further parts of a relative time: 'in 2 hours and 30 minutes'
+RELATIVE_MORE = re.compile(r"\s*(?:,\s*|and\s+)?(\d+|an?|one)\s+(second|sec|minute|min|hour|hr|day|week)s?\b", re.I)
+ISO_DATE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+DAY_MONTH = re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?({MONTH_NAMES})\b\.?", re.I)
+MONTH_DAY = re.compile(rf"\b({MONTH_NAMES})\.?\s+(\d{{1,2}})(?:st|nd|rd|th)?\b", re.I)
+DAY_WORD = re.compile(r"\b(?:on\s+)?(today|tonight|tomorrow|monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b", re.I)
+# A bare hour said with 'tonight', as in '9 tonight'
+NIGHT_HOUR = re.compile(r"\b(\d{1,2})(?::(\d{2}))?\s+(?=tonight\b)", re.I)
+CLOCK = re.compile(r"\b(?:at\s+)?(\d{1,2})(?::(\d{2}))?\s*(a\.?m\.?|p\.?m\.?)(?!\w)|\b(?:at\s+)?(\d{1,2}):(\d{2})\b"
+                   r"|\bat\s+(\d{1,2})\b(?!:)", re.I)
+CONNECTIVES = re.compile(r"^(?:(?:remind me|reminder|me|to|that|about|of|for|on|at|,)\s+)+|(?:\s+(?:on|at|,))+$", re.I)
+
+def parse_reminder(text: str, now: Optional[datetime.datetime] = None) -> Tuple[datetime.datetime, str]:
+    """Splits 'reminder 9:00pm 25th june meeting' style text into a due time and a message.
+
+    Understands relative times ('in 10 minutes'), clock times ('9pm',
+    '21:30', 'at 7'), dates ('25th june', 'june 25', '2025-06-25') and day
+    words ('tomorrow', 'friday'). Without a clock time a day means 09:00,
+    'tonight' 20:00, and hours said with 'tonight' are in the evening. A time
+    without a date that has already passed today means tomorrow, and a day and
+    month without a year that have passed mean next year; a time today or
+    tonight that has passed is an error. Raises ValueError when no time can be
+    found.
+    """
+    now = (now or datetime.datetime.now()).replace(microsecond=0)
+    rest = f" {text.strip()} "
+
+    def take(pattern: re.Pattern):
+        nonlocal rest
+        match = pattern.search(rest)
+        if match:
+            rest = rest[:match.start()] + " " + rest[match.end():]
+        return match
+
+    def amount(match: re.Match) -> int:
+        count = 1 if match.group(1).lower() in ("a", "an", "one") else int(match.group(1))
+        return count * UNITS[match.group(2).lower()]
+
+    relative = take(RELATIVE)
+    if relative:
+        seconds, position = amount(relative), relative.start() + 1
+        more = RELATIVE_MORE.match(rest, position)
+        while more:
+            seconds += amount(more)
+            rest = rest[:position] + " " + rest[more.end():]
+            more = RELATIVE_MORE.match(rest, position)
+        return now + datetime.timedelta(seconds=seconds), clean_message(rest)
+
+    date, rolls_over = None, False
+    iso = take(ISO_DATE)
+    if iso:
+        date = datetime.date(int(iso.group(1)), int(iso.group(2)), int(iso.group(3)))
+    else:
+        day_month = take(DAY_MONTH)
+        month_day = None if day_month else take(MONTH_DAY)
+        if day_month:
+            date = datetime.date(now.year, MONTHS[day_month.group(2).lower().rstrip(".")], int(day_month.group(1)))
+        elif month_day:
+            date = datetime.date(now.year, MONTHS[month_day.group(1).lower().rstrip(".")], int(month_day.group(2)))
+        rolls_over = date is not None
+
+    night_hour = take(NIGHT_HOUR)
+    day_word = take(DAY_WORD)
+    word = day_word.group(1).lower() if day_word else None
+    evening, today = word == "tonight", word in ("today", "tonight")
+    if date is None and day_word:
+        if word == "tomorrow":
+            date = now.date() + datetime.timedelta(days=1)
+        elif today:
+            date = now.date()
+        else:
+            date = now.date() + datetime.timedelta(days=(WEEKDAYS[word] - now.weekday() - 1) % 7 + 1)
+
+    clock = take(CLOCK)
+    if clock is None and date is None:
+        raise ValueError(f"No date or time found in reminder: {text!r}")
+    if night_hour and clock is None:
+        hour, minute = int(night_hour.group(1)), int(night_hour.group(2) or 0)
+        if hour < 12:
+            hour += 12
+    elif clock is None:
+        hour, minute = (20, 0) if evening else (9, 0)
+    elif clock.group(3):
+        hour, minute = int(clock.group(1)) % 12, int(clock.group(2) or 0)
+        if clock.group(3).lower().startswith("p"):
+            hour += 12
+    elif clock.group(4):
+        hour, minute = int(clock.group(4)), int(clock.group(5))
+        if evening and hour < 12:
+            hour += 12
+    else:
+        hour, minute = int(clock.group(6)), 0
+        if evening and hour < 12:
+            hour += 12
+    if hour > 23 or minute > 59:
+        raise ValueError(f"Invalid time in reminder: {text!r}")
+
+    due = datetime.datetime.combine(date or now.date(), datetime.time(hour, minute))
+    if due <= now:
+        if date is None:
+            due += datetime.timedelta(days=1)
+        elif rolls_over:
+            due = due.replace(year=due.year + 1)
+        elif today:
+            if clock is None and night_hour is None:
+                raise ValueError(f"Give a time for a reminder {word}: {text!r}")
+            raise ValueError(f"{due:%H:%M} {word} has already passed: {text!r}")
+    return due, clean_message(rest)
+
+def clean_message(text: str) -> str:
+    message = CONNECTIVES.sub("", " ".join(text.split())).strip()
+    return message or "Reminder"
+
+class ReminderScheduler:
+    """Persistent reminders fired by one thread that sleeps until the next is due.
+
+    Pending reminders sit in a min-heap by due time. The scheduler thread
+    waits on a condition with a timeout equal to the time until the earliest
+    one, so idle cost does not depend on how many are pending; adding an
+    earlier reminder wakes it to re-arm. Every change is appended to the
+    journal in Data/Reminders.jsonl, which is replayed on start and compacted
+    (through a temporary file and os.replace) on a later append once most of
+    its lines are stale; starting never rewrites it, so reminders that came due while the
+    assistant was off fire immediately, flagged as late.
+    on_fire runs on a separate single worker, so slow speech output never
+    delays the next reminder.
+    """
+
+    def __init__(self, path: str = REMINDERS_PATH, on_fire: Optional[Callable[[dict], None]] = None):
+        self.path = path
+        self.on_fire = on_fire
+        self.reminders: Dict[str, dict] = {}
+        self.heap: List[Tuple[float, str]] = []
+        self.condition = threading.Condition()
+        self.notifier = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reminder")
+        self.thread: Optional[threading.Thread] = None
+        self.stopped = False
+        self.journal_lines = 0
+        # Set when the journal ends in a torn line, so the next append starts on a line of its own
+        self.torn_tail = False
+        # Only read here; the journal is rewritten lazily by _append once most of it is stale
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self.journal_lines += 1
+                    self.torn_tail = not line.endswith("\n")
+                    try:
+                        entry = loads(line)
+                    except JSONDecodeError:
+                        # A torn last line from a crash mid-write
+                        continue
+                    if entry.get("op") == "add":
+                        self.reminders[entry["reminder"]["id"]] = entry["reminder"]
+                    elif entry.get("op") == "done":
+                        self.reminders.pop(entry["id"], None)
+        except FileNotFoundError:
+            return
+        self.heap = [(reminder["due"], reminder_id) for reminder_id, reminder in self.reminders.items()]
+        heapq.heapify(self.heap)
+
+    def _append(self, *entries: dict) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(("\n" if self.torn_tail else "") + "".join(dumps(entry) + "\n" for entry in entries))
+        self.torn_tail = False
+        self.journal_lines += len(entries)
+        if self.journal_lines > 2 * len(self.reminders) + 100:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrites the journal with one line per pending reminder."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for reminder in self.reminders.values():
+                f.write(dumps({"op": "add", "reminder": reminder}) + "\n")
+        os.replace(temp_path, self.path)
+        self.journal_lines = len(self.reminders)
+        self.torn_tail = False
+
+    def add(self, due: datetime.datetime, message: str) -> dict:
+        reminder = {"id": uuid.uuid4().hex[:12], "due": due.timestamp(), "message": message,
+                    "created": time.time()}
+        with self.condition:
+            self.reminders[reminder["id"]] = reminder
+            heapq.heappush(self.heap, (reminder["due"], reminder["id"]))
+            self._append({"op": "add", "reminder": reminder})
+            if self.heap[0][1] == reminder["id"]:
+                self.condition.notify()
+        return reminder
+
+    def add_text(self, text: str) -> dict:
+        """Parses a 'reminder' task's details and schedules it."""
+        due, message = parse_reminder(text)
+        return self.add(due, message)
+
+    def cancel(self, reminder_id: str) -> bool:
+        # The heap entry stays behind and is skipped when it comes up, until most of the heap is stale
+        with self.condition:
+            if self.reminders.pop(reminder_id, None) is None:
+                return False
+            self._append({"op": "done", "id": reminder_id})
+            if len(self.heap) > 2 * len(self.reminders) + 100:
+                self.heap = [(reminder["due"], rid) for rid, reminder in self.reminders.items()]
+                heapq.heapify(self.heap)
+                self.condition.notify()
+            return True
+
+    def pending(self) -> List[dict]:
+        with self.condition:
+            return sorted(self.reminders.values(), key=lambda r: r["due"])
+
+    def start(self) -> None:
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="reminders", daemon=True)
+            self.thread.start()
+
+    def stop(self) -> None:
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                due = []
+                while not self.stopped:
+                    # Drop heap entries of cancelled reminders
+                    while self.heap and self.heap[0][1] not in self.reminders:
+                        heapq.heappop(self.heap)
+                    now = time.time()
+                    while self.heap and self.heap[0][0] <= now:
+                        _, reminder_id = heapq.heappop(self.heap)
+                        reminder = self.reminders.pop(reminder_id, None)
+                        if reminder is not None:
+                            due.append(reminder)
+                    if due:
+                        self._append(*({"op": "done", "id": reminder["id"]} for reminder in due))
+                        break
+                    self.condition.wait(min(self.heap[0][0] - now, MAX_SLEEP) if self.heap else None)
+                if self.stopped:
+                    return
+            for reminder in due:
+                reminder["late"] = time.time() - reminder["due"] > 60
+                self.notifier.submit(self._fire, reminder)
+
+    def _fire(self, reminder: dict) -> None:
+        logging.info(f"Reminder due: {reminder['message']}")
+        if self.on_fire is not None:
+            try:
+                self.on_fire(reminder)
+            except Exception as e:
+                logging.error(f"Reminder notification error: {e}")
+
+reminder_scheduler = ReminderScheduler()
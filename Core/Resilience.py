@@ -0,0 +1,202 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, TypeVar
+
+from dotenv import dotenv_values
+
+env_vars = dotenv_values(".env")
+TurnBudget = float(env_vars.get("TurnBudget", 20))
+CallBudget = float(env_vars.get("CallBudget", 30))
+BreakerFailures = int(env_vars.get("BreakerFailures", 3))
+BreakerResetSeconds = float(env_vars.get("BreakerResetSeconds", 30))
+
+T = TypeVar("T")
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+class DeadlineExceeded(Exception):
+    """Raised when a call would start after its turn's deadline has passed."""
+
+class Deadline:
+    """Absolute point in time by which a turn, and every call it makes, must finish."""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+_local = threading.local()
+
+def begin_deadline(seconds: float = TurnBudget) -> Deadline:
+    """Gives every outbound call made on this thread until end_deadline() a shared budget."""
+    _local.deadline = Deadline(seconds)
+    return _local.deadline
+
+def end_deadline() -> None:
+    _local.deadline = None
+
+@contextmanager
+def deadline_scope(seconds: float = TurnBudget) -> Iterator[Deadline]:
+    previous = getattr(_local, "deadline", None)
+    try:
+        yield begin_deadline(seconds)
+    finally:
+        _local.deadline = previous
+
+def current_deadline() -> Deadline:
+    """The active turn's deadline, or a fresh per-call budget outside of a turn."""
+    deadline = getattr(_local, "deadline", None)
+    return deadline if deadline is not None else Deadline(CallBudget)
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one endpoint.
+
+    After failure_threshold failures in a row the circuit opens and calls fail
+    immediately for reset_timeout seconds. Then a single probe call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BreakerFailures, reset_timeout: float = BreakerResetSeconds):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self.lock:
+            if self.opened_at is not None:
+                logging.info(f"Circuit {self.name} closed")
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.probing:
+                    logging.warning(f"Circuit {self.name} opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+def breaker_states() -> Dict[str, str]:
+    with _breakers_lock:
+        return {name: b.state for name, b in sorted(_breakers.items())}
+
+def is_transient(error: Exception) -> bool:
+    """Client errors (4xx other than 408 and 429) will not go away on retry."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int) and 400 <= status < 500:
+        return status in (408, 429)
+    return True
+
+def backoff_delay(attempt: int, base: float = 0.2, cap: float = 2.0) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def _before_attempt(endpoint: CircuitBreaker, deadline: Deadline) -> float:
+    if not endpoint.allow():
+        raise CircuitOpenError(f"{endpoint.name} circuit is open")
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded(f"No time budget left for {endpoint.name}")
+    return remaining
+
+def _retry_delay(endpoint: CircuitBreaker, error: Exception, attempt: int, attempts: int,
+                 deadline: Deadline, min_attempt: float) -> Optional[float]:
+    """Records the failure and returns how long to wait before retrying, or None to give up."""
+    if not is_transient(error):
+        # The endpoint answered; the request itself was wrong
+        endpoint.record_success()
+        return None
+    endpoint.record_failure()
+    if attempt + 1 >= attempts or endpoint.state != "closed":
+        return None
+    delay = backoff_delay(attempt)
+    if deadline.remaining() < delay + min_attempt:
+        return None
+    logging.debug(f"Retrying {endpoint.name} in {delay:.2f}s after: {error}")
+    return delay
+
+def call(name: str, func: Callable[[float], T], attempts: int = 3, deadline: Optional[Deadline] = None,
+         min_attempt: float = 0.5) -> T:
+    """Calls func(timeout) through the endpoint's circuit breaker.
+
+    The timeout passed to func is what is left of the deadline. Transient
+    failures are retried with jittered backoff, but only while the breaker is
+    closed and enough budget remains for another attempt of min_attempt
+    seconds. The last error is re-raised.
+    """
+    endpoint = breaker(name)
+    deadline = deadline or current_deadline()
+    for attempt in range(attempts):
+        timeout = _before_attempt(endpoint, deadline)
+        try:
+            result = func(timeout)
+        except Exception as e:
+            delay = _retry_delay(endpoint, e, attempt, attempts, deadline, min_attempt)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+        endpoint.record_success()
+        return result
+
+async def call_async(name: str, func: Callable[[float], "asyncio.Future"], attempts: int = 3,
+                     deadline: Optional[Deadline] = None, min_attempt: float = 0.5):
+    """Coroutine version of call(); func(timeout) returns an awaitable."""
+    endpoint = breaker(name)
+    deadline = deadline or current_deadline()
+    for attempt in range(attempts):
+        timeout = _before_attempt(endpoint, deadline)
+        try:
+            result = await asyncio.wait_for(func(timeout), timeout)
+        except Exception as e:
+            delay = _retry_delay(endpoint, e, attempt, attempts, deadline, min_attempt)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        endpoint.record_success()
+        return result
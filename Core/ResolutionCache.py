@@ -0,0 +1,119 @@
+import os
+import time
+import threading
+from json import load, dump, JSONDecodeError
+from typing import Optional
+
+from Core.MemoryBudget import memory_budget
+
+# Paths
+CACHE_PATH = os.path.join("Data", "ResolutionCache.json")
+OVERRIDES_PATH = os.path.join("Data", "ResolutionOverrides.json")
+
+# Default lifetimes in seconds
+HIT_TTL = 30 * 24 * 3600
+MISS_TTL = 6 * 3600
+
+# Entries kept per namespace; beyond it expired entries go first, then the ones closest to expiry
+MAX_ENTRIES = 2000
+
+class ResolutionCache:
+    """Persistent cache mapping app names and song queries to launch targets or URLs.
+
+    Entries live in namespaces ("app", "song"). Each entry records a kind
+    ("app", "url" or "miss"), a target and an expiry. Misses are cached too so a
+    failed lookup is not repeated on every command. Manual overrides are read
+    from a separate file and always win over cached entries. Each namespace
+    holds at most max_entries entries.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, overrides_path: str = OVERRIDES_PATH,
+                 hit_ttl: float = HIT_TTL, miss_ttl: float = MISS_TTL, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.overrides_path = overrides_path
+        self.hit_ttl = hit_ttl
+        self.miss_ttl = miss_ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = self._load(path)
+        self.overrides = self._load(overrides_path)
+
+    @staticmethod
+    def normalize(key: str) -> str:
+        """Normalizes a lookup key so 'Open  Chrome ' and 'open chrome' share an entry."""
+        return " ".join(key.lower().split())
+
+    @staticmethod
+    def _load(path: str) -> dict:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = load(f)
+            return data if isinstance(data, dict) else {}
+        except (FileNotFoundError, JSONDecodeError):
+            return {}
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            dump(self.entries, f, indent=4)
+        os.replace(temp_path, self.path)
+
+    def get(self, namespace: str, key: str) -> Optional[dict]:
+        """Returns the live entry for key, including cached misses, or None."""
+        key = self.normalize(key)
+        override = self.overrides.get(namespace, {}).get(key)
+        if override is not None:
+            if isinstance(override, str):
+                override = {"kind": "url" if "://" in override else "app", "target": override}
+            return override
+
+        with self.lock:
+            entry = self.entries.get(namespace, {}).get(key)
+            if entry is None:
+                return None
+            if entry.get("expires", 0) < time.time():
+                del self.entries[namespace][key]
+                return None
+            return entry
+
+    def put(self, namespace: str, key: str, kind: str, target: str = "") -> None:
+        """Stores a resolved target. Use kind 'miss' to record a failed lookup."""
+        ttl = self.miss_ttl if kind == "miss" else self.hit_ttl
+        entry = {"kind": kind, "target": target, "expires": time.time() + ttl}
+        with self.lock:
+            entries = self.entries.setdefault(namespace, {})
+            entries[self.normalize(key)] = entry
+            if len(entries) > self.max_entries:
+                self._evict(entries)
+            try:
+                self._save()
+            except OSError:
+                pass
+
+    def _evict(self, entries: dict) -> None:
+        now = time.time()
+        for key in [key for key, entry in entries.items() if entry.get("expires", 0) < now]:
+            del entries[key]
+        while len(entries) > self.max_entries:
+            del entries[min(entries, key=lambda key: entries[key].get("expires", 0))]
+
+    def invalidate(self, namespace: str, key: str) -> None:
+        """Drops a cached entry, for example after its target failed to launch."""
+        with self.lock:
+            if self.entries.get(namespace, {}).pop(self.normalize(key), None) is not None:
+                try:
+                    self._save()
+                except OSError:
+                    pass
+
+    def set_override(self, namespace: str, key: str, target: str) -> None:
+        """Pins key to target permanently and persists it to the overrides file."""
+        self.overrides.setdefault(namespace, {})[self.normalize(key)] = target
+        os.makedirs(os.path.dirname(self.overrides_path) or ".", exist_ok=True)
+        with open(self.overrides_path, "w", encoding="utf-8") as f:
+            dump(self.overrides, f, indent=4)
+
+resolution_cache = ResolutionCache()
+memory_budget.watch("resolution cache", lambda: max(map(len, resolution_cache.entries.values()), default=0),
+                    resolution_cache.max_entries)
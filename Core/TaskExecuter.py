@@ -4,16 +4,27 @@ from pywhatkit import search, playonyt
 from dotenv import dotenv_values
 from bs4 import BeautifulSoup
 from rich import print
-from groq import Groq
+from Core.ResolutionCache import resolution_cache
+from Core.AppIndex import app_index, launch_app, close_app
+from Core.CommandExecutor import CommandExecutor
+from Core.LLMClient import llm_client
+from Core.PromptBuilder import prompt_builder
+from Core.Reminders import reminder_scheduler
+from Core.MemoryBudget import memory_budget
 import webbrowser
 import subprocess
 import requests
 import keyboard
 import asyncio
+import sys
 import os
+from collections import deque
+from datetime import datetime
 
 env_vars = dotenv_values(".env")
-GroqAPIKey = env_vars.get("GroqAPIKey")
+AutomationWorkers = int(env_vars.get("AutomationWorkers", 4))
+AutomationDeadline = float(env_vars.get("AutomationDeadline", 15))
+ContentDeadline = float(env_vars.get("ContentDeadline", 180))
 
 classes = [
     "zCubwf", "hgKElc", "LTKOO sY7ric", "ZØLcW", "gsrt vk_bk FzvWSb YwPhnf", "pclqee",
@@ -24,19 +35,25 @@ classes = [
 
 useragent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.75 Safari/537.36'
 
-client = Groq(api_key=GroqAPIKey)
+app_index.start()
+
+automation_executor = CommandExecutor(max_workers=AutomationWorkers, deadline=AutomationDeadline)
 
 professional_responses = [
     "Your satisfaction is my top priority; feel free to reach out if there's anything else I can help you with.",
     "I'm at your service for any additional questions or support you may need - don't hesitate to ask."
 ]
 
-messages = []
+# Past content requests as (topic, opening excerpt); only the most relevant are resent
+content_history = deque(maxlen=8)
+memory_budget.watch("content history", content_history.__len__, content_history.maxlen)
+CONTENT_CONTEXT_EXCHANGES = 2
+CONTENT_EXCERPT_CHARS = 600
 
-SystemChatBot = [{
-    "role": "system",
-    "content": f"Hello, I am {os.environ.get('Username', 'User')}, You're a content writer. You have to write content like letters, articles, etc. I can help you with that. Just tell me what you want to write about."
-}]
+SystemChatBot = [prompt_builder.static(
+    "content.system",
+    f"Hello, I am {os.environ.get('Username', 'User')}, You're a content writer. You have to write content like letters, articles, etc. I can help you with that. Just tell me what you want to write about."
+)]
 
 def GoogleSearch(Topic):
     search(Topic)
@@ -44,37 +61,76 @@ def GoogleSearch(Topic):
 
 def Content(Topic):
     def OpenNotepad(File):
-        default_text_editor = 'notepad.exe'
-        subprocess.Popen([default_text_editor, File])
-
-    def ContentWriterAI(prompt):
-        messages.append({"role": "user", "content": prompt})
-        completion = client.chat.completions.create(
-            model="mixtral-8x7b-32768",
-            messages=SystemChatBot + messages,
+        if sys.platform == "win32":
+            subprocess.Popen(['notepad.exe', File])
+        elif sys.platform == "darwin":
+            subprocess.Popen(['open', '-t', File])
+        else:
+            subprocess.Popen(['xdg-open', File])
+
+    def RelevantContext(prompt):
+        # Bounded context: at most a couple of earlier requests that share words with this one
+        words = {word for word in prompt.lower().split() if len(word) > 3}
+        scored = []
+        for past_topic, excerpt in content_history:
+            overlap = len(words & set(past_topic.lower().split()))
+            if overlap:
+                scored.append((overlap, past_topic, excerpt))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        context = []
+        for _, past_topic, excerpt in scored[:CONTENT_CONTEXT_EXCHANGES]:
+            context.append({"role": "user", "content": past_topic})
+            context.append({"role": "assistant", "content": excerpt})
+        return context
+
+    def ContentWriterAI(prompt, file_path):
+        completion = llm_client.stream(
+            "llm.content",
+            task="content",
+            messages=prompt_builder.build(
+                "llm.content",
+                static=SystemChatBot,
+                history=RelevantContext(prompt),
+                query={"role": "user", "content": prompt}
+            ),
             max_tokens=2048,
             temperature=0.7,
             top_p=1,
-            stream=True,
             stop=None
         )
-        Answer = ""
-        for chunk in completion:
-            if chunk.choices[0].delta.content:
-                Answer += chunk.choices[0].delta.content
-        Answer = Answer.replace("</s", "")
-        messages.append({"role": "assistant", "content": Answer})
-        return Answer
+        # Write tokens as they arrive and open the editor once the first chunk is on disk
+        editor_opened = False
+        excerpt = ""
+        pending = ""
+        with open(file_path, "w", encoding="utf-8") as file:
+            for chunk in completion:
+                pending += chunk.choices[0].delta.content or ""
+                pending = pending.replace("</s>", "")
+                # Hold back a tail that may be the start of a "</s>" split across chunks
+                held = next((n for n in (3, 2, 1) if pending.endswith("</s>"[:n])), 0)
+                text, pending = pending[:len(pending) - held], pending[len(pending) - held:]
+                if not text:
+                    continue
+                file.write(text)
+                file.flush()
+                if len(excerpt) < CONTENT_EXCERPT_CHARS:
+                    excerpt += text
+                if not editor_opened:
+                    OpenNotepad(file_path)
+                    editor_opened = True
+            if pending:
+                file.write(pending)
+                file.flush()
+                excerpt += pending
+        content_history.append((prompt, excerpt[:CONTENT_EXCERPT_CHARS]))
+        return editor_opened
 
-    Topic = Topic.replace("Content", "")
-    ContentByAI = ContentWriterAI(Topic)
+    Topic = Topic.replace("Content", "").strip()
 
     os.makedirs("Data", exist_ok=True)
-    file_path = rf"Data\{Topic.lower().replace(' ', '')}.txt"
-    with open(file_path, "w", encoding="utf-8") as file:
-        file.write(ContentByAI)
-
-    OpenNotepad(file_path)
+    file_path = os.path.join("Data", f"{Topic.lower().replace(' ', '')}.txt")
+    if not ContentWriterAI(Topic, file_path):
+        OpenNotepad(file_path)
     return True
 
 def YouTubeSearch(Topic):
@@ -83,14 +139,48 @@ def YouTubeSearch(Topic):
     return True
 
 def PlayYoutube(query):
-    playonyt(query)
+    cached = resolution_cache.get("song", query)
+    if cached and cached["kind"] == "url":
+        webopen(cached["target"])
+        return True
+
+    url = playonyt(query, open_video=False)
+    if url:
+        resolution_cache.put("song", query, "url", url)
+        webopen(url)
     return True
 
 def OpenApp(app, sess=requests.session()):
+    cached = resolution_cache.get("app", app)
+    if cached:
+        if cached["kind"] == "url":
+            webopen(cached["target"])
+            return True
+        if cached["kind"] == "miss":
+            print(f"No launch target known for {app}")
+            return False
+
+    # A cached or overridden target wins over whatever the spoken name resolves to
+    target = cached["target"] if cached else app
+    exact = app_index.resolve(target, fuzzy=False)
+    entry = exact or app_index.resolve(target)
+    if entry:
+        try:
+            if launch_app(entry):
+                if exact and not cached:
+                    app_index.learn_alias(app, entry)
+                return True
+        except OSError:
+            pass
+
     try:
-        appopen(app, match_closest=True, output=True, throw_error=True)
+        appopen(target, match_closest=True, output=True, throw_error=True)
+        resolution_cache.put("app", app, "app", target)
         return True
     except:
+        if cached:
+            resolution_cache.invalidate("app", app)
+
         def extract_links(html):
             if html is None:
                 return []
@@ -112,19 +202,38 @@ def OpenApp(app, sess=requests.session()):
         if html:
             links = extract_links(html)
             if links:
+                resolution_cache.put("app", app, "url", links[0])
                 webopen(links[0])
+            else:
+                resolution_cache.put("app", app, "miss")
         return True
 
 def CloseApp(app):
     if "chrome" in app:
         pass
     else:
+        exact = app_index.resolve(app, fuzzy=False)
+        entry = exact or app_index.resolve(app)
+        if entry and close_app(entry):
+            if exact:
+                app_index.learn_alias(app, entry)
+            return True
         try:
             close(app, match_closest=True, output=True, throw_error=True)
             return True
         except:
             return False
 
+def KnownApp(app):
+    """Whether a spoken app name is exactly an installed application's name or a learned alias of one"""
+    entry = app_index.resolve(app, fuzzy=False)
+    return entry is not None and entry.get("kind") != "path"
+
+def SetReminder(details):
+    """Schedules a reminder and returns the confirmation to give; a ValueError says why it could not be set"""
+    reminder = reminder_scheduler.add_text(details)
+    return f"Reminder set for {datetime.fromtimestamp(reminder['due']):%d %B %H:%M}: {reminder['message']}"
+
 def System(command):
     def mute():
         keyboard.press_and_release("volume mute")
@@ -150,42 +259,39 @@ def System(command):
     return True
 
 async def TranslateAndExecute(commands: list[str]):
-    funcs = []
+    jobs = []
     for command in commands:
         if command.startswith("open"):
             if "open it" in command or command == "open file":
                 continue
-            fun = asyncio.to_thread(OpenApp, command.removeprefix("open "))
-            funcs.append(fun)
+            jobs.append((command, OpenApp, (command.removeprefix("open "),)))
         elif command.startswith("close"):
-            fun = asyncio.to_thread(CloseApp, command.removeprefix("close "))
-            funcs.append(fun)
+            jobs.append((command, CloseApp, (command.removeprefix("close "),)))
         elif command.startswith("play"):
-            fun = asyncio.to_thread(PlayYoutube, command.removeprefix("play "))
-            funcs.append(fun)
+            jobs.append((command, PlayYoutube, (command.removeprefix("play "),)))
         elif command.startswith("content"):
-            fun = asyncio.to_thread(Content, command.removeprefix("content "))
-            funcs.append(fun)
+            # Writing up to 2048 tokens is slow by nature, so it gets its own deadline
+            jobs.append((command, Content, (command.removeprefix("content "),), ContentDeadline))
         elif command.startswith("google search"):
-            fun = asyncio.to_thread(GoogleSearch, command.removeprefix("google search "))
-            funcs.append(fun)
+            jobs.append((command, GoogleSearch, (command.removeprefix("google search "),)))
         elif command.startswith("youtube search"):
-            fun = asyncio.to_thread(YouTubeSearch, command.removeprefix("youtube search "))
-            funcs.append(fun)
+            jobs.append((command, YouTubeSearch, (command.removeprefix("youtube search "),)))
+        elif command.startswith("reminder"):
+            jobs.append((command, SetReminder, (command.removeprefix("reminder "),)))
         elif command.startswith("system"):
-            fun = asyncio.to_thread(System, command.removeprefix("system "))
-            funcs.append(fun)
+            jobs.append((command, System, (command.removeprefix("system "),)))
         else:
             print(f"No Function Found for {command}")
 
-    results = await asyncio.gather(*funcs)
-    for result in results:
+    async for result in automation_executor.run(jobs):
         yield result
 
 async def Automation(commands: list[str]):
+    results = []
     async for result in TranslateAndExecute(commands):
-        pass
-    return True
+        print(f"{result.command}: {result.status} ({result.elapsed:.2f}s) {result.error}")
+        results.append(result)
+    return results
 
 if __name__ == "__main__":
     asyncio.run(Automation(["open facebook", "open instagram", "open telegram", "play afsanay", "content song for me"]))
@@ -0,0 +1,172 @@
+import os
+import time
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+from contextlib import contextmanager
+from json import dumps
+from typing import Dict, Iterable, Iterator, Optional
+
+# Paths
+LAST_TURN_PATH = os.path.join("Data", "Latency.data")
+PROMETHEUS_PATH = os.path.join("Data", "Metrics.prom")
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+class LatencyHistogram:
+    """Rolling latency samples for one stage; percentiles cover the last window samples."""
+
+    def __init__(self, window: int = 1000):
+        self.samples = deque(maxlen=window)
+        self.sorted_samples = []
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds: float) -> None:
+        if len(self.samples) == self.samples.maxlen:
+            oldest = self.samples[0]
+            del self.sorted_samples[bisect_left(self.sorted_samples, oldest)]
+        self.samples.append(seconds)
+        insort(self.sorted_samples, seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q: float) -> float:
+        if not self.sorted_samples:
+            return 0.0
+        return self.sorted_samples[min(len(self.sorted_samples) - 1, int(q * len(self.sorted_samples)))]
+
+    def summary(self) -> dict:
+        result = {"count": self.count, "mean": self.total / self.count if self.count else 0.0}
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}"] = self.quantile(q)
+        return result
+
+class Tracer:
+    """Per-turn spans plus rolling per-stage latency histograms.
+
+    Stages are recorded with span() or traced_stream(). Between begin_turn()
+    and end_turn(), spans on the same thread are also added to that turn's
+    breakdown; a turn handled by several threads moves between them with
+    detach_turn() and resume_turn(). end_turn() writes the breakdown to Data/Latency.data for the UI
+    and refreshes Data/Metrics.prom for a Prometheus textfile collector; set either path to None to skip it.
+    """
+
+    def __init__(self, window: int = 1000, last_turn_path: Optional[str] = LAST_TURN_PATH,
+                 prometheus_path: Optional[str] = PROMETHEUS_PATH):
+        self.window = window
+        self.last_turn_path = last_turn_path
+        self.prometheus_path = prometheus_path
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.lock = threading.Lock()
+        # Turns of different server requests end on different threads; their file writes take turns
+        self.write_lock = threading.Lock()
+        self.local = threading.local()
+        self.last_turn: Dict[str, float] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = LatencyHistogram(self.window)
+            histogram.add(seconds)
+        turn = getattr(self.local, "turn", None)
+        if turn is not None:
+            turn["spans"][stage] = turn["spans"].get(stage, 0.0) + seconds
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def traced_stream(self, stream: Iterable, stage: str) -> Iterator:
+        """Wraps a streamed completion, recording <stage>.ttft and <stage>.total."""
+        start = time.perf_counter()
+        first_token = False
+        try:
+            for chunk in stream:
+                if not first_token and chunk.choices and chunk.choices[0].delta.content:
+                    first_token = True
+                    self.record(f"{stage}.ttft", time.perf_counter() - start)
+                yield chunk
+        finally:
+            self.record(f"{stage}.total", time.perf_counter() - start)
+
+    def begin_turn(self) -> None:
+        self.local.turn = {"started": time.perf_counter(), "spans": {}}
+
+    def detach_turn(self) -> Optional[dict]:
+        """Takes the current turn off this thread, so that another thread can resume_turn() it."""
+        turn = getattr(self.local, "turn", None)
+        self.local.turn = None
+        return turn
+
+    def resume_turn(self, turn: Optional[dict]) -> None:
+        self.local.turn = turn
+
+    def end_turn(self) -> Dict[str, float]:
+        """Closes the current turn and returns its per-stage breakdown in seconds."""
+        turn = getattr(self.local, "turn", None)
+        if turn is None:
+            return {}
+        self.local.turn = None
+        breakdown = dict(turn["spans"])
+        breakdown["turn"] = time.perf_counter() - turn["started"]
+        self.record("turn", breakdown["turn"])
+        self.last_turn = breakdown
+        try:
+            with self.write_lock:
+                if self.last_turn_path:
+                    self._replace(self.last_turn_path, dumps(breakdown))
+                if self.prometheus_path:
+                    self._replace(self.prometheus_path, self.export_prometheus())
+        except OSError:
+            pass
+        return breakdown
+
+    @staticmethod
+    def _replace(path: str, text: str) -> None:
+        """Writes a file whole, so a reader never sees half of it."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self.lock:
+            return {stage: histogram.summary() for stage, histogram in sorted(self.histograms.items())}
+
+    def export_json(self) -> str:
+        return dumps({"stages": self.snapshot(), "last_turn": self.last_turn}, indent=4)
+
+    def export_prometheus(self) -> str:
+        lines = ["# HELP jarvis_stage_latency_seconds Latency of assistant pipeline stages.",
+                 "# TYPE jarvis_stage_latency_seconds summary"]
+        with self.lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                for q in QUANTILES:
+                    lines.append(f'jarvis_stage_latency_seconds{{stage="{stage}",quantile="{q}"}} {histogram.quantile(q):.6f}')
+                lines.append(f'jarvis_stage_latency_seconds_sum{{stage="{stage}"}} {histogram.total:.6f}')
+                lines.append(f'jarvis_stage_latency_seconds_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+def format_percentiles(snapshot: Dict[str, dict]) -> str:
+    """Renders a snapshot() as a table of count, mean and percentiles per stage."""
+    rows = [f"{'stage':<28}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}"]
+    for stage, summary in snapshot.items():
+        rows.append(f"{stage:<28}{summary['count']:>7}" + "".join(
+            f"{summary[key] * 1000:>8.1f}ms" for key in ("mean", "p50", "p95", "p99")))
+    return "\n".join(rows)
+
+def format_breakdown(breakdown: Dict[str, float]) -> str:
+    """Renders a turn breakdown as a compact one-line summary for the UI."""
+    parts = [f"{stage} {seconds * 1000:.0f}ms" for stage, seconds in breakdown.items() if stage != "turn"]
+    if "turn" in breakdown:
+        parts.append(f"total {breakdown['turn']:.2f}s")
+    return " · ".join(parts)
+
+tracer = Tracer()
@@ -0,0 +1,250 @@
+import re
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Optional
+
+from dotenv import dotenv_values
+
+from Core.Tracing import tracer, format_breakdown
+from Core.Resilience import begin_deadline, end_deadline
+
+env_vars = dotenv_values(".env")
+MaxQueuedTurns = int(env_vars.get("MaxQueuedTurns", 3))
+
+# Utterances that cancel everything queued instead of becoming a turn
+CANCEL_PHRASES = frozenset({"stop", "cancel", "never mind", "nevermind", "forget it", "be quiet", "quiet",
+                            "shut up", "stop talking", "cancel that"})
+
+def is_cancel(text: str) -> bool:
+    return re.sub(r"[^a-z ]", "", text.lower()).strip() in CANCEL_PHRASES
+
+@dataclass
+class Turn:
+    """One user utterance on its way through the pipeline.
+
+    state moves queued → processing → ready → speaking → done, or to
+    cancelled from any point before done. final marks a turn after which no
+    other turn runs (exit).
+    """
+    seq: int
+    text: str
+    state: str = "queued"
+    response: Optional[str] = None
+    final: bool = False
+    captured: float = field(default_factory=time.perf_counter)
+    processed: Optional[float] = None
+    trace: Optional[dict] = field(default=None, repr=False)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.state == "cancelled"
+
+class TurnScheduler:
+    """Runs capture, processing and speech of successive turns at the same time.
+
+    Three threads, one per stage, connected by two queues:
+
+        capture ──queued──▶ process ──ready──▶ speak
+
+    so the next utterance is captured while the previous turn is still being
+    classified and answered, and processed while that answer is spoken.
+    Ordering rules:
+      - Turns are processed one at a time in the order they were captured,
+        so each one sees the previous answer in the history and actions
+        happen in the order they were asked for.
+      - Answers are spoken in the same order; a later answer never
+        overtakes an earlier one.
+      - An answer is not started while the user is in the middle of an
+        utterance (hold()); the assistant does not talk over the user.
+    Cancellation:
+      - A cancel phrase ("stop", "never mind", ...) drops every queued and
+        unspoken turn and stops the answer being spoken. A turn already
+        being processed finishes, but its answer is neither shown nor spoken;
+        on_cancel() is called too, so its automation commands that have not
+        started yet are dropped.
+      - When the user interrupts an answer (speak() returns False), the
+        answers of earlier turns still waiting to be spoken are dropped;
+        queued commands still run.
+      - Beyond max_queued turns waiting for processing, the oldest waiting
+        one is dropped.
+      - A final turn (exit) drops everything captured after it.
+
+    capture() returns the next utterance or None when there is none yet;
+    route(text) may act on parts of it right away and returns what is left
+    for a turn (see Core/FastLane.py); process(turn) returns the text to speak, or None; speak(turn, text)
+    returns False if the user interrupted it; interrupt() stops the answer
+    being spoken.
+    """
+
+    def __init__(self, capture: Callable[[], Optional[str]], process: Callable[[Turn], Optional[str]],
+                 speak: Callable[[Turn, str], bool], interrupt: Callable[[], None] = lambda: None,
+                 hold: Callable[[], bool] = lambda: False, route: Callable[[str], str] = lambda text: text,
+                 on_cancel: Callable[[], None] = lambda: None, max_queued: int = MaxQueuedTurns):
+        self.capture = capture
+        self.route = route
+        self.process = process
+        self.speak = speak
+        self.interrupt = interrupt
+        self.on_cancel = on_cancel
+        self.hold = hold
+        self.max_queued = max_queued
+        self.queued: Deque[Turn] = deque()
+        self.ready: Deque[Turn] = deque()
+        self.processing: Optional[Turn] = None
+        self.speaking = threading.Event()
+        self.current_speech: Optional[Turn] = None
+        self.condition = threading.Condition()
+        self.next_seq = 1
+        self.closed = False
+        self.threads = []
+
+    def start(self) -> "TurnScheduler":
+        for name, target in (("capture", self._capture_loop), ("process", self._process_loop),
+                             ("speak", self._speak_loop)):
+            thread = threading.Thread(target=target, name=f"turn-{name}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def idle(self) -> bool:
+        with self.condition:
+            return not (self.queued or self.ready or self.processing or self.current_speech)
+
+    def submit(self, text: str, trace: Optional[dict] = None) -> Optional[Turn]:
+        """Queues an utterance as a turn, or cancels pending work if it is a cancel phrase."""
+        if is_cancel(text):
+            logging.info(f"Turns cancelled by user: {text!r}")
+            self.cancel_all()
+            return None
+        with self.condition:
+            if self.closed:
+                return None
+            turn = Turn(self.next_seq, text, trace=trace)
+            self.next_seq += 1
+            self.queued.append(turn)
+            while len(self.queued) > self.max_queued:
+                dropped = self.queued.popleft()
+                dropped.state = "cancelled"
+                logging.warning(f"Turn {dropped.seq} dropped: more than {self.max_queued} turns queued")
+            logging.debug(f"Turn {turn.seq} queued: {text!r}")
+            self.condition.notify_all()
+        return turn
+
+    def cancel_all(self) -> None:
+        with self.condition:
+            for turn in (*self.queued, *self.ready):
+                turn.state = "cancelled"
+            self.queued.clear()
+            self.ready.clear()
+            if self.processing is not None:
+                self.processing.state = "cancelled"
+            speaking = self.current_speech
+            if speaking is not None:
+                speaking.state = "cancelled"
+        self.on_cancel()
+        if speaking is not None:
+            self.interrupt()
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def _capture_loop(self) -> None:
+        while not self.closed:
+            tracer.begin_turn()
+            started = time.perf_counter()
+            try:
+                text = self.capture()
+            except Exception as e:
+                logging.error(f"Capture error: {e}")
+                text = None
+                time.sleep(1)
+            if not text:
+                tracer.detach_turn()
+                continue
+            tracer.record("capture", time.perf_counter() - started)
+            try:
+                text = self.route(text)
+            except Exception as e:
+                logging.error(f"Routing error: {e}")
+            if text:
+                self.submit(text, tracer.detach_turn())
+            else:
+                tracer.detach_turn()
+
+    def _process_loop(self) -> None:
+        while True:
+            with self.condition:
+                while not self.queued and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                turn = self.processing = self.queued.popleft()
+                turn.state = "processing"
+            tracer.resume_turn(turn.trace)
+            tracer.record("wait.process", time.perf_counter() - turn.captured)
+            # Every outbound call of the turn shares its deadline
+            begin_deadline()
+            try:
+                turn.response = self.process(turn)
+            except Exception as e:
+                logging.error(f"Turn {turn.seq} failed: {e}")
+                turn.response = None
+            finally:
+                end_deadline()
+                turn.trace = tracer.detach_turn()
+            turn.processed = time.perf_counter()
+            with self.condition:
+                self.processing = None
+                if turn.cancelled:
+                    logging.info(f"Turn {turn.seq} cancelled while processing")
+                    continue
+                turn.state = "ready"
+                self.ready.append(turn)
+                if turn.final:
+                    for later in self.queued:
+                        later.state = "cancelled"
+                    self.queued.clear()
+                    self.closed = True
+                self.condition.notify_all()
+
+    def _speak_loop(self) -> None:
+        while True:
+            with self.condition:
+                while not self.ready:
+                    if self.closed and self.processing is None:
+                        return
+                    self.condition.wait()
+                turn = self.current_speech = self.ready.popleft()
+                turn.state = "speaking"
+            while self.hold() and not turn.cancelled:
+                time.sleep(0.05)
+            tracer.resume_turn(turn.trace)
+            tracer.record("wait.speech", time.perf_counter() - turn.processed)
+            completed = True
+            if turn.response and not turn.cancelled:
+                self.speaking.set()
+                try:
+                    completed = self.speak(turn, turn.response)
+                except Exception as e:
+                    logging.error(f"Turn {turn.seq} speech error: {e}")
+                finally:
+                    self.speaking.clear()
+            with self.condition:
+                self.current_speech = None
+                if completed is False:
+                    # The user talked over the answer; the answers queued behind it are stale now
+                    for stale in self.ready:
+                        stale.state = "cancelled"
+                        logging.info(f"Turn {stale.seq} not spoken: the user interrupted turn {turn.seq}")
+                    self.ready.clear()
+                if not turn.cancelled:
+                    turn.state = "done"
+                self.condition.notify_all()
+            turn.trace = None
+            breakdown = tracer.end_turn()
+            logging.info(f"Turn {turn.seq} {turn.state}: {format_breakdown(breakdown)}")
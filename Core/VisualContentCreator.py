@@ -9,13 +9,11 @@ import os
 from time import sleep
 import re
 import json
+from Core import Resilience
+from Core.LogPipeline import setup_logging
 
 # Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler(), logging.FileHandler("debug.log")]
-)
+setup_logging("debug.log", console=True)
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -33,6 +31,9 @@ API_HEADERS = {"Authorization": f"Bearer {HUGGING_FACE_API_KEY}"}
 IMAGE_DIRECTORY = "Data"
 REQUEST_FILE_PATH = os.path.join("Data", "image.data")
 
+# Seconds all images of one request may take, retries included
+IMAGE_BUDGET = float(os.getenv("ImageBudget", 120))
+
 def ensure_directory(directory: str):
     """Ensures the specified directory exists."""
     try:
@@ -59,31 +60,28 @@ def display_images(image_prompt: str):
             print(f"Unable to open {file_path}")
             logger.warning(f"Unable to open {file_path}: {e}")
 
-async def fetch_image_from_api(payload: dict, max_retries: int = 3) -> bytes:
-    """Fetches an image from the Hugging Face API with retries."""
-    for attempt in range(1, max_retries + 1):
-        try:
-            logger.debug(f"API call attempt {attempt} with payload: {payload}")
-            response = await asyncio.to_thread(
-                requests.post, API_URL, headers=API_HEADERS, json=payload
-            )
-            response.raise_for_status()
-            logger.debug(f"API response status: {response.status_code}")
-            return response.content
-        except requests.RequestException as e:
-            logger.warning(f"API call attempt {attempt} failed: {e}")
-            if response.status_code == 400:
-                try:
-                    error_details = response.json()
-                    logger.error(f"API error details: {error_details}")
-                except json.JSONDecodeError:
-                    logger.error(f"API error response: {response.text}")
-            if attempt < max_retries:
-                logger.info("Retrying after 5 seconds...")
-                await asyncio.sleep(5)
-            else:
-                logger.error(f"Max retries reached for API call: {e}")
-                return b""
+async def fetch_image_from_api(payload: dict, max_retries: int = 3, deadline: Resilience.Deadline = None) -> bytes:
+    """Fetches an image from the Hugging Face API with jittered retries within the deadline."""
+    async def post(timeout):
+        logger.debug(f"API call with payload: {payload}")
+        response = await asyncio.to_thread(
+            requests.post, API_URL, headers=API_HEADERS, json=payload, timeout=timeout
+        )
+        if response.status_code == 400:
+            try:
+                error_details = response.json()
+                logger.error(f"API error details: {error_details}")
+            except json.JSONDecodeError:
+                logger.error(f"API error response: {response.text}")
+        response.raise_for_status()
+        logger.debug(f"API response status: {response.status_code}")
+        return response.content
+
+    try:
+        return await Resilience.call_async("image.huggingface", post, attempts=max_retries, deadline=deadline)
+    except Exception as e:
+        logger.error(f"API call failed: {e}")
+        return b""
 
 async def generate_image_set(image_prompt: str):
     """Generates a set of images for the given prompt."""
@@ -101,12 +99,14 @@ async def generate_image_set(image_prompt: str):
     )
     logger.debug(f"Enhanced prompt: {enhanced_prompt}")
 
+    # One budget for the whole set; once the API is known to be down the remaining requests fail fast
+    deadline = Resilience.Deadline(IMAGE_BUDGET)
     image_tasks = []
     for _ in range(4):
         payload = {
             "inputs": f"{enhanced_prompt}, seed={randint(0, 1000000)}",
         }
-        task = asyncio.create_task(fetch_image_from_api(payload))
+        task = asyncio.create_task(fetch_image_from_api(payload, deadline=deadline))
         image_tasks.append(task)
 
     image_data_list = await asyncio.gather(*image_tasks)
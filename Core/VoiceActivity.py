@@ -0,0 +1,116 @@
+import time
+from collections import deque
+from typing import Optional, Tuple
+
+import numpy as np
+
+from Core.AudioCapture import SAMPLE_RATE, FRAME_MS
+
+# Highest first guess at the noise floor (about -40 dBFS); a first frame that is already speech must not set it
+MAX_INITIAL_NOISE_FLOOR = 1e5
+
+def frame_features(frames: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns per-frame mean energy and zero-crossing rate for a (n, samples) int16 array."""
+    x = np.atleast_2d(frames).astype(np.float32)
+    energy = (x ** 2).mean(axis=1)
+    signs = np.signbit(x)
+    zcr = (signs[:, 1:] != signs[:, :-1]).mean(axis=1)
+    return energy, zcr
+
+class VoiceActivityDetector:
+    """Energy and zero-crossing voice activity detector with trailing-silence endpointing.
+
+    A frame counts as speech when its energy clears the adaptive noise floor
+    by energy_ratio and its zero-crossing rate looks like voice, or when it is
+    loud enough that the ZCR check does not matter. An utterance starts after
+    min_speech_ms of speech and ends once trailing_silence_ms of silence
+    follows it, or when it reaches max_utterance_ms, so continuous noise
+    cannot keep it open. speech_end is the time of the last speech frame, not
+    the time the endpoint was declared. The noise floor can be carried over
+    from an earlier detector; otherwise the first frames seed it, capped at
+    MAX_INITIAL_NOISE_FLOOR.
+    """
+
+    def __init__(self, trailing_silence_ms: int = 700, min_speech_ms: int = 120,
+                 energy_ratio: float = 3.0, zcr_range: Tuple[float, float] = (0.01, 0.35),
+                 pre_roll_ms: int = 300, max_utterance_ms: int = 30000,
+                 noise_floor: Optional[float] = None):
+        self.trailing_frames = max(1, trailing_silence_ms // FRAME_MS)
+        self.min_speech_frames = max(1, min_speech_ms // FRAME_MS)
+        self.energy_ratio = energy_ratio
+        self.zcr_range = zcr_range
+        self.pre_roll = deque(maxlen=max(1, pre_roll_ms // FRAME_MS))
+        self.max_utterance_frames = max(1, max_utterance_ms // FRAME_MS)
+        self.noise_floor: Optional[float] = noise_floor
+        self.reset()
+
+    def reset(self) -> None:
+        """Forgets the current utterance but keeps the learned noise floor."""
+        self.in_speech = False
+        self.speech_run = 0
+        self.silence_run = 0
+        self.speech_start: Optional[float] = None
+        self.speech_end: Optional[float] = None
+        self.utterance = []
+        self.pre_roll.clear()
+
+    def classify(self, frames: np.ndarray) -> np.ndarray:
+        """Vectorized speech/non-speech decision for a batch of frames."""
+        energy, zcr = frame_features(frames)
+        if self.noise_floor is None:
+            self.noise_floor = min(float(np.median(energy)), MAX_INITIAL_NOISE_FLOOR)
+        floor = max(self.noise_floor, 1e3)
+        voiced = (energy > floor * self.energy_ratio) & (zcr >= self.zcr_range[0]) & (zcr <= self.zcr_range[1])
+        loud = energy > floor * self.energy_ratio * 4
+        quiet = energy[~(voiced | loud)]
+        if quiet.size:
+            # Track the floor only on non-speech frames
+            self.noise_floor += (float(quiet.mean()) - self.noise_floor) * 0.05
+        return voiced | loud
+
+    def process(self, frame: np.ndarray, timestamp: Optional[float] = None) -> Optional[str]:
+        """Feeds one frame. Returns "start" or "end" when an utterance boundary is crossed."""
+        now = time.monotonic() if timestamp is None else timestamp
+        speech = bool(self.classify(frame)[0])
+
+        if not self.in_speech:
+            self.pre_roll.append(frame)
+            self.speech_run = self.speech_run + 1 if speech else 0
+            if self.speech_run >= self.min_speech_frames:
+                self.in_speech = True
+                self.silence_run = 0
+                self.speech_start = now - self.speech_run * FRAME_MS / 1000
+                self.speech_end = now
+                self.utterance = list(self.pre_roll)
+                return "start"
+            return None
+
+        self.utterance.append(frame)
+        if len(self.utterance) >= self.max_utterance_frames:
+            self.in_speech = False
+            self.speech_run = 0
+            if speech:
+                self.speech_end = now
+            return "end"
+        if speech:
+            self.silence_run = 0
+            self.speech_end = now
+            return None
+        self.silence_run += 1
+        if self.silence_run >= self.trailing_frames:
+            self.in_speech = False
+            self.speech_run = 0
+            # Keep only a little of the trailing silence in the captured audio
+            tail = self.silence_run - min(self.silence_run, self.pre_roll.maxlen)
+            if tail:
+                del self.utterance[-tail:]
+            return "end"
+        return None
+
+    def audio(self) -> np.ndarray:
+        """Returns the samples of the current or last utterance, including pre-roll."""
+        return np.concatenate(self.utterance) if self.utterance else np.zeros(0, dtype=np.int16)
+
+    @property
+    def duration(self) -> float:
+        return len(self.audio()) / SAMPLE_RATE
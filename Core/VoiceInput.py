@@ -1,4 +1,7 @@
 import os
+import time
+import logging
+import threading
 from pathlib import Path
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -7,10 +10,20 @@ from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 from dotenv import dotenv_values
 import mtranslate as mt
+from Core.Tracing import tracer
+
+try:
+    import speech_recognition as sr
+    from Core.AudioCapture import audio_capture, SAMPLE_RATE
+    from Core.VoiceActivity import VoiceActivityDetector
+except ImportError:
+    sr = None
 
 # Load environment variables
 config = dotenv_values(".env")
 INPUT_LANGUAGE = config.get("InputLanguage", "en").lower()
+TRAILING_SILENCE_MS = int(config.get("TrailingSilenceMs", 700))
+MAX_UTTERANCE_MS = int(config.get("MaxUtteranceMs", 30000))
 TEMP_DIR = Path("Data")
 DATA_DIR = Path("Data")
 DATA_DIR.mkdir(exist_ok=True)
@@ -60,9 +73,25 @@ chrome_options.add_argument("--use-fake-ui-for-media-stream")
 chrome_options.add_argument("--use-fake-device-for-media-stream")
 chrome_options.add_argument(f"user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3")
 
-# Initialize WebDriver
-service = Service(ChromeDriverManager().install())
-driver = webdriver.Chrome(service=service, options=chrome_options)
+# WebDriver is only started when the browser recognizer is actually used
+driver = None
+
+# Monotonic time at which the user stopped speaking in the last captured turn
+last_speech_end = None
+
+# Noise floor the voice activity detector learned, carried from one utterance to the next
+learned_noise_floor = None
+
+# Set while the user is in the middle of an utterance
+user_speaking = threading.Event()
+
+def get_driver():
+    """Start Chrome on first use"""
+    global driver
+    if driver is None:
+        service = Service(ChromeDriverManager().install())
+        driver = webdriver.Chrome(service=service, options=chrome_options)
+    return driver
 
 def set_assistant_status(status: str) -> None:
     """Update assistant status file"""
@@ -95,25 +124,92 @@ def universal_translator(text: str) -> str:
     
     if "en" in INPUT_LANGUAGE:
         return text.capitalize()
-    return mt.translate(text, "en", "auto").capitalize()
+    with tracer.span("translation"):
+        return mt.translate(text, "en", "auto").capitalize()
 
-def speech_recognition() -> str:
-    """Capture speech input and return processed text"""
-    driver.get(f"file://{Path().absolute() / DATA_DIR / 'Voice.html'}")
-    driver.find_element(By.ID, "start").click()
-    
+def vad_speech_recognition(pre_roll=None, abort=None) -> str:
+    """Capture one utterance gated by voice activity detection and transcribe it
+
+    Returns None if abort() turns True before the user starts speaking.
+    """
+    global last_speech_end, learned_noise_floor
+    frames = audio_capture.subscribe()
+    # The floor learned from the silence around earlier utterances, not from barge-in pre-roll speech
+    vad = VoiceActivityDetector(trailing_silence_ms=TRAILING_SILENCE_MS, max_utterance_ms=MAX_UTTERANCE_MS,
+                                noise_floor=learned_noise_floor)
+
+    def frame_source():
+        # Frames captured during a barge-in come first, so the user's first words are kept
+        yield from pre_roll or []
+        while True:
+            yield frames.get()
+
+    source = frame_source()
+    try:
+        # Silence is consumed here and never sent to the recognizer
+        while vad.process(next(source)) != "start":
+            if abort is not None and abort():
+                return None
+        user_speaking.set()
+        while vad.process(next(source)) != "end":
+            pass
+    finally:
+        user_speaking.clear()
+        audio_capture.unsubscribe(frames)
+        learned_noise_floor = vad.noise_floor
+    last_speech_end = vad.speech_end
+
+    audio = sr.AudioData(vad.audio().tobytes(), SAMPLE_RATE, 2)
+    try:
+        with tracer.span("recognition"):
+            text = sr.Recognizer().recognize_google(audio, language=INPUT_LANGUAGE)
+    except sr.UnknownValueError:
+        return ""
+    except sr.RequestError as e:
+        logging.error(f"Speech recognition request failed: {e}")
+        return ""
+    return query_modifier(universal_translator(text))
+
+def browser_speech_recognition(abort=None) -> str:
+    """Capture speech in Chrome and return once the transcript stops growing"""
+    global last_speech_end
+    browser = get_driver()
+    browser.get(f"file://{Path().absolute() / DATA_DIR / 'Voice.html'}")
+    browser.find_element(By.ID, "start").click()
+
+    # Without raw audio, a transcript unchanged for the trailing-silence window ends the turn
+    previous_text = ""
+    changed_at = time.monotonic()
     while True:
         try:
-            text = driver.find_element(By.ID, "output").text
-            if text:
-                driver.find_element(By.ID, "end").click()
-                return query_modifier(universal_translator(text))
+            text = browser.find_element(By.ID, "output").text
         except Exception:
             continue
+        if not text and abort is not None and abort():
+            browser.find_element(By.ID, "end").click()
+            return ""
+        now = time.monotonic()
+        if text != previous_text:
+            previous_text, changed_at = text, now
+        elif text and now - changed_at >= TRAILING_SILENCE_MS / 1000:
+            browser.find_element(By.ID, "end").click()
+            last_speech_end = changed_at
+            return query_modifier(universal_translator(text))
+        time.sleep(0.05)
+
+def speech_recognition(pre_roll=None, abort=None) -> str:
+    """Capture speech input and return processed text; empty if abort() turned True first"""
+    if sr is not None and audio_capture.available():
+        text = vad_speech_recognition(pre_roll, abort)
+        while text == "":
+            text = vad_speech_recognition(abort=abort)
+        return text or ""
+    return browser_speech_recognition(abort)
 
 if __name__ == "__main__":
     try:
         while True:
             print(speech_recognition())
     finally:
-        driver.quit()
\ No newline at end of file
+        if driver is not None:
+            driver.quit()
\ No newline at end of file
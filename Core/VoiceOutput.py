@@ -1,10 +1,16 @@
 import os
+import re
 import random
 import asyncio
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pygame
 import edge_tts
 from pathlib import Path
 from dotenv import dotenv_values
+from Core.Tracing import tracer
+from Core import Resilience
 
 # Configuration
 config = dotenv_values(".env")
@@ -12,6 +18,15 @@ VOICE = config.get("AssistantVoice", "en-US-GuyNeural")
 DATA_DIR = Path("Data")
 DATA_DIR.mkdir(exist_ok=True)
 AUDIO_FILE = DATA_DIR / "Speech.mp3"
+# The rest of an answer goes to a file of its own per answer, so an abandoned synthesis never overwrites the next one
+NEXT_AUDIO_FILE = DATA_DIR / "SpeechNext.mp3"
+tail_numbers = itertools.count(1)
+
+# Speech has its own budget: an answer that made it this far should still be spoken
+SPEECH_BUDGET = float(config.get("SpeechBudget", 10))
+
+# Synthesizes the rest of an answer while its first sentence plays
+synthesis_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
 
 # Predefined responses
 RESPONSES = [
@@ -22,30 +37,50 @@ RESPONSES = [
     "Sir, you'll find more text on the chat screen for you to see."
 ]
 
-async def generate_audio(text: str) -> None:
-    """Generate audio file from text using edge_tts"""
-    if AUDIO_FILE.exists():
-        AUDIO_FILE.unlink()
-    
-    communicate = edge_tts.Communicate(
-        text=text,
-        voice=VOICE,
-        pitch="+5Hz",
-        rate="+13%"
-    )
-    await communicate.save(str(AUDIO_FILE))
+async def generate_audio(text: str, audio_file: Path = AUDIO_FILE, deadline: Resilience.Deadline = None,
+                         cancelled: threading.Event = None) -> None:
+    """Generate audio file from text using edge_tts
+
+    With a cancelled event the audio is streamed to the file and synthesis
+    stops at the next chunk once the event is set, leaving no file behind.
+    """
+    if audio_file.exists():
+        audio_file.unlink()
+
+    async def synthesize(timeout):
+        communicate = edge_tts.Communicate(
+            text=text,
+            voice=VOICE,
+            pitch="+5Hz",
+            rate="+13%"
+        )
+        if cancelled is None:
+            await communicate.save(str(audio_file))
+            return
+        with open(audio_file, "wb") as f:
+            async for chunk in communicate.stream():
+                if cancelled.is_set():
+                    break
+                if chunk["type"] == "audio":
+                    f.write(chunk["data"])
+        if cancelled.is_set():
+            audio_file.unlink(missing_ok=True)
+
+    await Resilience.call_async("tts.edge", synthesize, attempts=2, deadline=deadline)
 
-def play_audio(callback=lambda: True) -> bool:
-    """Play the generated audio file"""
+def play_audio(callback=lambda: True, audio_file: Path = AUDIO_FILE) -> bool:
+    """Play the generated audio file; returns False if it was stopped early"""
     try:
         pygame.mixer.init()
-        pygame.mixer.music.load(str(AUDIO_FILE))
+        pygame.mixer.music.load(str(audio_file))
         pygame.mixer.music.play()
         
+        # 20 ms ticks so a barge-in stops playback within a couple of ticks
+        clock = pygame.time.Clock()
         while pygame.mixer.music.get_busy():
             if not callback():
-                break
-            pygame.time.Clock().tick(10)
+                return False
+            clock.tick(50)
         return True
     except Exception as e:
         print(f"Audio playback error: {e}")
@@ -54,11 +89,8 @@ def play_audio(callback=lambda: True) -> bool:
         pygame.mixer.music.stop()
         pygame.mixer.quit()
 
-def text_to_speech(text: str, callback=lambda: True) -> None:
-    """Convert text to speech with intelligent truncation"""
-    if not text:
-        return
-    
+def speech_parts(text: str) -> tuple:
+    """Splits what will be spoken into the first sentence and the rest"""
     # For long texts, play the first part and notify about the rest
     if len(text.split()) > 4 and len(text) >= 250:
         sentences = text.split(".")
@@ -66,10 +98,52 @@ def text_to_speech(text: str, callback=lambda: True) -> None:
         full_text = f"{partial_text} {random.choice(RESPONSES)}"
     else:
         full_text = text
-    
-    # Generate and play audio
-    asyncio.run(generate_audio(full_text))
-    play_audio(callback)
+
+    head, _, tail = re.sub(r"([.!?])\s+", r"\1\n", full_text.strip(), count=1).partition("\n")
+    return head, tail
+
+def text_to_speech(text: str, callback=lambda: True) -> bool:
+    """Convert text to speech with intelligent truncation; returns False if interrupted"""
+    if not text:
+        return True
+
+    # Speak the first sentence as soon as it is synthesized; the rest is synthesized meanwhile
+    head, tail = speech_parts(text)
+    deadline = Resilience.Deadline(SPEECH_BUDGET)
+    try:
+        with tracer.span("tts.synthesis"):
+            asyncio.run(generate_audio(head, deadline=deadline))
+    except Exception as e:
+        # The answer is already on screen; skip speaking rather than stall the turn
+        print(f"Speech synthesis unavailable: {e}")
+        return True
+    tail_file = NEXT_AUDIO_FILE.with_stem(f"{NEXT_AUDIO_FILE.stem}{next(tail_numbers)}")
+    cancelled = threading.Event()
+    pending = synthesis_pool.submit(
+        lambda: asyncio.run(generate_audio(tail, tail_file, deadline, cancelled))) if tail else None
+
+    try:
+        with tracer.span("tts.playback"):
+            played = play_audio(callback)
+        if not played or not callback():
+            # Barge-in: stop the tail synthesis, whether or not it has started
+            cancelled.set()
+            if pending is not None:
+                pending.cancel()
+            return False
+        if pending is None:
+            return True
+        try:
+            with tracer.span("tts.synthesis.wait"):
+                pending.result()
+        except Exception as e:
+            print(f"Speech synthesis unavailable: {e}")
+            return True
+        with tracer.span("tts.playback"):
+            return callback() and play_audio(callback, tail_file)
+    finally:
+        if pending is not None:
+            pending.add_done_callback(lambda _: tail_file.unlink(missing_ok=True))
 
 if __name__ == "__main__":
     while True:
@@ -0,0 +1,180 @@
+import os
+import sys
+import time
+import logging
+import threading
+from typing import Callable, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from Core.AudioCapture import audio_capture, record, SAMPLE_RATE, FRAME_SAMPLES
+
+# Paths
+TEMPLATES_PATH = os.path.join("Data", "WakeWord.npz")
+
+# Feature extraction: 25 ms windows every 10 ms, 20 mel-spaced log bands
+WINDOW = SAMPLE_RATE * 25 // 1000
+HOP = SAMPLE_RATE * 10 // 1000
+N_FFT = 512
+N_BANDS = 20
+WINDOW_FN = np.hamming(WINDOW).astype(np.float32)
+
+def _mel_filterbank() -> np.ndarray:
+    to_mel = lambda hz: 2595 * np.log10(1 + hz / 700)
+    to_hz = lambda mel: 700 * (10 ** (mel / 2595) - 1)
+    edges = to_hz(np.linspace(to_mel(100), to_mel(7600), N_BANDS + 2))
+    bins = np.fft.rfftfreq(N_FFT, 1 / SAMPLE_RATE)
+    lower, centre, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (centre - lower)
+    falling = (upper - bins) / (upper - centre)
+    return np.clip(np.minimum(rising, falling), 0, None).astype(np.float32)
+
+FILTERBANK = _mel_filterbank()
+
+def log_band_energies(samples: np.ndarray) -> np.ndarray:
+    """Returns gain-normalized log mel band energies, one row per 10 ms hop."""
+    x = samples.astype(np.float32) / 32768.0
+    if len(x) < WINDOW:
+        return np.empty((0, N_BANDS), dtype=np.float32)
+    frames = sliding_window_view(x, WINDOW)[::HOP] * WINDOW_FN
+    power = np.abs(np.fft.rfft(frames, N_FFT)) ** 2
+    features = np.log(power @ FILTERBANK.T + 1e-10)
+    return features - features.mean(axis=1, keepdims=True)
+
+def trim_silence(samples: np.ndarray, ratio: float = 0.1) -> np.ndarray:
+    """Cuts leading and trailing audio quieter than ratio of the loudest hop."""
+    hops = samples[: len(samples) // HOP * HOP].astype(np.float32).reshape(-1, HOP)
+    energy = (hops ** 2).mean(axis=1)
+    voiced = np.flatnonzero(energy > energy.max() * ratio)
+    if voiced.size == 0:
+        return samples
+    return samples[voiced[0] * HOP:(voiced[-1] + 1) * HOP]
+
+def dtw_distance(candidate: np.ndarray, template: np.ndarray) -> float:
+    """Subsequence DTW distance of template inside candidate, per template frame.
+
+    Steps are (1,0), (1,1) and (1,2), so each candidate frame advances the
+    path by one row. Every row then depends only on the previous one and is
+    computed as a single vectorized operation. The allowed tempo range is half
+    to double the template's speed. The match may start and end anywhere in
+    the candidate.
+    """
+    cost = np.sqrt(((candidate[:, None, :] - template[None, :, :]) ** 2).sum(axis=2))
+    acc = np.full(template.shape[0], np.inf)
+    best = np.inf
+    for row in cost:
+        shifted_one = np.concatenate(([0.0], acc[:-1]))
+        shifted_two = np.concatenate(([np.inf, np.inf], acc[:-2]))
+        acc = row + np.minimum(np.minimum(acc, shifted_one), shifted_two)
+        best = min(best, acc[-1])
+    return float(best / template.shape[0])
+
+class WakeWordDetector:
+    """Template-matching wake-word detector over raw 16 kHz int16 frames.
+
+    An adaptive energy gate keeps the detector idle during silence. While
+    speech is present, and for a short hangover after it stops, the most
+    recent audio is matched against each enrolled template every hop_ms with
+    DTW over log mel band energies.
+    """
+
+    def __init__(self, templates: List[np.ndarray], threshold: float,
+                 hop_ms: int = 100, refractory: float = 1.5, hangover_ms: int = 300):
+        self.templates = templates
+        self.threshold = threshold
+        self.hop_frames = max(1, hop_ms * SAMPLE_RATE // 1000 // FRAME_SAMPLES)
+        self.refractory = refractory
+        self.hangover_frames = hangover_ms * SAMPLE_RATE // 1000 // FRAME_SAMPLES
+        self.frames_since_speech = self.hangover_frames + 1
+        longest = max(len(t) for t in templates) if templates else 100
+        # Keep enough audio for the longest template spoken at half speed
+        self.buffer = np.zeros(longest * 2 * HOP + WINDOW, dtype=np.int16)
+        self.frames_seen = 0
+        self.noise_floor = None
+        self.last_detection = 0.0
+
+    @classmethod
+    def enroll(cls, recordings: List[np.ndarray], margin: float = 1.15) -> "WakeWordDetector":
+        """Builds templates from a few recordings of the wake word."""
+        templates = [log_band_energies(trim_silence(r)) for r in recordings]
+        distances = [dtw_distance(a, b) for i, a in enumerate(templates) for b in templates[i + 1:]]
+        threshold = max(distances) * margin if distances else 4.0
+        return cls(templates, threshold)
+
+    @classmethod
+    def load(cls, path: str = TEMPLATES_PATH) -> Optional["WakeWordDetector"]:
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        count = int(data["count"])
+        return cls([data[f"template{i}"] for i in range(count)], float(data["threshold"]))
+
+    def save(self, path: str = TEMPLATES_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        arrays = {f"template{i}": t for i, t in enumerate(self.templates)}
+        np.savez(path, count=len(self.templates), threshold=self.threshold, **arrays)
+
+    def _speech_present(self, frame: np.ndarray) -> bool:
+        energy = float(np.mean(frame.astype(np.float32) ** 2))
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        # Follow the floor down quickly and up slowly, so speech does not raise it
+        rate = 0.2 if energy < self.noise_floor else 0.005
+        self.noise_floor += (energy - self.noise_floor) * rate
+        return energy > self.noise_floor * 4 + 1e3
+
+    def process(self, frame: np.ndarray) -> bool:
+        """Feeds one capture frame; returns True when the wake word was heard."""
+        self.buffer = np.roll(self.buffer, -len(frame))
+        self.buffer[-len(frame):] = frame
+        self.frames_seen += 1
+        self.frames_since_speech = 0 if self._speech_present(frame) else self.frames_since_speech + 1
+        if self.frames_since_speech > self.hangover_frames or self.frames_seen % self.hop_frames or not self.templates:
+            return False
+        if time.monotonic() - self.last_detection < self.refractory:
+            return False
+
+        for template in self.templates:
+            candidate = log_band_energies(self.buffer[-(len(template) * 2 * HOP + WINDOW):])
+            if dtw_distance(candidate, template) < self.threshold:
+                self.last_detection = time.monotonic()
+                return True
+        return False
+
+def start_wake_listener(detector: WakeWordDetector, on_wake: Callable[[], None],
+                        enabled: Callable[[], bool] = lambda: True) -> threading.Thread:
+    """Runs the detector on live microphone frames in a daemon thread."""
+    def worker():
+        frames = audio_capture.subscribe()
+        while True:
+            frame = frames.get()
+            try:
+                if enabled() and detector.process(frame):
+                    logging.info("Wake word detected")
+                    on_wake()
+            except Exception as e:
+                logging.error(f"Wake word listener error: {e}")
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "enroll":
+        frames = audio_capture.subscribe()
+        recordings = []
+        for attempt in range(3):
+            input(f"Press Enter and say the wake word ({attempt + 1}/3)...")
+            while not frames.empty():
+                frames.get_nowait()
+            recordings.append(record(frames, 1.5))
+        detector = WakeWordDetector.enroll(recordings)
+        detector.save()
+        print(f"Saved {len(detector.templates)} templates to {TEMPLATES_PATH} (threshold {detector.threshold:.2f})")
+    else:
+        detector = WakeWordDetector.load()
+        if detector is None:
+            print("No templates found. Run: python -m Core.WakeWord enroll")
+        else:
+            start_wake_listener(detector, lambda: print("Wake word detected")).join()
@@ -2,17 +2,31 @@ from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QTextEdit, QWidget,
     QPushButton, QLabel, QFrame, QHBoxLayout, QVBoxLayout
 )
-from PyQt5.QtGui import QColor, QTextCharFormat, QFont, QTextBlockFormat, QIcon
-from PyQt5.QtCore import Qt, QTimer, QPoint, QSize
+from PyQt5.QtGui import QColor, QTextCharFormat, QFont, QTextBlockFormat, QIcon, QTextCursor
+from PyQt5.QtCore import Qt, QTimer, QPoint, QSize, pyqtSignal
 from dotenv import dotenv_values
 import sys
 import os
+import re
+import time
 import random
 import logging
+import itertools
+from json import load, JSONDecodeError
+
+from Core.Tracing import format_breakdown
+from Core.LogPipeline import setup_logging
+from Core.MemoryBudget import memory_budget
 
 # Setup logging
-logging.basicConfig(filename='Data/assistant.log', level=logging.DEBUG,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+setup_logging()
+
+try:
+    from Core.AudioCapture import audio_capture
+    from Core.WakeWord import WakeWordDetector, start_wake_listener
+except ImportError as e:
+    logging.warning(f"Wake word detection unavailable: {e}")
+    WakeWordDetector = None
 
 config_data = dotenv_values(".env")
 bot_identifier = config_data.get("Assistantname", "Assistant")
@@ -20,6 +34,12 @@ user_identifier = config_data.get("Username", "User")
 working_directory = os.getcwd()
 previous_message_content = ""
 storage_location = f"{working_directory}\\Data"
+display_block_limit = int(config_data.get("ChatDisplayBlocks", 500))
+history_line_limit = int(config_data.get("ChatHistoryLines", 20000))
+
+# Responses.data starts with this line, so the panel can tell a reply that is still streaming from a new message
+MESSAGE_HEADER = re.compile(r"#message (\S+) (partial|final)\n")
+message_ids = itertools.count(time.time_ns() // 1000)
 
 GREETING_COLLECTION = [
     f"Ready to serve, {user_identifier}.",
@@ -110,10 +130,20 @@ def BuildStoragePath(file_identifier):
     complete_path = f'{storage_location}\\{file_identifier}'
     return complete_path
 
-def DisplayContentOnScreen(display_content):
+def NewMessageId():
+    return str(next(message_ids))
+
+def DisplayContentOnScreen(display_content, message_id=None, partial=False):
+    """Shows a message in the chat panel.
+
+    A reply shown while it streams is written with partial=True under one
+    message_id from NewMessageId(), then once more with partial=False; the
+    panel extends that message instead of adding a new one each time.
+    """
+    state = "partial" if partial else "final"
     try:
         with open(f'{storage_location}\\Responses.data', "w", encoding='utf-8') as data_file:
-            data_file.write(display_content)
+            data_file.write(f"#message {message_id or NewMessageId()} {state}\n{display_content}")
     except Exception as e:
         logging.error(f"Error displaying content on screen: {e}")
 
@@ -138,9 +168,14 @@ class CompactConversationPanel(QWidget):
         self.info_text = QLabel("Available ... ")
         self.info_text.setStyleSheet("color: #ffffff; font-size: 11px;")
 
+        self.latency_text = QLabel("")
+        self.latency_text.setStyleSheet("color: #8a8a8a; font-size: 9px;")
+        self.latency_signature = None
+
         info_arrangement.addWidget(self.info_symbol)
         info_arrangement.addWidget(self.info_text)
         info_arrangement.addStretch()
+        info_arrangement.addWidget(self.latency_text)
 
         panel_layout.addWidget(self.info_panel)
 
@@ -181,6 +216,16 @@ class CompactConversationPanel(QWidget):
         self.visibility_control.clicked.connect(self.toggle_conversation_visibility)
         panel_layout.addWidget(self.visibility_control)
 
+        # Lines of the whole session; only history_lines[rendered_start:] are in the document
+        self.history_lines = []
+        self.rendered_start = 0
+        memory_budget.watch("chat window lines", lambda: len(self.history_lines), history_line_limit)
+        self.responses_signature = None
+        # The message last written to the panel, to extend while it streams
+        self.shown_message_id = None
+        self.shown_message_text = ""
+        self.conversation_display.verticalScrollBar().valueChanged.connect(self.LoadOlderHistory)
+
         self.update_timer = QTimer(self)
         self.update_timer.timeout.connect(self.RefreshConversation)
         self.update_timer.timeout.connect(self.RefreshBotState)
@@ -218,18 +263,40 @@ class CompactConversationPanel(QWidget):
     def RefreshConversation(self):
         global previous_message_content
         try:
-            with open(BuildStoragePath('Responses.data'), "r", encoding='utf-8') as data_file:
+            file_path = BuildStoragePath('Responses.data')
+            file_stat = os.stat(file_path)
+            file_signature = (file_stat.st_mtime_ns, file_stat.st_size)
+            if file_signature == self.responses_signature:
+                return
+            self.responses_signature = file_signature
+
+            with open(file_path, "r", encoding='utf-8') as data_file:
                 current_messages = data_file.read()
 
             if current_messages and current_messages != previous_message_content:
-                self.conversation_display.clear()
-                self.AppendMessageToDisplay(message_content=current_messages, text_color='#e0e0e0')
+                scroll_bar = self.conversation_display.verticalScrollBar()
+                follow_output = not self.conversation_display.isVisible() or scroll_bar.value() >= scroll_bar.maximum() - 4
+
+                # Files written without a header (the start-up conversation) are always a new message
+                header = MESSAGE_HEADER.match(current_messages)
+                message_id = header.group(1) if header else None
+                message_text = current_messages[header.end():] if header else current_messages
+                if message_id is None or message_id != self.shown_message_id:
+                    self.AppendMessageToDisplay(message_text, '#e0e0e0', new_message=True)
+                elif message_text.startswith(self.shown_message_text):
+                    # More of a streaming reply; only the new text is rendered
+                    self.AppendMessageToDisplay(message_text[len(self.shown_message_text):], '#e0e0e0',
+                                                new_message=False)
+                else:
+                    self.ReplaceLastMessage(self.shown_message_text, message_text)
+                self.shown_message_id, self.shown_message_text = message_id, message_text
                 previous_message_content = current_messages
 
-                if self.conversation_display.isVisible():
-                    self.conversation_display.verticalScrollBar().setValue(
-                        self.conversation_display.verticalScrollBar().maximum()
-                    )
+                if follow_output:
+                    self.TrimDisplay()
+                    scroll_bar.setValue(scroll_bar.maximum())
+        except FileNotFoundError:
+            pass
         except Exception as e:
             logging.error(f"Error refreshing conversation: {e}")
 
@@ -238,26 +305,98 @@ class CompactConversationPanel(QWidget):
             with open(BuildStoragePath('Status.data'), "r", encoding='utf-8') as data_file:
                 current_state = data_file.read()
             audio_state = RetrieveAudioDeviceState()
-            logging.debug(f"UI Status: {current_state}, Audio: {audio_state}")
+            logging.debug("UI Status: %s, Audio: %s", current_state, audio_state)
             if audio_state == "True":
                 self.info_symbol.setPixmap(QIcon.fromTheme("audio-input-microphone").pixmap(16, 16))
             else:
                 self.info_symbol.setPixmap(QIcon.fromTheme("microphone-sensitivity-muted").pixmap(16, 16))
             self.info_text.setText(current_state)
+            self.RefreshLatencyBreakdown()
         except Exception as e:
             logging.error(f"Error refreshing bot state: {e}")
 
-    def AppendMessageToDisplay(self, message_content, text_color):
-        text_cursor = self.conversation_display.textCursor()
+    def RefreshLatencyBreakdown(self):
+        try:
+            file_stat = os.stat(BuildStoragePath('Latency.data'))
+        except FileNotFoundError:
+            return
+        if (file_stat.st_mtime_ns, file_stat.st_size) == self.latency_signature:
+            return
+        self.latency_signature = (file_stat.st_mtime_ns, file_stat.st_size)
+        try:
+            with open(BuildStoragePath('Latency.data'), "r", encoding='utf-8') as data_file:
+                turn_breakdown = load(data_file)
+        except (OSError, JSONDecodeError):
+            return
+        self.latency_text.setText(f"{turn_breakdown.get('turn', 0):.2f}s")
+        self.latency_text.setToolTip(format_breakdown(turn_breakdown))
+
+    def DisplayFormats(self, text_color='#e0e0e0'):
         char_formatting = QTextCharFormat()
         block_formatting = QTextBlockFormat()
         block_formatting.setTopMargin(5)
         block_formatting.setLeftMargin(5)
         char_formatting.setForeground(QColor(text_color))
-        text_cursor.setCharFormat(char_formatting)
-        text_cursor.setBlockFormat(block_formatting)
-        text_cursor.insertText(message_content)
-        self.conversation_display.setTextCursor(text_cursor)
+        return char_formatting, block_formatting
+
+    def AppendMessageToDisplay(self, message_content, text_color, new_message=True):
+        char_formatting, block_formatting = self.DisplayFormats(text_color)
+        text_cursor = QTextCursor(self.conversation_display.document())
+        text_cursor.movePosition(QTextCursor.End)
+        if new_message and self.history_lines:
+            text_cursor.insertBlock(block_formatting, char_formatting)
+        else:
+            text_cursor.setBlockFormat(block_formatting)
+        text_cursor.insertText(message_content, char_formatting)
+
+        new_lines = message_content.split('\n')
+        if new_message or not self.history_lines:
+            self.history_lines.extend(new_lines)
+        else:
+            self.history_lines[-1] += new_lines[0]
+            self.history_lines.extend(new_lines[1:])
+
+        overflow = len(self.history_lines) - history_line_limit
+        if overflow > 0:
+            del self.history_lines[:overflow]
+            self.rendered_start = max(0, self.rendered_start - overflow)
+
+    def ReplaceLastMessage(self, old_text, new_text):
+        """Rewrites the message at the end of the panel, when a finished reply differs from what streamed."""
+        text_cursor = QTextCursor(self.conversation_display.document())
+        text_cursor.movePosition(QTextCursor.End)
+        text_cursor.movePosition(QTextCursor.Left, QTextCursor.KeepAnchor, len(old_text))
+        text_cursor.removeSelectedText()
+        old_lines = old_text.count('\n') + 1
+        if old_lines <= len(self.history_lines):
+            self.history_lines[-old_lines:] = [""]
+        self.AppendMessageToDisplay(new_text, '#e0e0e0', new_message=False)
+
+    def TrimDisplay(self):
+        document = self.conversation_display.document()
+        excess_blocks = document.blockCount() - display_block_limit
+        if excess_blocks <= 0:
+            return
+        text_cursor = QTextCursor(document)
+        text_cursor.movePosition(QTextCursor.Start)
+        text_cursor.movePosition(QTextCursor.NextBlock, QTextCursor.KeepAnchor, excess_blocks)
+        text_cursor.removeSelectedText()
+        self.rendered_start += excess_blocks
+
+    def LoadOlderHistory(self, scroll_value):
+        if scroll_value != self.conversation_display.verticalScrollBar().minimum() or self.rendered_start <= 0:
+            return
+        scroll_bar = self.conversation_display.verticalScrollBar()
+        previous_maximum = scroll_bar.maximum()
+        first_line = max(0, self.rendered_start - display_block_limit // 5)
+        older_lines = self.history_lines[first_line:self.rendered_start]
+        self.rendered_start = first_line
+
+        char_formatting, block_formatting = self.DisplayFormats()
+        text_cursor = QTextCursor(self.conversation_display.document())
+        text_cursor.movePosition(QTextCursor.Start)
+        text_cursor.insertText('\n'.join(older_lines) + '\n', char_formatting)
+        scroll_bar.setValue(scroll_bar.maximum() - previous_maximum)
 
 class AudioInputControl(QPushButton):
     def __init__(self, parent=None):
@@ -283,7 +422,10 @@ class AudioInputControl(QPushButton):
         InitializeAudioDevice()
 
     def switch_audio_state(self):
-        self.activation_state = not self.activation_state
+        self.set_activation_state(not self.activation_state)
+
+    def set_activation_state(self, active):
+        self.activation_state = active
         if self.activation_state:
             self.setStyleSheet("""
                 QPushButton {
@@ -314,6 +456,8 @@ class AudioInputControl(QPushButton):
             logging.debug("Audio deactivated")
 
 class StreamlinedBotInterface(QMainWindow):
+    wake_word_heard = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
@@ -332,6 +476,13 @@ class StreamlinedBotInterface(QMainWindow):
         self.monitoring_timer.timeout.connect(self.monitor_commands)
         self.monitoring_timer.start(1000)  # Increased from 500ms
 
+        # The detector runs on raw audio while the mic is off; the signal hops to the GUI thread
+        self.wake_word_heard.connect(self.handle_wake_word)
+        wake_detector = WakeWordDetector.load() if WakeWordDetector else None
+        if wake_detector and audio_capture.available():
+            start_wake_listener(wake_detector, self.wake_word_heard.emit,
+                                enabled=lambda: not self.audio_control.activation_state)
+
     def setupInterface(self):
         self.main_container = QWidget()
         self.setCentralWidget(self.main_container)
@@ -420,6 +571,9 @@ class StreamlinedBotInterface(QMainWindow):
         try:
             current_state = RetrieveBotOperationalState()
             audio_state = RetrieveAudioDeviceState()
+            if (audio_state == "True") != self.audio_control.activation_state:
+                # The mic can also be switched by a voice command
+                self.audio_control.set_activation_state(audio_state == "True")
             if audio_state == "True":
                 self.header_symbol.setPixmap(QIcon.fromTheme("audio-input-microphone").pixmap(16, 16))
             else:
@@ -441,47 +595,23 @@ class StreamlinedBotInterface(QMainWindow):
                         self.previous_command = latest_line
 
                         if "jarvis" in latest_line and any(keyword in latest_line for keyword in ["wake", "are you there", "you there", "hello", "hi", "wake up"]):
-                            greeting_response = SelectRandomGreeting()
-                            updated_content = file_content + f"\n{bot_identifier} : {greeting_response}"
-                            DisplayContentOnScreen(updated_content)
-
-                            self.audio_control.activation_state = True
-                            self.audio_control.setStyleSheet("""
-                                QPushButton {
-                                    background-color: #1e88e5;
-                                    border-radius: 20px;
-                                    border: 2px solid #42a5f5;
-                                }
-                                QPushButton:hover {
-                                    background-color: #2196f3;
-                                }
-                            """)
-                            self.audio_control.setIcon(QIcon.fromTheme("audio-input-microphone"))
-                            ActivateAudioDevice()
+                            self.handle_wake_word()
                             logging.debug("Wake command detected")
 
                         elif "jarvis" in latest_line and any(keyword in latest_line for keyword in ["sleep", "mute", "stop", "quiet"]):
-                            self.audio_control.activation_state = False
-                            self.audio_control.setStyleSheet("""
-                                QPushButton {
-                                    background-color: #3a3a3a;
-                                    border-radius: 20px;
-                                    border: 2px solid #5a5a5a;
-                                }
-                                QPushButton:hover {
-                                    background-color: #4a4a4a;
-                                }
-                            """)
-                            self.audio_control.setIcon(QIcon.fromTheme("microphone-sensitivity-muted"))
-                            InitializeAudioDevice()
+                            self.audio_control.set_activation_state(False)
                             logging.debug("Sleep command detected")
 
                             sleep_response = f"Entering sleep mode. Wake me when needed, {user_identifier}."
-                            updated_content = file_content + f"\n{bot_identifier} : {sleep_response}"
-                            DisplayContentOnScreen(updated_content)
+                            DisplayContentOnScreen(f"{bot_identifier} : {sleep_response}")
         except Exception as e:
             logging.error(f"Error monitoring commands: {e}")
 
+    def handle_wake_word(self):
+        if not self.audio_control.activation_state:
+            self.audio_control.set_activation_state(True)
+        DisplayContentOnScreen(f"{bot_identifier} : {SelectRandomGreeting()}")
+
     def headerMousePressed(self, event):
         if event.button() == Qt.LeftButton:
             self.drag_active = True
@@ -0,0 +1,137 @@
+"""Runs a JSONL file of queries through the assistant pipeline and writes JSONL results.
+
+Each input line needs a "query" field. Lines that share a "session" value
+form one conversation and run in file order within it; everything else runs
+concurrently, up to --concurrency turns at a time. Any other input fields
+(an id, an expected answer) are copied to the result unchanged.
+
+Each result line holds the tasks, kind, answer, actions, whether the answer
+came from the answer cache ("cached") and per-stage timings in
+milliseconds, or an "error". Results are written in input order. At the
+end, throughput and per-stage latency percentiles are printed.
+
+A batch run is a regression run, not a conversation: every answer is
+generated (--answer-cache serves repeated questions from
+Data/AnswerCache.json and adds the new answers to it), and the desktop
+app's Data/Latency.data and Data/Metrics.prom are left alone.
+
+Usage:
+    python batch.py queries.jsonl results.jsonl --concurrency 8
+    python batch.py queries.jsonl - --combined        # results to stdout
+    python batch.py queries.jsonl results.jsonl --answer-cache
+"""
+import sys
+import time
+import logging
+import argparse
+import threading
+from json import dumps, loads
+from concurrent.futures import ThreadPoolExecutor
+
+from Core.LogPipeline import setup_logging
+
+setup_logging()
+
+from Core.Tracing import tracer, format_percentiles
+from Core.Pipeline import Session, run_query
+from Core.AnswerCache import answer_cache
+
+def read_items(path: str) -> list:
+    items = []
+    with (sys.stdin if path == "-" else open(path, "r", encoding="utf-8")) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = loads(line)
+            if not isinstance(item, dict) or not str(item.get("query", "")).strip():
+                raise ValueError(f"line {number}: expected an object with a 'query' field")
+            items.append(item)
+    return items
+
+def conversations(items: list) -> list:
+    """Groups item indexes into conversations: one per session value, one per item without."""
+    groups, by_session = [], {}
+    for index, item in enumerate(items):
+        key = item.get("session")
+        if key is None:
+            groups.append([index])
+        elif key in by_session:
+            by_session[key].append(index)
+        else:
+            by_session[key] = [index]
+            groups.append(by_session[key])
+    return groups
+
+class OrderedWriter:
+    """Writes results in input order as soon as every earlier one is done."""
+
+    def __init__(self, out):
+        self.out = out
+        self.pending = {}
+        self.next_index = 0
+        self.lock = threading.Lock()
+
+    def put(self, index: int, result: dict) -> None:
+        with self.lock:
+            self.pending[index] = result
+            while self.next_index in self.pending:
+                self.out.write(dumps(self.pending.pop(self.next_index), ensure_ascii=False) + "\n")
+                self.next_index += 1
+            self.out.flush()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file with a 'query' field per line, or - for stdin")
+    parser.add_argument("output", help="JSONL file for the results, or - for stdout")
+    parser.add_argument("--concurrency", type=int, default=4, help="Turns processed in parallel")
+    parser.add_argument("--combined", action="store_true", help="Classify and answer general queries in one call")
+    parser.add_argument("--answer-cache", action=argparse.BooleanOptionalAction, default=False,
+                        help="Serve repeated questions from the answer cache and store new answers in it "
+                             "(default: --no-answer-cache, always generate)")
+    args = parser.parse_args(argv)
+
+    answer_cache.enabled = args.answer_cache
+    tracer.last_turn_path = tracer.prometheus_path = None
+
+    items = read_items(args.input)
+    groups = conversations(items)
+    failures = 0
+    failures_lock = threading.Lock()
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    writer = OrderedWriter(out)
+
+    def run_conversation(indexes: list) -> None:
+        nonlocal failures
+        session = Session()
+        for index in indexes:
+            item = items[index]
+            started = time.perf_counter()
+            try:
+                result = run_query(str(item["query"]), session, combined=args.combined)
+                result.pop("session")
+            except Exception as e:
+                logging.error(f"Batch item {index} failed: {e}")
+                result = {"error": str(e)}
+                with failures_lock:
+                    failures += 1
+            result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            writer.put(index, {**item, **result})
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency), thread_name_prefix="batch") as pool:
+            list(pool.map(run_conversation, groups))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - started
+
+    report = sys.stderr if args.output == "-" else sys.stdout
+    print(format_percentiles(tracer.snapshot()), file=report)
+    print(f"\n{len(items)} queries in {elapsed:.2f}s: {len(items) / elapsed if elapsed else 0:.2f} queries/s "
+          f"({len(groups)} conversations, concurrency {args.concurrency}, {failures} failed)", file=report)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
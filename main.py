@@ -2,10 +2,19 @@ import asyncio
 import logging
 import os
 import subprocess
+import sys
 import threading
 import json
 from time import sleep
 from dotenv import dotenv_values
+from Core.Tracing import tracer
+from Core.TurnScheduler import TurnScheduler
+from Core.FastLane import FastLane
+from Core.LogPipeline import setup_logging, shutdown_logging
+from Core.MemoryBudget import memory_budget
+
+# Setup logging
+setup_logging()
 
 # Placeholder imports (replace with actual modules)
 try:
@@ -13,6 +22,7 @@ try:
         InitializeGraphicalInterface,
         ModifyBotOperationalState,
         DisplayContentOnScreen,
+        NewMessageId,
         BuildStoragePath,
         UpdateAudioDeviceState,
         ProcessResponseText,
@@ -22,31 +32,62 @@ try:
     )
     from Core.QueryClassifier import classify_user_query
     from Core.RealTimeSearch import RealTimeSearchEngine
-    from Core.TaskExecuter import Automation
-    from Core.VoiceInput import speech_recognition
-    from Core.ChatBot import answer_query
+    from Core.TaskExecuter import Automation, System, CloseApp, KnownApp, automation_executor
+    from Core.VoiceInput import speech_recognition, user_speaking
+    from Core.ChatBot import answer_query, classify_and_answer
     from Core.VoiceOutput import text_to_speech
+    from Core.Reminders import reminder_scheduler
 except ImportError as e:
     logging.error(f"Import error: {e}")
     # Placeholder functions for missing modules
     def classify_user_query(query): return [f"general {query}"]
-    def RealTimeSearchEngine(query): return f"Search result for: {query}"
+    def RealTimeSearchEngine(query, on_token=None): return f"Search result for: {query}"
     async def Automation(queries): print(f"Executing tasks: {queries}")
-    def speech_recognition(): return input("Enter voice input: ")  # For testing
-    def answer_query(query): return f"Response to: {query}"
-    def text_to_speech(text): print(f"Speaking: {text}")
+    def System(command): print(f"System: {command}")
+    def CloseApp(app): print(f"Closing: {app}")
+    def KnownApp(app): return False
+    automation_executor = None
+    def speech_recognition(pre_roll=None, abort=None): return input("Enter voice input: ")  # For testing
+    user_speaking = threading.Event()
+    def answer_query(query, on_token=None): return f"Response to: {query}"
+    def classify_and_answer(query): return classify_user_query(query), None
+    def text_to_speech(text, callback=None): print(f"Speaking: {text}")
+    reminder_scheduler = None
 
-# Setup logging
-logging.basicConfig(filename='Data/assistant.log', level=logging.DEBUG, 
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+try:
+    from Core.BargeIn import BargeInMonitor
+except ImportError as e:
+    logging.warning(f"Barge-in unavailable: {e}")
+    BargeInMonitor = None
 
 environment_config = dotenv_values(".env")
 user_name = environment_config.get("Username", "User")
 assistant_name = environment_config.get("Assistantname", "Assistant")
+# One completion classifies and, for general queries, answers
+combined_mode = environment_config.get("CombinedClassifyAnswer", "false").lower() == "true"
 initial_conversation = f'''{user_name} : Hello {assistant_name}, How are you?
 {assistant_name} : Welcome {user_name}. I am doing well. How may I help you?'''
 running_processes = []
-available_operations = ["open", "close", "play", "system", "content", "google_search", "youtube_search"]
+max_child_processes = int(environment_config.get("MaxChildProcesses", 4))
+process_lock = threading.Lock()
+available_operations = ["open", "close", "play", "system", "content", "google_search", "youtube_search", "reminder"]
+barge_in_audio = None
+# Answers and reminders share one audio device; only one speaks at a time
+speech_lock = threading.Lock()
+# Set to stop the answer being spoken
+speech_interrupt = threading.Event()
+
+# AudioRuntime=process moves capture, recognition and speech into worker processes
+audio_runtime = None
+if environment_config.get("AudioRuntime", "thread").lower() == "process":
+    try:
+        from Core.AudioRuntime import AudioRuntime
+        if AudioRuntime.available():
+            audio_runtime = AudioRuntime().start()
+        else:
+            logging.warning("AudioRuntime=process needs pyaudio and SpeechRecognition; using threads")
+    except Exception as e:
+        logging.error(f"Audio runtime unavailable: {e}")
 
 def InitializeDefaultConversation():
     logging.debug(f"Current working directory: {os.getcwd()}")
@@ -125,21 +166,187 @@ def PerformInitialSetup():
 
 PerformInitialSetup()
 
-def ExecuteMainLogic():
+def SpeakResponse(response_text):
+    with speech_lock:
+        return SpeakWithBargeIn(response_text)
+
+def SpeakWithBargeIn(response_text):
+    """Speaks an answer; returns False if it was interrupted"""
+    global barge_in_audio
+    speech_interrupt.clear()
+    if audio_runtime is not None:
+        # Barge-in is handled between the capture and playback processes
+        with tracer.span("tts"):
+            completed = audio_runtime.speak(response_text)
+        if not completed:
+            logging.debug("Playback interrupted by barge-in")
+        return completed
+    if BargeInMonitor is None:
+        with tracer.span("tts"):
+            return text_to_speech(response_text, lambda: not speech_interrupt.is_set())
+    with BargeInMonitor(mic_enabled=lambda: RetrieveAudioDeviceState() == "True") as monitor:
+        with tracer.span("tts"):
+            completed = text_to_speech(response_text, lambda: monitor.callback() and not speech_interrupt.is_set())
+    if completed is False:
+        logging.debug("Playback interrupted by barge-in")
+        barge_in_audio = monitor.handoff()
+    return completed
+
+def InterruptSpeech():
+    speech_interrupt.set()
+    if audio_runtime is not None:
+        audio_runtime.interrupt()
+
+def AnnounceReminder(reminder):
+    message = f"Reminder: {reminder['message']}"
+    if reminder.get("late"):
+        message += " (this was due while I was offline)"
+    DisplayContentOnScreen(f"{assistant_name} : {message}")
+    with speech_lock:
+        if audio_runtime is not None:
+            audio_runtime.speak(message)
+        else:
+            text_to_speech(message)
+
+if reminder_scheduler is not None:
+    reminder_scheduler.on_fire = AnnounceReminder
+    reminder_scheduler.start()
+
+def ReminderReplies(automation_results):
+    """What the user should hear about the reminders a turn set: each confirmation, or why it failed"""
+    replies = []
+    for result in automation_results or []:
+        if not result.command.startswith("reminder"):
+            continue
+        if result.status == "ok" and isinstance(result.value, str):
+            replies.append(result.value)
+        else:
+            replies.append(f"Sorry, I couldn't set that reminder: {result.error or result.status}")
+    return replies
+
+def SetMicrophone(state):
+    UpdateAudioDeviceState("True" if state == "on" else "False")
+    return True
+
+def ReapProcesses():
+    """Drops finished child processes, collecting their exit status"""
+    with process_lock:
+        for process_handle in [p for p in running_processes if p.poll() is not None]:
+            running_processes.remove(process_handle)
+            logging.debug(f"Child process {process_handle.pid} exited with {process_handle.returncode}")
+
+def ShowDebugReport(report):
+    if report != "memory":
+        return False
+    ReapProcesses()
+    memory_report = memory_budget.report()
+    if not memory_budget.tracing:
+        memory_budget.start()
+        memory_report += "\nAllocation tracing is on now; ask again for per-subsystem figures."
+    logging.info(memory_report)
+    DisplayContentOnScreen(f"{assistant_name} : {memory_report}")
+    return True
+
+memory_budget.watch("child processes", running_processes.__len__, max_child_processes)
+
+# Volume keys, app closes, mic on/off and debug reports run without waiting for classification;
+# a close only when it names an installed application exactly, so "close the door" or "close all" still
+# reach the classifier
+fast_lane = FastLane({"system": System, "close": CloseApp, "mic": SetMicrophone, "debug": ShowDebugReport},
+                     accept={"close": KnownApp})
+
+def UpdateIdleState(listening):
+    status = "Listening ... " if listening else "Available ... "
+    if turn_scheduler.idle() and status not in RetrieveBotOperationalState():
+        ModifyBotOperationalState(status)
+
+def CaptureUtterance():
+    """Next utterance from the microphone, or None if there is none yet"""
+    global barge_in_audio
+    listening = RetrieveAudioDeviceState() == "True"
+    if audio_runtime is not None:
+        audio_runtime.set_listening(listening)
+    UpdateIdleState(listening)
+    if not listening:
+        sleep(0.1)
+        return None
+    if audio_runtime is not None:
+        user_input = audio_runtime.listen(timeout=0.5)
+    elif turn_scheduler.speaking.is_set():
+        # Without echo cancellation the mic hears the answer too; while it plays only barge-in counts
+        sleep(0.05)
+        return None
+    else:
+        # The user may have interrupted the last answer; continue from the audio already captured
+        pre_roll, barge_in_audio = barge_in_audio, None
+        user_input = speech_recognition(pre_roll, abort=turn_scheduler.speaking.is_set)
+    if user_input:
+        logging.debug(f"User input: {user_input}")
+        DisplayContentOnScreen(f"{user_name} : {user_input}")
+    return user_input
+
+def StreamToScreen(turn):
+    """An on_token callback that shows a reply in the chat panel as it streams, and the message id to finish it with"""
+    message_id = NewMessageId()
+    streamed = []
+
+    def on_token(token):
+        if turn.cancelled:
+            return
+        streamed.append(token)
+        DisplayContentOnScreen(f"{assistant_name} : {''.join(streamed)}", message_id, partial=True)
+
+    return on_token, message_id
+
+def Respond(turn, response_text, message_id=None):
+    """Shows an answer unless its turn was cancelled, and returns it for speaking"""
+    if turn.cancelled:
+        return None
+    DisplayContentOnScreen(f"{assistant_name} : {response_text}", message_id)
+    return response_text
+
+def SpeakTurn(turn, response_text):
+    ModifyBotOperationalState("Answering ... ")
+    completed = SpeakResponse(response_text)
+    if turn.final:
+        ModifyBotOperationalState("Shutting down...")
+        # os._exit skips atexit; write out the queued log records first
+        shutdown_logging()
+        logging.shutdown()
+        os._exit(1)
+    UpdateIdleState(RetrieveAudioDeviceState() == "True")
+    return completed
+
+def ProcessTurn(turn):
+    """Classifies an utterance, runs its tasks and returns the answer to speak, if any"""
     try:
-        logging.debug("Starting main logic")
         task_performed = False
         image_processing = False
         image_generation_request = ""
+        user_input = turn.text
+        ReapProcesses()
 
-        ModifyBotOperationalState("Listening ... ")
-        user_input = speech_recognition()
-        logging.debug(f"User input: {user_input}")
-        DisplayContentOnScreen(f"{user_name} : {user_input}")
         ModifyBotOperationalState("Thinking ... ")
-        analysis_result = classify_user_query(user_input)
+        prepared_answer = None
+        reminder_replies = []
+        if combined_mode:
+            with tracer.span("classify_answer"):
+                analysis_result, prepared_answer = classify_and_answer(user_input)
+        else:
+            with tracer.span("classification"):
+                analysis_result = classify_user_query(user_input)
         logging.debug(f"Analysis Result: {analysis_result}")
 
+        # Local actions the classifier found also go to the fast lane instead of a new event loop
+        remaining_tasks = []
+        for query_item in analysis_result:
+            local_task = fast_lane.local_task(query_item)
+            if local_task:
+                fast_lane.dispatch(*local_task)
+            else:
+                remaining_tasks.append(query_item)
+        analysis_result = remaining_tasks
+
         general_detected = any(item.startswith("general") for item in analysis_result)
         realtime_detected = any(item.startswith("realtime") for item in analysis_result)
 
@@ -151,7 +358,16 @@ def ExecuteMainLogic():
             if not task_performed:
                 if any(query_item.startswith(op) for op in available_operations):
                     try:
-                        asyncio.run(Automation(list(analysis_result)))
+                        with tracer.span("automation"):
+                            automation_results = asyncio.run(Automation(list(analysis_result)))
+                        for result in automation_results or []:
+                            logging.info(f"Automation '{result.command}': {result.status} in {result.elapsed:.2f}s {result.error}")
+                        reminder_replies = ReminderReplies(automation_results)
+                        # With an answer to come, show the confirmations now; otherwise they are the answer
+                        if general_detected or realtime_detected or "exit" in analysis_result:
+                            for reply in reminder_replies:
+                                DisplayContentOnScreen(f"{assistant_name} : {reply}")
+                            reminder_replies = []
                         task_performed = True
                     except Exception as e:
                         logging.error(f"Automation error: {e}")
@@ -161,56 +377,61 @@ def ExecuteMainLogic():
                 image_processing = True
                 image_generation_request = query_item.replace("generate_image ", "")
 
+            if image_processing and len(running_processes) >= max_child_processes:
+                logging.warning(f"Image generation skipped: {len(running_processes)} child processes still running")
+                image_processing = False
+
             if image_processing:
                 try:
                     with open(r"Data\image.data", "w", encoding='utf-8') as image_file:
                         image_file.write(f"{image_generation_request},True")
                     process_handle = subprocess.Popen(
-                        ['python', r'Backend\VisualContentCreator.py'],
-                        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                        stdin=subprocess.PIPE, shell=False
+                        [sys.executable, '-m', 'Core.VisualContentCreator'],
+                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                        stdin=subprocess.DEVNULL, shell=False
                     )
-                    running_processes.append(process_handle)
+                    with process_lock:
+                        running_processes.append(process_handle)
                 except Exception as e:
                     logging.error(f"Image generation error: {e}")
 
         if general_detected and realtime_detected or realtime_detected:
             ModifyBotOperationalState("Searching ... ")
+            on_token, message_id = StreamToScreen(turn)
             try:
-                search_result = RealTimeSearchEngine(ProcessInputQuery(combined_query))
+                with tracer.span("search"):
+                    search_result = RealTimeSearchEngine(ProcessInputQuery(combined_query), on_token=on_token)
             except Exception as e:
                 logging.error(f"Search error: {e}")
                 search_result = "Real-time search not available"
-            DisplayContentOnScreen(f"{assistant_name} : {search_result}")
-            ModifyBotOperationalState("Answering ... ")
-            text_to_speech(search_result)
-            return True
+            return Respond(turn, search_result, message_id)
 
         for individual_query in analysis_result:
             if "general" in individual_query:
                 ModifyBotOperationalState("Thinking ... ")
                 processed_query = individual_query.replace("general ", "")
+                on_token, message_id = StreamToScreen(turn)
                 try:
-                    bot_response = answer_query(ProcessInputQuery(processed_query))
+                    if prepared_answer is not None:
+                        bot_response = prepared_answer
+                    else:
+                        with tracer.span("answer"):
+                            bot_response = answer_query(ProcessInputQuery(processed_query), on_token=on_token)
                 except Exception as e:
                     logging.error(f"Query answering error: {e}")
                     bot_response = "Sorry, I couldn't process that query."
-                DisplayContentOnScreen(f"{assistant_name} : {bot_response}")
-                ModifyBotOperationalState("Answering ... ")
-                text_to_speech(bot_response)
-                return True
+                return Respond(turn, bot_response, message_id)
             elif "realtime" in individual_query:
                 ModifyBotOperationalState("Searching ... ")
                 processed_query = individual_query.replace("realtime ", "")
+                on_token, message_id = StreamToScreen(turn)
                 try:
-                    search_response = RealTimeSearchEngine(ProcessInputQuery(processed_query))
+                    with tracer.span("search"):
+                        search_response = RealTimeSearchEngine(ProcessInputQuery(processed_query), on_token=on_token)
                 except Exception as e:
                     logging.error(f"Search error: {e}")
                     search_response = "Real-time search not available"
-                DisplayContentOnScreen(f"{assistant_name} : {search_response}")
-                ModifyBotOperationalState("Answering ... ")
-                text_to_speech(search_response)
-                return True
+                return Respond(turn, search_response, message_id)
             elif "exit" in individual_query:
                 farewell_query = "Okay, Bye!"
                 try:
@@ -218,40 +439,27 @@ def ExecuteMainLogic():
                 except Exception as e:
                     logging.error(f"Farewell error: {e}")
                     farewell_response = "Goodbye!"
-                DisplayContentOnScreen(f"{assistant_name} : {farewell_response}")
-                ModifyBotOperationalState("Answering ... ")
-                text_to_speech(farewell_response)
-                ModifyBotOperationalState("Shutting down...")
-                os._exit(1)
-        return False
+                turn.final = True
+                return Respond(turn, farewell_response)
+        if reminder_replies:
+            return Respond(turn, " ".join(reminder_replies))
+        return None
     except Exception as e:
         logging.error(f"Main logic error: {e}")
         ModifyBotOperationalState("Error occurred")
-        return False
+        return None
 
-def BackgroundProcessingThread():
-    while True:
-        try:
-            audio_status = RetrieveAudioDeviceState()
-            logging.debug(f"Audio status: {audio_status}")
-            if audio_status == "True":
-                ExecuteMainLogic()
-            else:
-                current_status = RetrieveBotOperationalState()
-                if "Available ..." not in current_status:
-                    ModifyBotOperationalState("Available ... ")
-            sleep(0.1)
-        except Exception as e:
-            logging.error(f"Background thread error: {e}")
-            sleep(1)
+# Capture, processing and speech of consecutive turns overlap; see Core/TurnScheduler.py
+turn_scheduler = TurnScheduler(CaptureUtterance, ProcessTurn, SpeakTurn, interrupt=InterruptSpeech,
+                               hold=user_speaking.is_set, route=fast_lane.route,
+                               on_cancel=automation_executor.cancel if automation_executor else lambda: None)
 
 def InterfaceThread():
     InitializeGraphicalInterface()
 
 if __name__ == "__main__":
     try:
-        background_thread = threading.Thread(target=BackgroundProcessingThread, daemon=True)
-        background_thread.start()
+        turn_scheduler.start()
         InterfaceThread()
     except Exception as e:
         logging.error(f"Main execution error: {e}")
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""Headless multi-session server for the assistant pipeline.
+
+Exposes classification, answering and real-time search over HTTP and
+WebSocket, without the Qt window, microphone or speech output. Every session
+has its own conversation; the LLM connection pools, circuit breakers, model
+router and answer cache are shared by all of them.
+
+Endpoints:
+    POST   /v1/sessions          → {"session": id}
+    DELETE /v1/sessions/{id}
+    POST   /v1/query             {"query": ..., "session": optional id} → turn result
+    GET    /v1/ws                WebSocket; send {"query": ..., "session": ...},
+                                 receive "token" messages, then a "done" message
+    GET    /v1/health            breaker states, model status, hedging stats
+    GET    /v1/metrics           per-stage latency in Prometheus text format
+    GET    /v1/debug/memory      resident size, traced memory per subsystem, collection sizes vs caps
+
+Usage:
+    python server.py --host 0.0.0.0 --port 8765
+
+Automation tasks (open, play, system, ...) are returned as "actions" for the
+client to carry out; the server never touches its own desktop.
+"""
+import asyncio
+import logging
+import argparse
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web, WSMsgType
+from dotenv import dotenv_values
+
+from Core.LogPipeline import setup_logging
+
+setup_logging()
+
+from Core import Resilience
+from Core.Tracing import tracer
+from Core.LLMClient import llm_client
+from Core.ModelRouter import model_router
+from Core.AnswerCache import answer_cache
+from Core.Pipeline import SessionStore, run_query
+from Core.MemoryBudget import memory_budget
+
+env_vars = dotenv_values(".env")
+ServerWorkers = int(env_vars.get("ServerWorkers", 16))
+ServerToken = env_vars.get("ServerToken")
+combined_mode = env_vars.get("CombinedClassifyAnswer", "false").lower() == "true"
+REAP_INTERVAL = 60
+
+@web.middleware
+async def authenticate(request: web.Request, handler):
+    if ServerToken and request.path != "/v1/health":
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip() \
+            or request.query.get("token", "")
+        if supplied != ServerToken:
+            raise web.HTTPUnauthorized(text="Missing or invalid token")
+    return await handler(request)
+
+async def run_turn(app: web.Application, query: str, session_id, on_token=None) -> dict:
+    """Runs a blocking pipeline turn on the worker pool."""
+    session = app["sessions"].get_or_create(session_id)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(app["workers"], partial(run_query, query, session, on_token, combined_mode))
+
+async def read_query(request: web.Request) -> dict:
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text="Body must be JSON")
+    if not isinstance(payload, dict) or not str(payload.get("query", "")).strip():
+        raise web.HTTPBadRequest(text="'query' is required")
+    return payload
+
+async def create_session(request: web.Request) -> web.Response:
+    return web.json_response({"session": request.app["sessions"].create().id}, status=201)
+
+async def close_session(request: web.Request) -> web.Response:
+    if not request.app["sessions"].close(request.match_info["session_id"]):
+        raise web.HTTPNotFound(text="Unknown session")
+    return web.Response(status=204)
+
+async def query(request: web.Request) -> web.Response:
+    payload = await read_query(request)
+    result = await run_turn(request.app, str(payload["query"]), payload.get("session"))
+    return web.json_response(result)
+
+async def websocket(request: web.Request) -> web.WebSocketResponse:
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+    loop = asyncio.get_running_loop()
+    session_id = request.query.get("session")
+
+    async for message in ws:
+        if message.type != WSMsgType.TEXT:
+            continue
+        try:
+            payload = message.json()
+            text = str(payload["query"]).strip()
+        except (ValueError, KeyError, TypeError):
+            await ws.send_json({"type": "error", "error": "Expected {\"query\": ...}"})
+            continue
+        session_id = payload.get("session", session_id)
+
+        # Tokens arrive on a worker thread and are handed to the loop in order
+        tokens: asyncio.Queue = asyncio.Queue()
+        on_token = lambda token: loop.call_soon_threadsafe(tokens.put_nowait, token)
+        turn = asyncio.ensure_future(run_turn(request.app, text, session_id, on_token))
+        turn.add_done_callback(lambda _: tokens.put_nowait(None))
+        while (token := await tokens.get()) is not None:
+            if token and not ws.closed:
+                await ws.send_json({"type": "token", "text": token})
+        try:
+            result = await turn
+        except Exception as e:
+            logging.error(f"Server turn error: {e}")
+            await ws.send_json({"type": "error", "error": "The turn failed"})
+            continue
+        session_id = result["session"]
+        if not ws.closed:
+            await ws.send_json({"type": "done", **result})
+    return ws
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({
+        "sessions": len(request.app["sessions"]),
+        "breakers": Resilience.breaker_states(),
+        "models": model_router.status(),
+        "llm": dict(llm_client.stats),
+        "answer_cache": {"hits": answer_cache.hits, "misses": answer_cache.misses},
+    })
+
+async def debug_memory(request: web.Request) -> web.Response:
+    # A tracemalloc snapshot walks every live allocation; keep it off the event loop
+    sample = await asyncio.get_running_loop().run_in_executor(request.app["workers"], memory_budget.sample)
+    return web.json_response(sample)
+
+async def metrics(request: web.Request) -> web.Response:
+    return web.Response(text=tracer.export_prometheus(), content_type="text/plain")
+
+async def reap_sessions(app: web.Application) -> None:
+    while True:
+        await asyncio.sleep(REAP_INTERVAL)
+        removed = app["sessions"].reap()
+        if removed:
+            logging.info(f"Expired {removed} idle sessions")
+
+async def on_startup(app: web.Application) -> None:
+    app["reaper"] = asyncio.create_task(reap_sessions(app))
+
+async def on_cleanup(app: web.Application) -> None:
+    app["reaper"].cancel()
+    app["workers"].shutdown(wait=False, cancel_futures=True)
+
+def create_app(sessions: SessionStore = None, workers: int = ServerWorkers) -> web.Application:
+    app = web.Application(middlewares=[authenticate])
+    app["sessions"] = sessions or SessionStore()
+    app["workers"] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="turn")
+    memory_budget.watch("sessions", app["sessions"].__len__, app["sessions"].max_sessions)
+    app.router.add_post("/v1/sessions", create_session)
+    app.router.add_delete("/v1/sessions/{session_id}", close_session)
+    app.router.add_post("/v1/query", query)
+    app.router.add_get("/v1/ws", websocket)
+    app.router.add_get("/v1/health", health)
+    app.router.add_get("/v1/metrics", metrics)
+    app.router.add_get("/v1/debug/memory", debug_memory)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless multi-session assistant server")
+    parser.add_argument("--host", default=env_vars.get("ServerHost", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(env_vars.get("ServerPort", 8765)))
+    parser.add_argument("--workers", type=int, default=ServerWorkers, help="Turns processed in parallel")
+    args = parser.parse_args()
+    web.run_app(create_app(workers=args.workers), host=args.host, port=args.port)